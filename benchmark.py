@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from charts import ClassCharts
+from db_manager import DatabaseManager
+from ml_engine import MLEngine
+from synthetic import SyntheticCohortGenerator
+from whatif import class_improvements
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+
+
+def seed_database(db_manager: DatabaseManager, n_rows: int, seed: int = 42, chunksize: int = 100000):
+    generator = SyntheticCohortGenerator(seed=seed, low=40, missing_final_rate=0.1, scores_per_student=4)
+    generator.seed_database(db_manager, n_rows, chunksize=chunksize)
+
+
+def time_calls(fn, repeat: int, warmup: int = 1) -> dict:
+    # Warm-up calls absorb one-off costs such as lazy imports and cold caches
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000
+    return {
+        'n': repeat,
+        'mean_ms': float(timings.mean()),
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p95_ms': float(np.percentile(timings, 95)),
+        'min_ms': float(timings.min()),
+        'max_ms': float(timings.max())
+    }
+
+
+def run_size(n_rows: int, repeat: int, fast_repeat: int, workdir: str) -> dict:
+    db_path = os.path.join(workdir, f'bench_{n_rows}.db')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    db_manager = DatabaseManager(db_path)
+    started = time.perf_counter()
+    seed_database(db_manager, n_rows)
+    print(f"[{n_rows:,} rows] seeded in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    ml_engine = MLEngine(db_manager, autosave=False)
+    fig = Figure(figsize=(10, 6))
+    canvas = FigureCanvasAgg(fig)
+    charts = ClassCharts(fig)
+    counter = iter(range(10 ** 9))
+
+    def render():
+        # Forced so every iteration repaints, as if the data had changed
+        charts.update(db_manager.get_score_moments(), force=True)
+        canvas.draw()
+
+    def refresh_unchanged():
+        if charts.update(db_manager.get_score_moments()):
+            canvas.draw()
+
+    benchmarks = [
+        ('add_student_score', fast_repeat,
+         lambda: db_manager.add_student_score('Bench', f'BENCH{next(counter)}', 70, 70, 70, 70, 70)),
+        # Cleared first so this measures the query rather than the query cache
+        ('fetch_all_data', repeat, lambda: (db_manager.query_cache.clear(), db_manager.fetch_all_data())),
+        # Only results up to query_cache_max_rows rows are cached; a single student always is
+        ('get_student_scores_cached', fast_repeat, lambda: db_manager.get_student_scores(1)),
+        ('load_score_snapshot', repeat, db_manager.load_score_snapshot),
+        ('train_models', repeat, ml_engine.train_models),
+        # Distinct inputs so this measures the model path rather than the prediction cache
+        ('predict_final_score', fast_repeat,
+         lambda: ml_engine.predict_final_score(50 + next(counter) % 50, 64.0, 88.0, 59.5)),
+        ('predict_final_score_cached', fast_repeat, lambda: ml_engine.predict_final_score(72.5, 64.0, 88.0, 59.5)),
+        # Latest scores of every student through the what-if simulator
+        ('class_whatif', repeat, lambda: class_improvements(ml_engine)),
+        ('update_visualizations', repeat, render),
+        ('update_visualizations_unchanged', fast_repeat, refresh_unchanged),
+    ]
+
+    results = {}
+    for name, count, fn in benchmarks:
+        results[name] = time_calls(fn, count)
+        print(f"[{n_rows:,} rows] {name:<31} mean {results[name]['mean_ms']:10.2f} ms  "
+              f"p95 {results[name]['p95_ms']:10.2f} ms", file=sys.stderr)
+
+    db_manager.close()
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for size, benches in results['results'].items():
+        for name, stats in benches.items():
+            base = baseline.get('results', {}).get(size, {}).get(name)
+            if not base:
+                continue
+            ratio = stats['mean_ms'] / max(base['mean_ms'], 1e-9)
+            if ratio > 1 + tolerance:
+                regressions.append((size, name, base['mean_ms'], stats['mean_ms'], ratio))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the DB, ML and rendering hot paths")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Score rows to seed per run")
+    parser.add_argument('--repeat', type=int, default=5, help="Iterations for the heavy benchmarks")
+    parser.add_argument('--fast-repeat', type=int, default=200, help="Iterations for single-row benchmarks")
+    parser.add_argument('--out', default='bench_results.json', help="Where to write the JSON results")
+    parser.add_argument('--baseline', help="Previous results JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.20,
+                        help="Allowed slowdown of the mean vs. baseline before flagging (0.20 = 20%%)")
+    parser.add_argument('--workdir', help="Directory for the seeded databases (default: a temp dir)")
+    args = parser.parse_args(argv)
+
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'fast_repeat': args.fast_repeat
+        },
+        'results': {}
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        for n_rows in args.sizes:
+            results['results'][str(n_rows)] = run_size(n_rows, args.repeat, args.fast_repeat, workdir)
+
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.out}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for size, name, before, after, ratio in regressions:
+            print(f"REGRESSION [{size} rows] {name}: {before:.2f} ms -> {after:.2f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
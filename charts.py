@@ -0,0 +1,64 @@
+import numpy as np
+
+from stats import RunningMoments
+
+SKILL_LABELS = ['Math', 'Logic', 'Coding', 'Communication']
+SKILL_COLORS = ['#3498db', '#2ecc71', '#e74c3c', '#f39c12']
+
+
+class ClassCharts:
+    # Class analysis figure (correlation heatmap + subject averages). Every artist is created
+    # once; update() only swaps image data, bar heights and label text, and reports whether
+    # anything changed so the caller can skip the redraw. Works on any Figure, so the GUI
+    # (TkAgg) and the headless benchmarks (Agg) share it.
+    def __init__(self, fig):
+        self.fig = fig
+        self._last = None
+        n = len(SKILL_LABELS)
+
+        self.heatmap_ax = fig.add_subplot(2, 1, 1)
+        self.heatmap = self.heatmap_ax.imshow(np.eye(n), cmap='coolwarm', vmin=-1, vmax=1, aspect='auto')
+        self.colorbar = fig.colorbar(self.heatmap, ax=self.heatmap_ax)
+        self.heatmap_ax.set_xticks(range(n), SKILL_LABELS)
+        self.heatmap_ax.set_yticks(range(n), SKILL_LABELS)
+        self.heatmap_ax.set_title('Correlation Heatmap of Skills', fontsize=12, fontweight='bold')
+        self.cell_labels = [[self.heatmap_ax.text(j, i, '', ha='center', va='center') for j in range(n)]
+                            for i in range(n)]
+
+        self.bar_ax = fig.add_subplot(2, 1, 2)
+        self.bars = self.bar_ax.bar(SKILL_LABELS, np.zeros(n), color=SKILL_COLORS)
+        self.bar_ax.set_title('Class Average by Subject', fontsize=12, fontweight='bold')
+        self.bar_ax.set_ylabel('Average Score')
+        self.bar_ax.set_ylim(0, 100)
+        self.bar_labels = [self.bar_ax.text(i, 2, '', ha='center', va='bottom') for i in range(n)]
+
+        fig.tight_layout()
+        self.empty_label = fig.text(0.5, 0.5, "No data available", ha='center', va='center', fontsize=14,
+                                    visible=False)
+
+    def update(self, moments: RunningMoments, force: bool = False) -> bool:
+        key = (moments.count, moments.mean.tobytes(), moments.comoment.tobytes())
+        if key == self._last and not force:
+            return False
+        self._last = key
+
+        has_data = moments.count > 0
+        self.empty_label.set_visible(not has_data)
+        for ax in (self.heatmap_ax, self.colorbar.ax, self.bar_ax):
+            ax.set_visible(has_data)
+        if not has_data:
+            return True
+
+        corr = moments.correlation()
+        self.heatmap.set_data(corr)
+        for i, row in enumerate(self.cell_labels):
+            for j, label in enumerate(row):
+                value = corr[i, j]
+                label.set_text(f'{value:.2f}')
+                label.set_color('white' if abs(value) > 0.6 else 'black')
+
+        for bar, label, value in zip(self.bars, self.bar_labels, moments.mean):
+            bar.set_height(value)
+            label.set_y(value + 2)
+            label.set_text(f'{value:.1f}')
+        return True
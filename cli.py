@@ -0,0 +1,318 @@
+import argparse
+import glob
+import importlib.util
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from db_manager import DatabaseManager, PREDICTION_COLUMNS
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Student Skills & Performance Profiler")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="Print an import and phase timing breakdown once the GUI window is shown")
+    parser.add_argument('--startup-budget', type=float, metavar='SECONDS',
+                        help="Open the GUI, close it after the first paint and exit non-zero if that took longer")
+    parser.add_argument('--metrics-out', metavar='FILE',
+                        help="On exit, write operation metrics and the slow-query log (.prom/.txt: Prometheus text, else JSON)")
+    parser.add_argument('--slow-query-ms', type=float, metavar='MS',
+                        help="Log operations slower than this many milliseconds (default 250)")
+    subparsers = parser.add_subparsers(dest='command')
+
+    stats_parser = subparsers.add_parser('stats', help="Check (and optionally rebuild) the maintained score aggregates")
+    stats_parser.add_argument('--db', default='student_performance.db', help="SQLite database file")
+    stats_parser.add_argument('--rebuild', action='store_true', help="Recompute the aggregates from the scores table")
+    stats_parser.set_defaults(handler=run_stats)
+
+    score_parser = subparsers.add_parser('score', help="Score every student headlessly and store predictions")
+    score_parser.add_argument('--db', default='student_performance.db', help="SQLite database file")
+    score_parser.add_argument('--out', help="Output .csv file or .parquet directory (default: predictions table in --db)")
+    score_parser.add_argument('--chunksize', type=int, default=20000, help="Students per scoring chunk")
+    score_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Scoring processes")
+    score_parser.add_argument('--resume', action='store_true',
+                              help="Continue an interrupted run (the table's unfinished run, or after the "
+                                   "highest student id in --out)")
+    score_parser.set_defaults(handler=run_score)
+
+    seed_parser = subparsers.add_parser('seed', help="Fill a database with a synthetic cohort for load testing")
+    seed_parser.add_argument('--db', default='student_performance.db', help="SQLite database file")
+    seed_parser.add_argument('--rows', type=int, required=True, help="Number of score rows to generate")
+    seed_parser.add_argument('--chunksize', type=int, default=100000, help="Rows generated and committed per chunk")
+    seed_parser.add_argument('--seed', type=int, default=None, help="Random seed")
+    seed_parser.add_argument('--distribution', choices=['uniform', 'normal'], default='uniform')
+    seed_parser.add_argument('--correlation', type=float, default=0.0, help="Pairwise correlation between skills")
+    seed_parser.add_argument('--missing-final-rate', type=float, default=0.0,
+                             help="Fraction of rows without a final exam score")
+    seed_parser.add_argument('--scores-per-student', type=int, default=1)
+    seed_parser.set_defaults(handler=run_seed)
+
+    serve_parser = subparsers.add_parser('serve', help="Serve predictions over local HTTP with request micro-batching")
+    serve_parser.add_argument('--db', default='student_performance.db', help="SQLite database file")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--unix', metavar='PATH', help="Listen on a Unix socket instead of TCP")
+    serve_parser.add_argument('--max-batch', type=int, default=256, help="Most requests answered by one model call")
+    serve_parser.add_argument('--max-wait-ms', type=float, default=2.0,
+                              help="How long the first request of a batch waits for others to join")
+    serve_parser.add_argument('--retrain-interval', type=float, default=0, metavar='SECONDS',
+                              help="Fold in new rows and hot-swap the models this often (0: only on POST /reload)")
+    serve_parser.set_defaults(handler=run_serve)
+
+    whatif_parser = subparsers.add_parser('whatif', help="Export per-student what-if improvement targets for the class")
+    whatif_parser.add_argument('--db', default='student_performance.db', help="SQLite database file")
+    whatif_parser.add_argument('--out', required=True, help="Output .csv or .parquet file")
+    whatif_parser.add_argument('--step', type=float, default=0.5, help="Granularity of the simulated score raises")
+    whatif_parser.add_argument('--threshold', type=float, action='append',
+                               help="Predicted score to reach (repeatable; default 60, 75 and 85)")
+    whatif_parser.set_defaults(handler=run_whatif)
+
+    shards_parser = subparsers.add_parser('shards', help="Manage a directory of per-cohort databases")
+    shards_parser.add_argument('--dir', required=True, help="Shard directory (holds catalog.db and one file per cohort)")
+    shards_parser.add_argument('--cohort', help="Cohort key (term, campus, ...) that --import writes to")
+    shards_parser.add_argument('--import', dest='import_csv', metavar='CSV', help="Import a CSV file into --cohort")
+    shards_parser.add_argument('--train', action='store_true', help="Train models on all cohorts (or only --cohort)")
+    shards_parser.set_defaults(handler=run_shards)
+
+    return parser
+
+
+def run_stats(args) -> int:
+    db_manager = DatabaseManager(args.db)
+    try:
+        consistent = db_manager.verify_score_stats()
+        print(f"Score aggregates are {'consistent' if consistent else 'INCONSISTENT'} with the scores table")
+        if args.rebuild:
+            db_manager.rebuild_score_stats()
+            print(f"Rebuilt score aggregates over {db_manager.get_score_moments().count} rows")
+            return 0
+        return 0 if consistent else 1
+    finally:
+        db_manager.close()
+
+
+def run_seed(args) -> int:
+    from synthetic import SyntheticCohortGenerator
+
+    db_manager = DatabaseManager(args.db)
+    try:
+        generator = SyntheticCohortGenerator(seed=args.seed, distribution=args.distribution,
+                                             correlation=args.correlation,
+                                             missing_final_rate=args.missing_final_rate,
+                                             scores_per_student=args.scores_per_student)
+        # Continue numbering after existing synthetic rows so repeated runs add new students
+        start_index = db_manager.get_score_summary()[0] if args.scores_per_student == 1 else 0
+        started = time.perf_counter()
+
+        def progress(done, total):
+            elapsed = time.perf_counter() - started
+            print(f"Inserted {done:,} / {total:,} rows ({done / max(elapsed, 1e-9):,.0f} rows/sec)")
+
+        generator.seed_database(db_manager, args.rows, args.chunksize, start_index, progress)
+        return 0
+    finally:
+        db_manager.close()
+
+
+def run_serve(args) -> int:
+    import asyncio
+    import logging
+    from ml_engine import MLEngine
+    from service import ScoringService
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    db_manager = DatabaseManager(args.db)
+    try:
+        engine = MLEngine(db_manager)
+        if not engine.ensure_models(background=False):
+            print("Could not load or train models")
+            return 1
+        service = ScoringService(engine, db_manager, max_batch_size=args.max_batch,
+                                 max_wait_ms=args.max_wait_ms, retrain_interval=args.retrain_interval)
+        where = args.unix or f"http://{args.host}:{args.port}"
+        print(f"Serving predictions on {where} (model version {engine.model_version}); Ctrl+C to stop")
+        try:
+            asyncio.run(service.serve_forever(args.host, args.port, unix_path=args.unix))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    finally:
+        db_manager.close()
+
+
+def run_whatif(args) -> int:
+    from ml_engine import MLEngine
+    from whatif import THRESHOLDS, class_improvements, write_improvements
+
+    db_manager = DatabaseManager(args.db)
+    try:
+        engine = MLEngine(db_manager)
+        if not engine.ensure_models(background=False):
+            print("Could not load or train models")
+            return 1
+        started = time.perf_counter()
+        df = class_improvements(engine, args.threshold or THRESHOLDS, args.step)
+        simulated = time.perf_counter() - started
+        write_improvements(df, args.out)
+        print(f"Simulated {len(df):,} students in {simulated:.2f}s; wrote {args.out}")
+        return 0
+    finally:
+        db_manager.close()
+
+
+def run_shards(args) -> int:
+    from ml_engine import MLEngine
+    from sharding import ShardedDatabase
+
+    sharded = ShardedDatabase(args.dir)
+    try:
+        if args.import_csv:
+            if not args.cohort:
+                print("--import needs --cohort")
+                return 2
+            inserted, rejects = sharded.import_csv_file(args.cohort, args.import_csv)
+            print(f"Imported {inserted:,} rows into {args.cohort} ({len(rejects):,} rejected)")
+
+        for cohort, (rows, students) in sharded.get_cohort_summary().items():
+            print(f"{cohort}: {rows:,} score rows, {students:,} students")
+
+        if args.train:
+            # One cohort trains on its own shard only; otherwise the shards are read in parallel
+            target = sharded.shard(args.cohort) if args.cohort else sharded
+            engine = MLEngine(target)
+            started = time.perf_counter()
+            if not engine.train_models():
+                print("Training failed")
+                return 1
+            print(f"Trained on {engine.rows_seen:,} rows in {time.perf_counter() - started:.2f}s")
+            for row in engine.cluster_report:
+                print(f"  k={row['n_clusters']}: silhouette {row['silhouette']:.3f}, "
+                      f"{row['restarts']} fits in {row['fit_seconds']:.2f}s{' (chosen)' if row['chosen'] else ''}")
+            print(f"Clusters: {', '.join(engine.cluster_names)}")
+        return 0
+    finally:
+        sharded.close()
+
+
+# Worker-process state for run_score: each process rebuilds the engine once from the
+# pickled model state instead of receiving it with every chunk.
+_worker_engine = None
+
+
+def _init_score_worker(state: dict):
+    global _worker_engine
+    from ml_engine import MLEngine
+    _worker_engine = MLEngine.from_state(state)
+
+
+def _score_chunk(chunk):
+    result = _worker_engine.predict_batch(chunk)
+    result.insert(0, 'student_id', chunk['student_id'].to_numpy())
+    result.insert(1, 'score_id', chunk['score_id'].to_numpy())
+    return result[PREDICTION_COLUMNS]
+
+
+class PredictionSink:
+    def __init__(self, db_manager: DatabaseManager, out: str = None):
+        self.db_manager = db_manager
+        self.out = out
+        self.format = 'table' if not out else ('parquet' if out.endswith('.parquet') else 'csv')
+        self.run_id = None
+
+    def last_student_id(self) -> int:
+        if self.format == 'csv':
+            if not os.path.exists(self.out):
+                return 0
+            last = 0
+            import pandas as pd
+            for chunk in pd.read_csv(self.out, usecols=['student_id'], chunksize=500000):
+                if not chunk.empty:
+                    last = max(last, int(chunk['student_id'].max()))
+            return last
+        parts = glob.glob(os.path.join(self.out, 'part-*.parquet'))
+        return max((int(os.path.basename(p)[:-len('.parquet')].split('-')[2]) for p in parts), default=0)
+
+    def open(self, resume: bool) -> int:
+        # Prepares the output and returns the student id to continue after (0 to start over).
+        # The predictions table keeps earlier runs' rows, so its progress is tracked per run.
+        if self.format == 'table':
+            self.run_id, start_after = self.db_manager.start_score_run(resume)
+            return start_after
+        start_after = self.last_student_id() if resume else 0
+        if self.format == 'csv' and not resume and os.path.exists(self.out):
+            os.remove(self.out)
+        if self.format == 'parquet':
+            if not resume:
+                for part in glob.glob(os.path.join(self.out, 'part-*.parquet')):
+                    os.remove(part)
+            os.makedirs(self.out, exist_ok=True)
+        return start_after
+
+    def write(self, df):
+        if self.format == 'table':
+            self.db_manager.save_predictions(df, self.run_id)
+        elif self.format == 'csv':
+            header = not os.path.exists(self.out)
+            df.to_csv(self.out, mode='a', header=header, index=False)
+        else:
+            first, last = int(df['student_id'].iloc[0]), int(df['student_id'].iloc[-1])
+            df.to_parquet(os.path.join(self.out, f'part-{first:012d}-{last:012d}.parquet'), index=False)
+
+    def finish(self):
+        if self.run_id is not None:
+            self.db_manager.finish_score_run(self.run_id)
+
+
+def run_score(args) -> int:
+    from ml_engine import MLEngine
+
+    db_manager = DatabaseManager(args.db)
+    try:
+        engine = MLEngine(db_manager)
+        if not engine.ensure_models(background=False):
+            print("Could not load or train models")
+            return 1
+
+        sink = PredictionSink(db_manager, args.out)
+        if sink.format == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+            print("Parquet output requires pyarrow (pip install pyarrow)")
+            return 2
+        start_after = sink.open(args.resume)
+        if start_after:
+            print(f"Resuming after student id {start_after}")
+
+        chunks = db_manager.iter_latest_score_chunks(args.chunksize, after_student_id=start_after)
+        scored = 0
+        started = time.perf_counter()
+
+        def record(result):
+            nonlocal scored
+            sink.write(result)
+            scored += len(result)
+            elapsed = time.perf_counter() - started
+            print(f"Scored {scored:,} students ({scored / max(elapsed, 1e-9):,.0f} rows/sec), "
+                  f"last student id {int(result['student_id'].iloc[-1])}")
+
+        if args.workers <= 1:
+            _init_score_worker(engine.portable_state())
+            for chunk in chunks:
+                record(_score_chunk(chunk))
+        else:
+            # Results are written strictly in student-id order, so an interrupted run can be
+            # resumed from the highest id it wrote; in-flight chunks are bounded.
+            with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_score_worker,
+                                     initargs=(engine.portable_state(),)) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(_score_chunk, chunk))
+                    if len(pending) >= args.workers * 2:
+                        record(pending.popleft().result())
+                while pending:
+                    record(pending.popleft().result())
+        sink.finish()
+
+        elapsed = time.perf_counter() - started
+        print(f"Done: {scored:,} students in {elapsed:.2f}s ({scored / max(elapsed, 1e-9):,.0f} rows/sec)")
+        return 0
+    finally:
+        db_manager.close()
@@ -0,0 +1,137 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Names for each supported cluster count, best group first. Cluster ids are ranks: after
+# fitting, centroids are reordered so id 0 is always the strongest group.
+CLUSTER_NAME_SETS = {
+    2: ("High Performers", "At Risk"),
+    3: ("High Performers", "Average", "At Risk"),
+    4: ("High Performers", "Above Average", "Below Average", "At Risk"),
+    5: ("High Performers", "Above Average", "Average", "Below Average", "At Risk"),
+    6: ("High Performers", "Strong", "Above Average", "Below Average", "Struggling", "At Risk")
+}
+
+
+def cluster_names(n_clusters: int) -> Tuple[str, ...]:
+    return CLUSTER_NAME_SETS.get(n_clusters, tuple(f"Group {i + 1}" for i in range(n_clusters)))
+
+
+# Worker-process state: the data and silhouette sample are sent once per process by the pool
+# initializer rather than pickled with every job.
+_worker_data = None
+
+
+def _init_worker(X: np.ndarray, sample: np.ndarray, single_threaded: bool = False):
+    global _worker_data
+    _worker_data = (X, sample)
+    if single_threaded:
+        # Parallelism comes from the pool; OpenMP threads in every worker would oversubscribe
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+
+
+def _fit_candidate(n_clusters: int, seed: int) -> dict:
+    from sklearn.cluster import KMeans
+
+    X, _ = _worker_data
+    started = time.perf_counter()
+    model = KMeans(n_clusters=n_clusters, random_state=seed, n_init=1).fit(X)
+    fit_seconds = time.perf_counter() - started
+    # One label per row is too much to ship back for every restart; the winner is relabelled
+    del model.labels_
+    return {'n_clusters': n_clusters, 'seed': seed, 'model': model, 'inertia': float(model.inertia_),
+            'fit_seconds': fit_seconds}
+
+
+def _silhouette(model) -> float:
+    from sklearn.metrics import silhouette_score
+
+    _, sample = _worker_data
+    labels = model.predict(sample)
+    if not 1 < len(np.unique(labels)) < len(sample):
+        return -1.0
+    return float(silhouette_score(sample, labels))
+
+
+def cluster_order(centers: np.ndarray) -> np.ndarray:
+    # Cluster ids by descending mean centroid coordinate (the centroids are in scaled space, so
+    # each skill counts equally); lexsort's last key is the primary one and individual
+    # coordinates only break exact ties
+    keys = [-centers[:, i] for i in reversed(range(centers.shape[1]))] + [-centers.mean(axis=1)]
+    return np.lexsort(keys)
+
+
+def order_clusters(model):
+    # Renumbers clusters in cluster_order, making id 0 the strongest group regardless of the
+    # order k-means happened to find them in.
+    order = cluster_order(model.cluster_centers_)
+    model.cluster_centers_ = model.cluster_centers_[order]
+    if getattr(model, 'labels_', None) is not None:
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        model.labels_ = rank[model.labels_]
+    return model
+
+
+def select_clusters(X: np.ndarray, candidates: Sequence[int] = (2, 3, 4, 5), n_init: int = 3,
+                    random_state: int = 42, sample_size: int = 2000, max_workers: Optional[int] = None,
+                    parallel_threshold: int = 20000, min_cluster_rows: int = 10) -> Tuple[object, List[dict]]:
+    # Fits every (k, restart) pair as a single-init KMeans - in a process pool once X is large
+    # enough to pay for it - keeps the lowest-inertia restart per k and picks the k whose winner
+    # has the best silhouette on a fixed random sample of sample_size rows. Callers bound the
+    # cost on large tables by passing a sample of rows. Returns the chosen model (centroids
+    # ranked by order_clusters) and one report row per candidate with its silhouette, inertia
+    # and summed fit time.
+    X = np.ascontiguousarray(X, dtype=float)
+    valid = sorted({k for k in candidates if 1 < k < len(X)})
+    if not valid:
+        raise ValueError(f"Not enough rows ({len(X)}) to cluster")
+    # Small inputs (e.g. the synthetic bootstrap set) only get cluster counts they can fill
+    candidates = [k for k in valid if k * min_cluster_rows <= len(X)] or valid[:1]
+
+    rng = np.random.default_rng(random_state)
+    sample = X[np.sort(rng.choice(len(X), sample_size, replace=False))] if len(X) > sample_size else X
+    jobs = [(k, random_state + restart) for k in candidates for restart in range(n_init)]
+
+    def evaluate(map_function) -> Tuple[List[dict], dict]:
+        results = list(map_function(_fit_candidate, *zip(*jobs)))
+        best = {}
+        for result in results:
+            k = result['n_clusters']
+            if k not in best or result['inertia'] < best[k]['inertia']:
+                best[k] = result
+        for result, silhouette in zip(best.values(), map_function(_silhouette, [r['model'] for r in best.values()])):
+            result['silhouette'] = silhouette
+        return results, best
+
+    workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1 and len(X) >= parallel_threshold:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(X, sample, True)) as pool:
+            results, best = evaluate(pool.map)
+    else:
+        _init_worker(X, sample)
+        try:
+            results, best = evaluate(map)
+        finally:
+            _init_worker(None, None)
+
+    chosen = max(candidates, key=lambda k: (best[k]['silhouette'], -k))
+    report = []
+    for k in candidates:
+        report.append({'n_clusters': k, 'silhouette': best[k]['silhouette'], 'inertia': best[k]['inertia'],
+                       'fit_seconds': sum(r['fit_seconds'] for r in results if r['n_clusters'] == k),
+                       'restarts': n_init, 'chosen': k == chosen})
+        logger.info("k=%d silhouette=%.4f inertia=%.1f fit=%.3fs%s", k, best[k]['silhouette'],
+                    best[k]['inertia'], report[-1]['fit_seconds'], " (chosen)" if k == chosen else "")
+
+    model = order_clusters(best[chosen]['model'])
+    model.labels_ = model.predict(X)
+    return model, report
@@ -1,113 +1,906 @@
+from __future__ import annotations
+
+import logging
+import os
 import sqlite3
-import pandas as pd
-from typing import List, Tuple, Optional
+import threading
+import time
+import numpy as np
+from contextlib import contextmanager
+from typing import Callable, Hashable, Iterable, Iterator, List, Tuple, Optional, Union
+from cache import LRUCache
+from metrics import MetricsRegistry, default_registry, instrumented
+from score_matrix import ScoreMatrix
+from snapshot import ScoreSnapshot
+from stats import RunningMoments
+from lazy import LazyModule
+
+pd = LazyModule('pandas')
+
+SCORE_COLUMNS = ['math_score', 'logic_score', 'coding_score', 'communication_score']
+IMPORT_COLUMNS = ['name', 'roll_number'] + SCORE_COLUMNS + ['final_exam_score']
+PREDICTION_COLUMNS = ['student_id', 'score_id', 'predicted_score', 'cluster_id', 'cluster_name', 'recommendation']
+CHUNK_COLUMNS = {
+    'student_id': 'sc.student_id',
+    'name': 's.name',
+    'roll_number': 's.roll_number',
+    **{col: f'sc.{col}' for col in SCORE_COLUMNS + ['final_exam_score']}
+}
+
+# Running aggregates over scores kept in the single-row score_stats table: count, per-skill
+# sums, and the upper triangle of the cross-product matrix (diagonal = sums of squares).
+STAT_PAIRS = [(i, j) for i in range(len(SCORE_COLUMNS)) for j in range(i, len(SCORE_COLUMNS))]
+STAT_SUM_COLUMNS = [f'sum_{col}' for col in SCORE_COLUMNS]
+STAT_CROSS_COLUMNS = [f'cross_{SCORE_COLUMNS[i]}_{SCORE_COLUMNS[j]}' for i, j in STAT_PAIRS]
+
+
+def _stats_delta(row: str, sign: str) -> str:
+    terms = ['count = count ' + sign + ' 1']
+    terms += [f'{stat} = {stat} {sign} {row}.{col}' for stat, col in zip(STAT_SUM_COLUMNS, SCORE_COLUMNS)]
+    terms += [f'{stat} = {stat} {sign} {row}.{SCORE_COLUMNS[i]} * {row}.{SCORE_COLUMNS[j]}'
+              for stat, (i, j) in zip(STAT_CROSS_COLUMNS, STAT_PAIRS)]
+    return ', '.join(terms)
+
+
+SCORE_STATS_FIELDS = ', '.join(['count'] + STAT_SUM_COLUMNS + STAT_CROSS_COLUMNS)
+COMPUTE_SCORE_STATS = (
+    f"SELECT COUNT(*), {', '.join(f'TOTAL({col})' for col in SCORE_COLUMNS)}, "
+    f"{', '.join(f'TOTAL({SCORE_COLUMNS[i]} * {SCORE_COLUMNS[j]})' for i, j in STAT_PAIRS)} FROM scores"
+)
+REBUILD_SCORE_STATS = f"INSERT OR REPLACE INTO score_stats (id, {SCORE_STATS_FIELDS}) SELECT 1, * FROM ({COMPUTE_SCORE_STATS})"
+# Same, keeping the revision moving so a rebuilt row never looks unchanged (schema 5 onwards)
+RECOMPUTE_SCORE_STATS = (
+    f"INSERT OR REPLACE INTO score_stats (id, {SCORE_STATS_FIELDS}, revision) "
+    f"SELECT 1, *, (SELECT COALESCE(MAX(revision), 0) + 1 FROM score_stats) FROM ({COMPUTE_SCORE_STATS})"
+)
+
+# Schema migrations keyed by the PRAGMA user_version they upgrade to
+MIGRATIONS = {
+    1: [
+        'CREATE INDEX IF NOT EXISTS idx_scores_student_id ON scores(student_id, id)',
+        '''
+        CREATE VIEW IF NOT EXISTS latest_scores AS
+        SELECT s.id AS student_id, s.name, s.roll_number, sc.id AS score_id,
+               sc.math_score, sc.logic_score, sc.coding_score,
+               sc.communication_score, sc.final_exam_score
+        FROM students s
+        JOIN scores sc ON sc.id = (SELECT MAX(id) FROM scores WHERE student_id = s.id)
+        ''',
+    ],
+    2: [
+        f'''
+        CREATE TABLE IF NOT EXISTS score_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            count INTEGER NOT NULL DEFAULT 0,
+            {', '.join(f'{col} REAL NOT NULL DEFAULT 0' for col in STAT_SUM_COLUMNS + STAT_CROSS_COLUMNS)}
+        )
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS score_stats_insert AFTER INSERT ON scores
+        BEGIN
+            UPDATE score_stats SET {_stats_delta('NEW', '+')} WHERE id = 1;
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS score_stats_delete AFTER DELETE ON scores
+        BEGIN
+            UPDATE score_stats SET {_stats_delta('OLD', '-')} WHERE id = 1;
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS score_stats_update AFTER UPDATE OF {', '.join(SCORE_COLUMNS)} ON scores
+        BEGIN
+            UPDATE score_stats SET {_stats_delta('OLD', '-')} WHERE id = 1;
+            UPDATE score_stats SET {_stats_delta('NEW', '+')} WHERE id = 1;
+        END
+        ''',
+        REBUILD_SCORE_STATS,
+    ],
+    3: [
+        '''
+        CREATE TABLE IF NOT EXISTS predictions (
+            student_id INTEGER PRIMARY KEY,
+            score_id INTEGER NOT NULL,
+            predicted_score REAL NOT NULL,
+            cluster_id INTEGER NOT NULL,
+            cluster_name TEXT NOT NULL,
+            recommendation TEXT NOT NULL,
+            scored_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students(id)
+        )
+        ''',
+    ],
+    # NOCASE indexes let the roster's case-insensitive prefix filters (LIKE 'abc%') and name
+    # sort run as index range scans; the predictions indexes serve sorting/filtering by model output.
+    4: [
+        'CREATE INDEX IF NOT EXISTS idx_students_name_nocase ON students(name COLLATE NOCASE)',
+        'CREATE INDEX IF NOT EXISTS idx_students_roll_nocase ON students(roll_number COLLATE NOCASE)',
+        'CREATE INDEX IF NOT EXISTS idx_predictions_score ON predictions(predicted_score)',
+        'CREATE INDEX IF NOT EXISTS idx_predictions_cluster ON predictions(cluster_id)',
+        'CREATE INDEX IF NOT EXISTS idx_predictions_cluster_score ON predictions(cluster_id, predicted_score)',
+    ],
+    # score_stats.revision counts in-place UPDATEs of score rows (any column), which leave the
+    # row count and max id alone; caches of score contents compare it to notice edits.
+    5: [
+        'ALTER TABLE score_stats ADD COLUMN revision INTEGER NOT NULL DEFAULT 0',
+        'DROP TRIGGER IF EXISTS score_stats_update',
+        f'''
+        CREATE TRIGGER score_stats_update AFTER UPDATE ON scores
+        BEGIN
+            UPDATE score_stats SET {_stats_delta('OLD', '-')} WHERE id = 1;
+            UPDATE score_stats SET {_stats_delta('NEW', '+')}, revision = revision + 1 WHERE id = 1;
+        END
+        ''',
+    ],
+    # The roster filters predictions by cluster_name: ids are only meaningful to the model that
+    # scored a row, and stored rows may come from models with different cluster counts.
+    6: [
+        'DROP INDEX IF EXISTS idx_predictions_cluster',
+        'DROP INDEX IF EXISTS idx_predictions_cluster_score',
+        'CREATE INDEX IF NOT EXISTS idx_predictions_cluster_name ON predictions(cluster_name)',
+        'CREATE INDEX IF NOT EXISTS idx_predictions_cluster_name_score ON predictions(cluster_name, predicted_score)',
+    ],
+    # One row per batch scoring run; last_student_id moves in the same transaction as the run's
+    # predictions, so an interrupted run resumes exactly where it stopped even though the
+    # predictions table keeps every earlier run's rows.
+    7: [
+        '''
+        CREATE TABLE IF NOT EXISTS score_runs (
+            id INTEGER PRIMARY KEY,
+            started_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            finished_at TEXT,
+            last_student_id INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+    ],
+}
+SCHEMA_VERSION = max(MIGRATIONS)
+
+# Sortable roster columns and the (indexed) expression each one orders by. Sorting by
+# prediction only lists students that have a stored prediction (see the score command).
+ROSTER_SORT_COLUMNS = {
+    'student_id': 's.id',
+    'name': 's.name COLLATE NOCASE',
+    'roll_number': 's.roll_number COLLATE NOCASE',
+    'predicted_score': 'p.predicted_score',
+}
+ROSTER_COLUMNS = ['student_id', 'name', 'roll_number'] + SCORE_COLUMNS + [
+    'final_exam_score', 'predicted_score', 'cluster_id', 'cluster_name']
+# Students a filtered roster page reads in sort order before it looks matches up by index
+ROSTER_PROBE_ROWS = 5000
+
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+class TracingCursor(sqlite3.Cursor):
+    def execute(self, sql, *args):
+        self.connection.metrics.record_statement(sql)
+        return super().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        self.connection.metrics.record_statement(sql)
+        return super().executemany(sql, *args)
+
+
+class TracingConnection(sqlite3.Connection):
+    # Hands every statement's SQL to the metrics registry so slow operations can be logged
+    # with the queries they ran; pandas goes through cursor(), so that is covered too.
+    metrics = default_registry
+
+    def cursor(self, factory=TracingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, *args):
+        self.metrics.record_statement(sql)
+        return super().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        self.metrics.record_statement(sql)
+        return super().executemany(sql, *args)
+
 
 class DatabaseManager:
-    def __init__(self, db_name: str = "student_performance.db"):
+    def __init__(self, db_name: str = "student_performance.db", journal_mode: str = "WAL",
+                 synchronous: str = "NORMAL", cache_size: int = -20000,
+                 mmap_size: int = 256 * 1024 * 1024, busy_timeout: float = 5.0,
+                 max_retries: int = 5, metrics: Optional[MetricsRegistry] = None,
+                 query_cache_size: int = 256, query_cache_max_rows: int = 10000):
         self.db_name = db_name
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size
+        self.busy_timeout = busy_timeout
+        self.max_retries = max_retries
+        self.metrics = metrics or default_registry
+        
+        # One long-lived connection per thread; all of them are tracked so close() can release them
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        # Bumped after every committed write so in-memory caches can tell when to reload
+        self.write_version = 0
+        # Results of repeated reads (student list, latest scores, full table), valid while
+        # (write_version, external_version) is unchanged; external_version moves when any of our
+        # connections sees another connection's commit through PRAGMA data_version. Results of
+        # more than query_cache_max_rows rows are not kept: every hit returns a copy, and a
+        # cached copy of a large table would double its memory.
+        self.query_cache = LRUCache(query_cache_size)
+        self.query_cache_max_rows = query_cache_max_rows
+        self.external_version = 0
+        self._cache_token = None
         self.init_database()
+        
+        snapshot_prefix = None if db_name == ':memory:' else os.path.splitext(db_name)[0] + '_snapshot'
+        self.score_snapshot = ScoreSnapshot(self, snapshot_prefix)
+        # Shared by MLEngine, the GUI and the CLI so the dataset is held once per process
+        self.score_matrix = ScoreMatrix(self)
+    
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_name, timeout=self.busy_timeout,
+                                   isolation_level=None, check_same_thread=False,
+                                   factory=TracingConnection)
+            conn.metrics = self.metrics
+            self._retry(lambda: conn.execute(f'PRAGMA journal_mode={self.journal_mode}'))
+            conn.execute(f'PRAGMA synchronous={self.synchronous}')
+            conn.execute(f'PRAGMA cache_size={int(self.cache_size)}')
+            conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+            conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout * 1000)}')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    @contextmanager
+    def transaction(self):
+        conn = self.connection()
+        if self._local.depth:
+            # Nested blocks join the outermost transaction
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+        
+        self._retry(lambda: conn.execute('BEGIN IMMEDIATE'))
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            self._retry(lambda: conn.execute('COMMIT'))
+            with self._connections_lock:
+                self.write_version += 1
+        finally:
+            self._local.depth = 0
+    
+    def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+    
+    def _data_token(self) -> Tuple[int, int]:
+        # data_version is per connection and only changes for commits made by other
+        # connections (other processes, or this process's other threads); our own commits are
+        # counted by write_version. A connection's first check counts as a change, since a
+        # commit may have happened before it opened.
+        data_version = self.connection().execute('PRAGMA data_version').fetchone()[0]
+        if data_version != getattr(self._local, 'data_version', None):
+            self._local.data_version = data_version
+            with self._connections_lock:
+                self.external_version += 1
+        return self.write_version, self.external_version
+    
+    def _read_through(self, key: Hashable, load: Callable, rows: Callable = len):
+        # Serves a read from the query cache, or runs load() and caches its result. Reads inside
+        # a transaction see uncommitted rows and always go to the database. The token is taken
+        # before loading, so a result that raced with a commit is stored under the old token and
+        # never served.
+        if getattr(self._local, 'depth', 0):
+            return load()
+        token = self._data_token()
+        if token != self._cache_token:
+            self.query_cache.clear()
+            self._cache_token = token
+        key = (token, key)
+        value = self.query_cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = load()
+            if rows(value) <= self.query_cache_max_rows:
+                self.query_cache.put(key, value)
+        return value
+    
+    def _retry(self, operation):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return operation()
+            except sqlite3.OperationalError as e:
+                message = str(e).lower()
+                if attempt == self.max_retries or ('locked' not in message and 'busy' not in message):
+                    raise
+                time.sleep(min(0.05 * (2 ** attempt), 1.0))
     
     def init_database(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS students (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                roll_number TEXT UNIQUE NOT NULL
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS scores (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                student_id INTEGER NOT NULL,
-                math_score REAL NOT NULL,
-                logic_score REAL NOT NULL,
-                coding_score REAL NOT NULL,
-                communication_score REAL NOT NULL,
-                final_exam_score REAL,
-                FOREIGN KEY (student_id) REFERENCES students(id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS students (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    roll_number TEXT UNIQUE NOT NULL
+                )
+            ''')
+            
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS scores (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    student_id INTEGER NOT NULL,
+                    math_score REAL NOT NULL,
+                    logic_score REAL NOT NULL,
+                    coding_score REAL NOT NULL,
+                    communication_score REAL NOT NULL,
+                    final_exam_score REAL,
+                    FOREIGN KEY (student_id) REFERENCES students(id)
+                )
+            ''')
+            
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            for target in range(version + 1, SCHEMA_VERSION + 1):
+                for statement in MIGRATIONS[target]:
+                    conn.execute(statement)
+            if version < SCHEMA_VERSION:
+                conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
     
+    def get_schema_version(self) -> int:
+        return self.connection().execute('PRAGMA user_version').fetchone()[0]
+    
+    @instrumented('db.add_student_score')
     def add_student_score(self, name: str, roll_number: str, math_score: float,
                          logic_score: float, coding_score: float, 
                          communication_score: float, final_exam_score: Optional[float] = None) -> bool:
         try:
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT id FROM students WHERE roll_number = ?', (roll_number,))
-            result = cursor.fetchone()
-            
-            if result:
-                student_id = result[0]
-            else:
-                cursor.execute('INSERT INTO students (name, roll_number) VALUES (?, ?)', 
-                             (name, roll_number))
-                student_id = cursor.lastrowid
-            
-            cursor.execute('''
-                INSERT INTO scores (student_id, math_score, logic_score, coding_score, 
-                                  communication_score, final_exam_score)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (student_id, math_score, logic_score, coding_score, 
-                  communication_score, final_exam_score))
-            
-            conn.commit()
-            conn.close()
+            with self.transaction() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('SELECT id FROM students WHERE roll_number = ?', (roll_number,))
+                result = cursor.fetchone()
+                
+                if result:
+                    student_id = result[0]
+                else:
+                    cursor.execute('INSERT INTO students (name, roll_number) VALUES (?, ?)', 
+                                 (name, roll_number))
+                    student_id = cursor.lastrowid
+                
+                cursor.execute('''
+                    INSERT INTO scores (student_id, math_score, logic_score, coding_score, 
+                                      communication_score, final_exam_score)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (student_id, math_score, logic_score, coding_score, 
+                      communication_score, final_exam_score))
             return True
         except Exception as e:
-            print(f"Error adding student score: {e}")
+            logger.error("Error adding student score: %s", e)
+            self.metrics.mark_failed()
             return False
+
+    @instrumented('db.bulk_add_scores', rows=lambda result: result[0])
+    def bulk_add_scores(self, data: Union[pd.DataFrame, Iterable], chunksize: int = 10000,
+                        progress: Optional[Callable[[int], None]] = None,
+                        should_cancel: Optional[Callable[[], bool]] = None) -> Tuple[int, List[Tuple[int, str]]]:
+        # Accepts a DataFrame, an iterable of DataFrames (e.g. pd.read_csv(chunksize=...))
+        # or an iterable of row dicts/tuples in IMPORT_COLUMNS order. Everything is
+        # written in a single transaction; invalid rows are returned as (row, reason).
+        # progress receives the number of input rows processed after each chunk, and
+        # should_cancel returning True aborts the import with ImportCancelled (rolled back).
+        inserted = 0
+        rejects = []
+        offset = 0
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS score_import (
+                    seq INTEGER PRIMARY KEY,
+                    roll_number TEXT NOT NULL,
+                    math_score REAL NOT NULL,
+                    logic_score REAL NOT NULL,
+                    coding_score REAL NOT NULL,
+                    communication_score REAL NOT NULL,
+                    final_exam_score REAL
+                )
+            ''')
+            for chunk in self._iter_import_chunks(data, chunksize):
+                if should_cancel is not None and should_cancel():
+                    raise ImportCancelled()
+                rows, chunk_rejects = self._validate_import_chunk(chunk, offset)
+                rejects.extend(chunk_rejects)
+                offset += len(chunk)
+                if progress is not None:
+                    progress(offset)
+                if not rows:
+                    continue
+                
+                cursor.executemany('''
+                    INSERT INTO students (name, roll_number) VALUES (?, ?)
+                    ON CONFLICT(roll_number) DO NOTHING
+                ''', [(row[0], row[1]) for row in rows])
+                cursor.executemany('''
+                    INSERT INTO score_import (roll_number, math_score, logic_score, coding_score,
+                                              communication_score, final_exam_score)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', [row[1:] for row in rows])
+                cursor.execute('''
+                    INSERT INTO scores (student_id, math_score, logic_score, coding_score,
+                                        communication_score, final_exam_score)
+                    SELECT st.id, i.math_score, i.logic_score, i.coding_score,
+                           i.communication_score, i.final_exam_score
+                    FROM score_import i
+                    JOIN students st ON st.roll_number = i.roll_number
+                    ORDER BY i.seq
+                ''')
+                inserted += cursor.rowcount
+                cursor.execute('DELETE FROM score_import')
+        
+        # Keep an existing columnar snapshot current; one that was never loaded is not created
+        if inserted and self._local.depth == 0 and self.score_snapshot.exists:
+            self.score_snapshot.sync()
+        return inserted, rejects
+
+    @instrumented('db.import_csv_file', rows=lambda result: result[0])
+    def import_csv_file(self, file_path: str, chunksize: int = 50000,
+                        progress: Optional[Callable[[int, int], None]] = None,
+                        should_cancel: Optional[Callable[[], bool]] = None) -> Tuple[int, List[Tuple[int, str]]]:
+        header = pd.read_csv(file_path, nrows=0)
+        missing = [col for col in IMPORT_COLUMNS[:-1] if col not in header.columns]
+        if missing:
+            raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+        
+        on_chunk = None
+        if progress is not None:
+            total = self._count_csv_rows(file_path)
+            on_chunk = lambda done: progress(done, total)
+        
+        chunks = pd.read_csv(file_path, chunksize=chunksize,
+                             dtype={'name': str, 'roll_number': str})
+        return self.bulk_add_scores(chunks, chunksize, progress=on_chunk, should_cancel=should_cancel)
     
+    @staticmethod
+    def _count_csv_rows(file_path: str) -> int:
+        lines = 0
+        last = b'\n'
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                lines += block.count(b'\n')
+                last = block[-1:]
+        if last != b'\n':
+            lines += 1
+        return max(lines - 1, 0)
+
+    @staticmethod
+    def _iter_import_chunks(data, chunksize: int):
+        if isinstance(data, pd.DataFrame):
+            for start in range(0, len(data), chunksize):
+                yield data.iloc[start:start + chunksize]
+            return
+        
+        batch = []
+        for item in data:
+            if isinstance(item, pd.DataFrame):
+                if batch:
+                    yield pd.DataFrame(batch)
+                    batch = []
+                yield item
+                continue
+            batch.append(item if isinstance(item, dict) else dict(zip(IMPORT_COLUMNS, item)))
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch)
+
+    @staticmethod
+    def _validate_import_chunk(chunk: pd.DataFrame, offset: int) -> Tuple[list, List[Tuple[int, str]]]:
+        missing = [col for col in IMPORT_COLUMNS[:-1] if col not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        
+        n = len(chunk)
+        reasons = pd.Series([None] * n, dtype=object)
+        
+        text = {}
+        for col in ('name', 'roll_number'):
+            values = chunk[col].reset_index(drop=True)
+            stripped = values.where(values.isna(), values.astype(str).str.strip())
+            bad = stripped.isna() | (stripped == '')
+            reasons = reasons.where(~(bad & reasons.isna()), f"missing {col}")
+            text[col] = stripped
+        
+        numeric = {}
+        for col in SCORE_COLUMNS:
+            values = pd.to_numeric(chunk[col].reset_index(drop=True), errors='coerce')
+            reasons = reasons.where(~(values.isna() & reasons.isna()), f"invalid {col}")
+            numeric[col] = values
+        
+        if 'final_exam_score' in chunk.columns:
+            raw_final = chunk['final_exam_score'].reset_index(drop=True)
+            final = pd.to_numeric(raw_final, errors='coerce')
+            bad = final.isna() & raw_final.notna()
+            reasons = reasons.where(~(bad & reasons.isna()), "invalid final_exam_score")
+        else:
+            final = pd.Series([float('nan')] * n)
+        
+        valid = reasons.isna().to_numpy()
+        rejects = [(offset + int(i), reasons[i]) for i in (~valid).nonzero()[0]]
+        
+        final = final.astype(object).where(final.notna(), None)
+        columns = [text['name'], text['roll_number']] + [numeric[col] for col in SCORE_COLUMNS] + [final]
+        rows = list(zip(*(col[valid].tolist() for col in columns)))
+        return rows, rejects
+    
+    @instrumented('db.fetch_all_data', rows=len)
     def fetch_all_data(self) -> pd.DataFrame:
         try:
-            conn = sqlite3.connect(self.db_name)
             query = '''
                 SELECT s.id, s.name, s.roll_number, 
                        sc.math_score, sc.logic_score, sc.coding_score, 
-                       sc.communication_score, sc.final_exam_score
+                       sc.communication_score, sc.final_exam_score, sc.id AS score_id
                 FROM students s
                 JOIN scores sc ON s.id = sc.student_id
             '''
-            df = pd.read_sql_query(query, conn)
-            conn.close()
-            return df
+            # A copy, since callers add and rewrite columns
+            return self._read_through('fetch_all_data', lambda: self._retry(
+                lambda: pd.read_sql_query(query, self.connection()))).copy()
         except Exception as e:
-            print(f"Error fetching data: {e}")
+            logger.error("Error fetching data: %s", e)
+            self.metrics.mark_failed()
             return pd.DataFrame()
     
+    def iter_score_chunks(self, chunksize: int = 50000, columns: Optional[List[str]] = None,
+                          after_id: int = 0) -> Iterator[pd.DataFrame]:
+        # Keyset pagination over scores.id: each page is an index range scan, so memory
+        # stays bounded by chunksize no matter how large the table grows.
+        columns = columns or SCORE_COLUMNS + ['final_exam_score']
+        unknown = [col for col in columns if col not in CHUNK_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown score columns: {', '.join(unknown)}")
+        
+        select = ', '.join(f'{CHUNK_COLUMNS[col]} AS {col}' for col in columns)
+        join = 'JOIN students s ON s.id = sc.student_id' if any(col in ('name', 'roll_number') for col in columns) else ''
+        query = f'''
+            SELECT sc.id AS score_id, {select}
+            FROM scores sc {join}
+            WHERE sc.id > ?
+            ORDER BY sc.id
+            LIMIT ?
+        '''
+        last_id = after_id
+        while True:
+            with self.metrics.timer('db.iter_score_chunks') as timing:
+                chunk = self._retry(lambda: pd.read_sql_query(query, self.connection(), params=(last_id, chunksize)))
+                timing.rows = len(chunk)
+            if chunk.empty:
+                return
+            yield chunk
+            last_id = int(chunk['score_id'].iloc[-1])
+            if len(chunk) < chunksize:
+                return
+    
+    def iter_score_arrays(self, after_id: int = 0, until_id: Optional[int] = None,
+                          chunksize: int = 100000) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        # Like iter_score_chunks but straight from the cursor into numpy, skipping pandas:
+        # yields (int64 [n, 2] score/student ids, float32 [n, 5] skills + final with NaN).
+        query = f'''
+            SELECT id, student_id, {', '.join(SCORE_COLUMNS)}, final_exam_score
+            FROM scores
+            WHERE id > ? AND id <= ?
+            ORDER BY id
+        '''
+        cursor = self.connection().execute(query, (after_id, until_id if until_id is not None else 2 ** 63 - 1))
+        while True:
+            with self.metrics.timer('db.iter_score_arrays') as timing:
+                rows = cursor.fetchmany(chunksize)
+                timing.rows = len(rows)
+            if not rows:
+                return
+            data = np.array(rows, dtype=np.float64)
+            yield data[:, :2].astype(np.int64), data[:, 2:].astype(np.float32)
+    
+    @instrumented('db.load_score_snapshot', rows=lambda arrays: len(arrays[0]))
+    def load_score_snapshot(self) -> Tuple[np.ndarray, np.ndarray]:
+        # Syncs the columnar snapshot with the scores table and memory-maps it
+        return self.score_snapshot.load()
+    
+    @instrumented('db.score_moments', rows=lambda moments: moments.count)
+    def score_moments(self, chunksize: int = 50000) -> RunningMoments:
+        moments = RunningMoments(len(SCORE_COLUMNS))
+        for chunk in self.iter_score_chunks(chunksize, columns=SCORE_COLUMNS):
+            moments.update(chunk[SCORE_COLUMNS].to_numpy(dtype=float))
+        return moments
+    
+    @instrumented('db.get_score_moments')
+    def get_score_moments(self) -> RunningMoments:
+        # O(1): reads the trigger-maintained aggregates instead of scanning scores
+        row = self._retry(lambda: self.connection().execute(
+            f"SELECT {SCORE_STATS_FIELDS} FROM score_stats WHERE id = 1").fetchone())
+        if row is None:
+            return RunningMoments(len(SCORE_COLUMNS))
+        return self._moments_from_stats_row(row)
+    
+    @staticmethod
+    def _moments_from_stats_row(row) -> RunningMoments:
+        n = len(SCORE_COLUMNS)
+        count, sums, cross_values = row[0], row[1:n + 1], row[n + 1:]
+        cross = np.zeros((n, n))
+        for (i, j), value in zip(STAT_PAIRS, cross_values):
+            cross[i, j] = cross[j, i] = value
+        return RunningMoments.from_sums(count, np.array(sums, dtype=float), cross)
+    
+    @instrumented('db.verify_score_stats')
+    def verify_score_stats(self, tolerance: float = 1e-6) -> bool:
+        stored = self._retry(lambda: self.connection().execute(
+            f"SELECT {SCORE_STATS_FIELDS} FROM score_stats WHERE id = 1").fetchone())
+        actual = self._retry(lambda: self.connection().execute(COMPUTE_SCORE_STATS).fetchone())
+        if stored is None:
+            return False
+        return bool(np.allclose(stored, actual, rtol=tolerance, atol=tolerance))
+    
+    @instrumented('db.rebuild_score_stats')
+    def rebuild_score_stats(self):
+        with self.transaction() as conn:
+            conn.execute(RECOMPUTE_SCORE_STATS)
+    
+    def get_score_version(self) -> Tuple[int, int]:
+        # (row count, max score id) in O(1), from score_stats and the rowid b-tree
+        return self.get_score_state()[:2]
+    
+    def get_score_state(self) -> Tuple[int, int, int]:
+        # (row count, max score id, revision) in O(1). Appends and deletes move the first two;
+        # the revision moves when existing rows are edited.
+        row = self._retry(lambda: self.connection().execute(
+            'SELECT count, revision, (SELECT MAX(id) FROM scores) FROM score_stats WHERE id = 1').fetchone())
+        if row is None:
+            return 0, 0, 0
+        return row[0] or 0, row[2] or 0, row[1]
+    
+    @instrumented('db.get_score_summary')
+    def get_score_summary(self) -> Tuple[int, int]:
+        count, max_id = self._retry(lambda: self.connection().execute(
+            'SELECT COUNT(*), MAX(id) FROM scores').fetchone())
+        return count, max_id or 0
+    
+    @instrumented('db.fetch_latest_scores', rows=len)
+    def fetch_latest_scores(self) -> pd.DataFrame:
+        try:
+            query = '''
+                SELECT student_id, name, roll_number, score_id,
+                       math_score, logic_score, coding_score,
+                       communication_score, final_exam_score
+                FROM latest_scores
+                ORDER BY student_id
+            '''
+            return self._retry(lambda: pd.read_sql_query(query, self.connection()))
+        except Exception as e:
+            logger.error("Error fetching latest scores: %s", e)
+            self.metrics.mark_failed()
+            return pd.DataFrame()
+    
+    def iter_latest_score_chunks(self, chunksize: int = 50000, after_student_id: int = 0) -> Iterator[pd.DataFrame]:
+        query = '''
+            SELECT student_id, name, roll_number, score_id,
+                   math_score, logic_score, coding_score,
+                   communication_score, final_exam_score
+            FROM latest_scores
+            WHERE student_id > ?
+            ORDER BY student_id
+            LIMIT ?
+        '''
+        last_id = after_student_id
+        while True:
+            with self.metrics.timer('db.iter_latest_score_chunks') as timing:
+                chunk = self._retry(lambda: pd.read_sql_query(query, self.connection(), params=(last_id, chunksize)))
+                timing.rows = len(chunk)
+            if chunk.empty:
+                return
+            yield chunk
+            last_id = int(chunk['student_id'].iloc[-1])
+            if len(chunk) < chunksize:
+                return
+    
+    @instrumented('db.save_predictions', rows=lambda count: count)
+    def save_predictions(self, df: pd.DataFrame, run_id: Optional[int] = None) -> int:
+        # With a run_id, also records the highest student id that run has saved
+        rows = df[PREDICTION_COLUMNS].itertuples(index=False, name=None)
+        with self.transaction() as conn:
+            conn.executemany(f'''
+                INSERT OR REPLACE INTO predictions ({', '.join(PREDICTION_COLUMNS)})
+                VALUES ({', '.join('?' * len(PREDICTION_COLUMNS))})
+            ''', ((int(r[0]), int(r[1]), float(r[2]), int(r[3]), r[4], r[5]) for r in rows))
+            if run_id is not None and len(df):
+                conn.execute('UPDATE score_runs SET last_student_id = MAX(last_student_id, ?) WHERE id = ?',
+                             (int(df['student_id'].max()), run_id))
+        return len(df)
+    
+    @instrumented('db.start_score_run')
+    def start_score_run(self, resume: bool = False) -> Tuple[int, int]:
+        # (run id, student id to continue after). Resuming continues the latest run if it never
+        # finished; otherwise a new run starts from the first student.
+        with self.transaction() as conn:
+            if resume:
+                row = conn.execute(
+                    'SELECT id, last_student_id, finished_at FROM score_runs ORDER BY id DESC LIMIT 1').fetchone()
+                if row is not None and row[2] is None:
+                    return row[0], row[1]
+            return conn.execute('INSERT INTO score_runs DEFAULT VALUES').lastrowid, 0
+    
+    @instrumented('db.finish_score_run')
+    def finish_score_run(self, run_id: int):
+        with self.transaction() as conn:
+            conn.execute('UPDATE score_runs SET finished_at = CURRENT_TIMESTAMP WHERE id = ?', (run_id,))
+    
+    def _roster_branches(self, search: Optional[str], cluster_name: Optional[str]) -> List[Tuple[List[str], list]]:
+        # The filter as disjoint (conditions, params) branches with one index each: name
+        # matches, then roll number matches whose name does not match. A single OR would
+        # make SQLite collect every match of both indexes before it could sort them.
+        cluster = (['p.cluster_name = ?'], [cluster_name]) if cluster_name is not None else ([], [])
+        if not search:
+            return [cluster]
+        pattern = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        name_like, roll_like = "s.name LIKE ? ESCAPE '\\'", "s.roll_number LIKE ? ESCAPE '\\'"
+        return [([name_like] + cluster[0], [pattern] + cluster[1]),
+                ([roll_like, f'NOT {name_like}'] + cluster[0], [pattern, pattern] + cluster[1])]
+    
+    @instrumented('db.roster_page', rows=len)
+    def roster_page(self, sort: str = 'student_id', descending: bool = False, limit: int = 100,
+                    after: Optional[tuple] = None, before: Optional[tuple] = None,
+                    search: Optional[str] = None, cluster_name: Optional[str] = None) -> pd.DataFrame:
+        # Keyset pagination over students in (sort column, id) order. after/before take the
+        # (sort value, student_id) key of the boundary row; before pages backwards from it.
+        # The page's ids are found first and only those rows are joined to their latest scores.
+        if sort not in ROSTER_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort roster by {sort}")
+        needs_prediction = cluster_name is not None or sort == 'predicted_score'
+        # Tie-break on the id of the driving table so ORDER BY matches an index's rowid order
+        id_expr = 'p.student_id' if needs_prediction and sort in ('student_id', 'predicted_score') else 's.id'
+        sort_expr = id_expr if sort == 'student_id' else ROSTER_SORT_COLUMNS[sort]
+        
+        backwards = before is not None
+        key = before if backwards else after
+        keyset, key_params = [], []
+        if key is not None:
+            op = '>' if descending == backwards else '<'
+            if sort == 'student_id':
+                keyset.append(f'{id_expr} {op} ?')
+                key_params.append(key[1])
+            else:
+                # The redundant single-column bound lets SQLite range-scan the index
+                keyset.append(f'{sort_expr} {op}= ? AND ({sort_expr}, {id_expr}) {op} (?, ?)')
+                key_params += [key[0], key[0], key[1]]
+        direction = 'DESC' if descending != backwards else 'ASC'
+        order = id_expr if sort == 'student_id' else f'{sort_expr} {direction}, {id_expr}'
+        collate = ' COLLATE NOCASE' if sort in ('name', 'roll_number') else ''
+        
+        def in_order(conditions: List[str], params: list, row_limit: int) -> Tuple[str, list]:
+            # (student_id, sort_key) of the first row_limit matches in sort order
+            where = ' AND '.join(conditions + keyset)
+            query = f'''
+                SELECT * FROM (
+                    SELECT {id_expr} AS student_id, {sort_expr} AS sort_key
+                    FROM students s {'JOIN predictions p ON p.student_id = s.id' if needs_prediction else ''}
+                    {'WHERE ' + where if where else ''}
+                    ORDER BY {order} {direction} LIMIT ?)
+            '''
+            return query, params + key_params + [row_limit]
+        
+        def fetch_ids(query: str, params: list) -> List[int]:
+            return [row[0] for row in self._retry(lambda: self.connection().execute(query, params).fetchall())]
+        
+        branches = self._roster_branches(search, cluster_name)
+        if not search and (cluster_name is None or sort in ('student_id', 'predicted_score')):
+            # idx_predictions_cluster_name(_score) hold each cluster in id and score order
+            ids = fetch_ids(*in_order(*branches[0], limit))
+        else:
+            # Probe the next students in sort order first: whenever matches are common that
+            # fills the page from the sort index alone. Otherwise look the matches up through
+            # each branch's own index, sorting and limiting every branch before merging them.
+            # CROSS JOIN keeps SQLite from driving the probe from a whole cluster's index.
+            probe, params = in_order([], [], max(ROSTER_PROBE_ROWS, limit))
+            matches = ' OR '.join(f"({' AND '.join(conditions)})" for conditions, _ in branches)
+            ids = fetch_ids(f'''
+                SELECT page.student_id FROM ({probe}) page
+                CROSS JOIN students s ON s.id = page.student_id
+                {'CROSS JOIN predictions p ON p.student_id = s.id' if cluster_name is not None else ''}
+                WHERE {matches}
+                ORDER BY page.sort_key{collate} {direction}, page.student_id {direction}
+                LIMIT ?
+            ''', params + [value for _, branch_params in branches for value in branch_params] + [limit])
+            if len(ids) < limit:
+                parts = [in_order(conditions, branch_params, limit) for conditions, branch_params in branches]
+                ids = fetch_ids(f'''
+                    SELECT student_id FROM ({' UNION ALL '.join(query for query, _ in parts)})
+                    ORDER BY sort_key{collate} {direction}, student_id {direction}
+                    LIMIT ?
+                ''', [value for _, part_params in parts for value in part_params] + [limit])
+        if not ids:
+            return pd.DataFrame(columns=ROSTER_COLUMNS)
+        if backwards:
+            ids.reverse()
+        
+        query = f'''
+            SELECT s.id AS student_id, s.name, s.roll_number,
+                   sc.math_score, sc.logic_score, sc.coding_score, sc.communication_score,
+                   sc.final_exam_score, p.predicted_score, p.cluster_id, p.cluster_name
+            FROM students s
+            LEFT JOIN predictions p ON p.student_id = s.id
+            LEFT JOIN scores sc ON sc.id = (SELECT MAX(id) FROM scores WHERE student_id = s.id)
+            WHERE s.id IN ({', '.join('?' * len(ids))})
+        '''
+        page = self._retry(lambda: pd.read_sql_query(query, self.connection(), params=ids))
+        return page.set_index('student_id').loc[ids].reset_index()
+    
+    @instrumented('db.roster_count')
+    def roster_count(self, search: Optional[str] = None, cluster_name: Optional[str] = None,
+                     require_prediction: bool = False) -> int:
+        needs_prediction = cluster_name is not None or require_prediction
+        total = 0
+        for conditions, params in self._roster_branches(search, cluster_name):
+            query = f'''
+                SELECT COUNT(*) FROM students s
+                {'JOIN predictions p ON p.student_id = s.id' if needs_prediction else ''}
+                {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+            '''
+            total += self._retry(lambda: self.connection().execute(query, params).fetchone()[0])
+        return total
+    
+    @instrumented('db.get_students_list', rows=len)
     def get_students_list(self) -> List[Tuple[int, str, str]]:
         try:
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
-            cursor.execute('SELECT id, name, roll_number FROM students')
-            students = cursor.fetchall()
-            conn.close()
-            return students
+            return list(self._read_through('get_students_list', lambda: self._retry(
+                lambda: self.connection().execute('SELECT id, name, roll_number FROM students').fetchall())))
         except Exception as e:
-            print(f"Error fetching students list: {e}")
+            logger.error("Error fetching students list: %s", e)
+            self.metrics.mark_failed()
             return []
     
+    @instrumented('db.fetch_students_since', rows=len)
+    def fetch_students_since(self, student_id: int) -> List[Tuple[int, str, str]]:
+        return self._retry(lambda: self.connection().execute(
+            'SELECT id, name, roll_number FROM students WHERE id > ? ORDER BY id', (student_id,)).fetchall())
+    
+    def get_student_version(self) -> Tuple[int, int]:
+        # (row count, max student id)
+        row = self._retry(lambda: self.connection().execute(
+            'SELECT COUNT(*), MAX(id) FROM students').fetchone())
+        return row[0], row[1] or 0
+    
+    @instrumented('db.get_student_scores')
     def get_student_scores(self, student_id: int) -> Optional[dict]:
         try:
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT math_score, logic_score, coding_score, communication_score, final_exam_score
-                FROM scores
-                WHERE student_id = ?
-                ORDER BY id DESC
-                LIMIT 1
-            ''', (student_id,))
-            result = cursor.fetchone()
-            conn.close()
+            result = self._read_through(('get_student_scores', student_id), lambda: self._retry(
+                lambda: self.connection().execute('''
+                    SELECT math_score, logic_score, coding_score, communication_score, final_exam_score
+                    FROM scores
+                    WHERE student_id = ?
+                    ORDER BY id DESC
+                    LIMIT 1
+                ''', (student_id,)).fetchone()), rows=lambda row: 1)
             
             if result:
                 return {
@@ -119,18 +912,20 @@ class DatabaseManager:
                 }
             return None
         except Exception as e:
-            print(f"Error fetching student scores: {e}")
+            logger.error("Error fetching student scores: %s", e)
+            self.metrics.mark_failed()
             return None
     
+    @instrumented('db.clear_database')
     def clear_database(self):
         try:
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM scores')
-            cursor.execute('DELETE FROM students')
-            conn.commit()
-            conn.close()
+            with self.transaction() as conn:
+                conn.execute('DELETE FROM predictions')
+                conn.execute('DELETE FROM scores')
+                conn.execute('DELETE FROM students')
+                conn.execute(RECOMPUTE_SCORE_STATS)
             return True
         except Exception as e:
-            print(f"Error clearing database: {e}")
+            logger.error("Error clearing database: %s", e)
+            self.metrics.mark_failed()
             return False
\ No newline at end of file
@@ -0,0 +1,115 @@
+import tkinter as tk
+from tkinter import ttk, filedialog
+
+from metrics import MetricsRegistry
+
+OPERATION_COLUMNS = [('operation', 200), ('calls', 70), ('errors', 60), ('rows', 90),
+                     ('mean_ms', 80), ('p95_ms', 80), ('max_ms', 80)]
+SLOW_COLUMNS = [('time', 140), ('operation', 170), ('ms', 80), ('rows', 70), ('sql', 420)]
+
+
+class DiagnosticsWindow:
+    # Live view of the metrics registry: per-operation latency table, prediction and query
+    # cache stats and the slow-query log. Refreshes itself while open.
+    def __init__(self, root: tk.Tk, metrics: MetricsRegistry, ml_engine=None, refresh_ms: int = 1000):
+        self.metrics = metrics
+        self.ml_engine = ml_engine
+        self.refresh_ms = refresh_ms
+        self.window = tk.Toplevel(root)
+        self.window.title("Diagnostics")
+        self.window.geometry("900x600")
+        self._after_id = None
+
+        frame = ttk.Frame(self.window, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        ttk.Label(frame, text="Operations", style='Header.TLabel').pack(anchor='w')
+        self.operations = self._make_tree(frame, OPERATION_COLUMNS, height=12)
+
+        self.cache_label = ttk.Label(frame, text="Prediction cache: -")
+        self.cache_label.pack(anchor='w', pady=(6, 0))
+        self.query_cache_label = ttk.Label(frame, text="Query cache: -")
+        self.query_cache_label.pack(anchor='w')
+        self.matrix_label = ttk.Label(frame, text="Score matrix: -")
+        self.matrix_label.pack(anchor='w', pady=(0, 6))
+
+        threshold = ttk.Frame(frame)
+        threshold.pack(fill=tk.X)
+        ttk.Label(threshold, text="Slow operations (ms >=").pack(side=tk.LEFT)
+        self.threshold_var = tk.StringVar(value=f"{metrics.slow_threshold_ms:g}")
+        entry = ttk.Entry(threshold, textvariable=self.threshold_var, width=8)
+        entry.pack(side=tk.LEFT, padx=4)
+        entry.bind('<Return>', self._set_threshold)
+        ttk.Label(threshold, text=")").pack(side=tk.LEFT)
+        self.slow_log = self._make_tree(frame, SLOW_COLUMNS, height=8)
+
+        buttons = ttk.Frame(frame)
+        buttons.pack(fill=tk.X, pady=(8, 0))
+        ttk.Button(buttons, text="Export JSON", command=lambda: self.export('.json')).pack(side=tk.LEFT, padx=4)
+        ttk.Button(buttons, text="Export Prometheus", command=lambda: self.export('.prom')).pack(side=tk.LEFT, padx=4)
+        ttk.Button(buttons, text="Reset", command=self.reset).pack(side=tk.LEFT, padx=4)
+
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.refresh()
+
+    @staticmethod
+    def _make_tree(parent, columns, height: int) -> ttk.Treeview:
+        tree = ttk.Treeview(parent, columns=[name for name, _ in columns], show='headings', height=height)
+        for name, width in columns:
+            tree.heading(name, text=name)
+            tree.column(name, width=width, anchor='w' if name in ('operation', 'sql', 'time') else 'e')
+        tree.pack(fill=tk.BOTH, expand=True, pady=4)
+        return tree
+
+    def refresh(self):
+        snapshot = self.metrics.snapshot()
+        self.operations.delete(*self.operations.get_children())
+        for name, stats in snapshot['operations'].items():
+            self.operations.insert('', tk.END, values=(
+                name, stats['calls'], stats['errors'], stats['rows'],
+                f"{stats['mean_ms']:.2f}", f"{stats['p95_ms']:.2f}", f"{stats['max_ms']:.2f}"))
+
+        self.slow_log.delete(*self.slow_log.get_children())
+        for entry in reversed(snapshot['slow_log']):
+            self.slow_log.insert('', tk.END, values=(
+                entry['time'], entry['operation'], f"{entry['ms']:.1f}", entry['rows'] if entry['rows'] is not None else '',
+                ' | '.join(entry['sql'])))
+
+        if self.ml_engine is not None:
+            cache = self.ml_engine.prediction_cache.stats()
+            self.cache_label.config(text=(
+                f"Prediction cache: {cache['size']}/{cache['capacity']} entries, "
+                f"{cache['hits']} hits, {cache['misses']} misses, {cache['evictions']} evictions "
+                f"({cache['hit_rate']:.0%} hit rate), model version {self.ml_engine.model_version}"))
+            db_manager = self.ml_engine.db_manager
+            queries = db_manager.query_cache.stats()
+            self.query_cache_label.config(text=(
+                f"Query cache: {queries['size']}/{queries['capacity']} entries, "
+                f"{queries['hits']} hits, {queries['misses']} misses ({queries['hit_rate']:.0%} hit rate), "
+                f"write version {db_manager.write_version}, external version {db_manager.external_version}"))
+            matrix = db_manager.score_matrix.stats()
+            self.matrix_label.config(text=(
+                f"Score matrix: {matrix['rows']:,} rows, {matrix['students']:,} students, "
+                f"{matrix['bytes'] / 2 ** 20:.1f} MiB"))
+
+        self._after_id = self.window.after(self.refresh_ms, self.refresh)
+
+    def _set_threshold(self, event=None):
+        try:
+            self.metrics.slow_threshold_ms = float(self.threshold_var.get())
+        except ValueError:
+            self.threshold_var.set(f"{self.metrics.slow_threshold_ms:g}")
+
+    def export(self, extension: str):
+        file_types = [("Prometheus text", "*.prom")] if extension == '.prom' else [("JSON", "*.json")]
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=extension, filetypes=file_types)
+        if path:
+            self.metrics.write(path)
+
+    def reset(self):
+        self.metrics.reset()
+
+    def close(self):
+        if self._after_id is not None:
+            self.window.after_cancel(self._after_id)
+        self.window.destroy()
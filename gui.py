@@ -1,15 +1,21 @@
+import logging
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import pandas as pd
-import seaborn as sns
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
-from db_manager import DatabaseManager
+from typing import Optional
+from db_manager import DatabaseManager, ImportCancelled
 from ml_engine import MLEngine
+from startup_profiler import StartupProfiler
+from student_index import StudentDirectory
+from worker import BackgroundWorker
+
+# matplotlib is imported when the analysis tab is first opened
+
+logger = logging.getLogger(__name__)
 
 
 class StudentProfilerApp:
-    def __init__(self, root: tk.Tk):
+    def __init__(self, root: tk.Tk, profiler: StartupProfiler = None):
+        profiler = profiler or StartupProfiler(enabled=False)
         self.root = root
         self.root.title("Student Skills & Performance Profiler")
         self.root.geometry("1100x720")
@@ -43,8 +49,14 @@ class StudentProfilerApp:
 
         self.root.configure(background=self.bg)
 
-        self.db_manager = DatabaseManager()
+        with profiler.phase('database'):
+            self.db_manager = DatabaseManager()
         self.ml_engine = MLEngine(self.db_manager)
+        self.student_directory = StudentDirectory(self.db_manager)
+        self._search_after_id = None
+        self.worker = BackgroundWorker(self.root)
+        self.import_task = None
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         container = ttk.Frame(self.root, style='TFrame')
         container.pack(fill=tk.BOTH, expand=True)
@@ -65,8 +77,14 @@ class StudentProfilerApp:
         self.btn_analysis.pack(fill=tk.X, pady=6)
         self.btn_predict = tk.Button(nav_frame, text='Prediction', command=self._on_tab_select_2, bg=self.muted, fg='white', font=('Segoe UI', 10), relief=tk.FLAT, padx=8, pady=6, cursor='hand2')
         self.btn_predict.pack(fill=tk.X, pady=6)
+        self.btn_roster = tk.Button(nav_frame, text='Roster', command=self._on_tab_select_3, bg=self.muted, fg='white', font=('Segoe UI', 10), relief=tk.FLAT, padx=8, pady=6, cursor='hand2')
+        self.btn_roster.pack(fill=tk.X, pady=6)
         
-        self.nav_buttons = [self.btn_data, self.btn_analysis, self.btn_predict]
+        self.nav_buttons = [self.btn_data, self.btn_analysis, self.btn_predict, self.btn_roster]
+
+        ttk.Button(sidebar, text='Diagnostics', command=self.open_diagnostics).pack(side=tk.BOTTOM, fill=tk.X)
+        self.diagnostics = None
+        self.chart_refresh_interval = 2000
 
         # Main content area
         content = ttk.Frame(container, style='TFrame')
@@ -75,24 +93,61 @@ class StudentProfilerApp:
         self.notebook = ttk.Notebook(content)
         self.notebook.pack(fill=tk.BOTH, expand=True)
 
-        self.create_data_entry_tab()
-        self.create_analysis_tab()
-        self.create_prediction_tab()
-
-        self.ml_engine.train_models()
+        # Tabs other than data entry are built the first time they are opened
+        self.tab_frames = []
+        for _ in range(4):
+            frame = ttk.Frame(self.notebook, style='TFrame')
+            self.notebook.add(frame, text="")
+            self.tab_frames.append(frame)
+        self.tab_builders = [self.create_data_entry_tab, self.create_analysis_tab, self.create_prediction_tab,
+                             self.create_roster_tab]
+        self.built_tabs = set()
+
+        with profiler.phase('data entry tab'):
+            self._ensure_tab(0)
+
+        # Model loading imports scikit-learn, so start it once the window is up
+        self.root.after(100, lambda: self.worker.submit(self.ml_engine.ensure_models))
+
+    def on_close(self):
+        if self.import_task is not None:
+            self.import_task.cancel()
+        self.worker.shutdown()
+        self.root.destroy()
+
+    def open_diagnostics(self):
+        from diagnostics import DiagnosticsWindow
+
+        if self.diagnostics is not None and self.diagnostics.window.winfo_exists():
+            self.diagnostics.window.lift()
+            return
+        self.diagnostics = DiagnosticsWindow(self.root, self.db_manager.metrics, self.ml_engine)
+
+    def _ensure_tab(self, index):
+        if index not in self.built_tabs:
+            self.built_tabs.add(index)
+            self.tab_builders[index]()
 
     def _on_tab_select_0(self):
+        self._ensure_tab(0)
         self.notebook.select(0)
         self._update_nav_buttons(0)
     
     def _on_tab_select_1(self):
+        self._ensure_tab(1)
         self.notebook.select(1)
         self._update_nav_buttons(1)
     
     def _on_tab_select_2(self):
+        self._ensure_tab(2)
         self.notebook.select(2)
         self._update_nav_buttons(2)
     
+    def _on_tab_select_3(self):
+        self._ensure_tab(3)
+        self.notebook.select(3)
+        self._update_nav_buttons(3)
+    
     def _update_nav_buttons(self, active_index):
         for i, btn in enumerate(self.nav_buttons):
             if i == active_index:
@@ -101,8 +156,7 @@ class StudentProfilerApp:
                 btn.config(bg=self.muted, font=('Segoe UI', 10))
 
     def create_data_entry_tab(self):
-        tab1 = ttk.Frame(self.notebook, style='TFrame')
-        self.notebook.add(tab1, text="")
+        tab1 = self.tab_frames[0]
 
         card = ttk.Frame(tab1, style='Card.TFrame', padding=14)
         card.place(relx=0.03, rely=0.03, relwidth=0.94, relheight=0.92)
@@ -144,13 +198,20 @@ class StudentProfilerApp:
         ttk.Button(button_frame, text="Save to DB", command=self.save_student, style='Accent.TButton').pack(side=tk.LEFT, padx=6)
         ttk.Button(button_frame, text="Import CSV", command=self.import_csv).pack(side=tk.LEFT, padx=6)
         ttk.Button(button_frame, text="Clear Database", command=self.clear_db).pack(side=tk.LEFT, padx=6)
+        self.cancel_import_button = ttk.Button(button_frame, text="Cancel Import", command=self.cancel_import, state='disabled')
+        self.cancel_import_button.pack(side=tk.LEFT, padx=6)
 
         self.status_label = ttk.Label(card, text="", foreground='green')
         self.status_label.grid(row=9, column=0, columnspan=2, pady=10, sticky='w')
 
+        self.import_progress = ttk.Progressbar(card, orient='horizontal', length=400, mode='determinate')
+
     def create_analysis_tab(self):
-        tab2 = ttk.Frame(self.notebook, style='TFrame')
-        self.notebook.add(tab2, text="")
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+        from charts import ClassCharts
+
+        tab2 = self.tab_frames[1]
 
         panel = ttk.Frame(tab2, style='Card.TFrame', padding=12)
         panel.place(relx=0.03, rely=0.03, relwidth=0.94, relheight=0.92)
@@ -158,17 +219,23 @@ class StudentProfilerApp:
         header = ttk.Label(panel, text='Class Visualizations', style='Header.TLabel')
         header.pack(anchor='w')
 
-        ttk.Button(panel, text="Refresh Visualizations", command=self.update_visualizations).pack(anchor='w', pady=8)
+        controls = ttk.Frame(panel, style='Card.TFrame')
+        controls.pack(anchor='w', pady=8)
+        ttk.Button(controls, text="Refresh Visualizations", command=self.update_visualizations).pack(side=tk.LEFT)
+        self.auto_refresh_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(controls, text="Auto-refresh", variable=self.auto_refresh_var).pack(side=tk.LEFT, padx=12)
 
         self.fig = Figure(figsize=(10, 6), facecolor=self.panel)
+        self.charts = ClassCharts(self.fig)
         self.canvas = FigureCanvasTkAgg(self.fig, panel)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.chart_refresh_pending = False
 
         self.update_visualizations()
+        self.root.after(self.chart_refresh_interval, self._auto_refresh_charts)
 
     def create_prediction_tab(self):
-        tab3 = ttk.Frame(self.notebook, style='TFrame')
-        self.notebook.add(tab3, text="")
+        tab3 = self.tab_frames[2]
 
         panel = ttk.Frame(tab3, style='Card.TFrame', padding=12)
         panel.place(relx=0.03, rely=0.03, relwidth=0.94, relheight=0.92)
@@ -178,11 +245,14 @@ class StudentProfilerApp:
 
         ttk.Label(panel, text="Select Student:").grid(row=1, column=0, sticky='w', pady=8)
         self.student_var = tk.StringVar()
-        self.student_combo = ttk.Combobox(panel, textvariable=self.student_var, width=48, state="readonly")
+        # Editable so it doubles as a type-ahead search box; the dropdown only holds the top matches
+        self.student_combo = ttk.Combobox(panel, textvariable=self.student_var, width=48)
         self.student_combo.grid(row=1, column=1, pady=8, padx=6, sticky='w')
         self.student_combo.bind("<<ComboboxSelected>>", self.load_student_scores)
+        self.student_combo.bind("<Return>", self.load_student_scores)
+        self.student_combo.bind("<KeyRelease>", self._on_student_search)
 
-        ttk.Button(panel, text="Refresh Students", command=self.refresh_students).grid(row=1, column=2, padx=6)
+        ttk.Button(panel, text="Refresh Students", command=lambda: self.refresh_students(force=True)).grid(row=1, column=2, padx=6)
 
         self.scores_frame = ttk.LabelFrame(panel, text="Current Scores", padding=10)
         self.scores_frame.grid(row=2, column=0, columnspan=3, sticky='we', pady=10)
@@ -215,9 +285,28 @@ class StudentProfilerApp:
         self.recommendation_label = ttk.Label(self.prediction_frame, text="Recommendation: -", font=("Segoe UI", 10), wraplength=700)
         self.recommendation_label.pack(anchor='w', pady=4)
 
+        self.whatif_label = ttk.Label(self.prediction_frame, text="What it takes: -", font=("Segoe UI", 10), justify='left')
+        self.whatif_label.pack(anchor='w', pady=4)
+
+        self.export_whatif_button = ttk.Button(panel, text="Export Class What-If...", command=self.export_class_whatif)
+        self.export_whatif_button.grid(row=5, column=0, columnspan=3, sticky='w', pady=10)
+
         self.refresh_students()
 
-    # The rest of the methods are kept same behavior as before but scoped to this class
+    def create_roster_tab(self):
+        from roster import RosterView
+
+        panel = ttk.Frame(self.tab_frames[3], style='Card.TFrame', padding=12)
+        panel.place(relx=0.03, rely=0.03, relwidth=0.94, relheight=0.92)
+
+        ttk.Label(panel, text='Student Roster', style='Header.TLabel').pack(anchor='w', pady=(0, 8))
+        self.roster = RosterView(panel, self.db_manager, self.ml_engine, self.worker)
+
+    # The rest of the methods are kept same behavior as before but scoped to this class.
+    # Database and model work runs on self.worker; callbacks come back on the Tk thread.
+    def request_retrain(self):
+        self.worker.submit_coalesced('retrain', self.ml_engine.update_models)
+
     def save_student(self):
         try:
             name = self.name_entry.get().strip()
@@ -234,18 +323,25 @@ class StudentProfilerApp:
 
             final_score = float(final) if final else None
 
-            if self.db_manager.add_student_score(name, roll, math, logic, coding, comm, final_score):
-                self.status_label.config(text="Student Added Successfully!", foreground="green")
-                self.clear_entries()
-                self.ml_engine.train_models()
-                self.refresh_students()
-            else:
-                self.status_label.config(text="Error adding student", foreground="red")
+            self.worker.submit(self.db_manager.add_student_score, name, roll, math, logic, coding, comm, final_score,
+                               on_done=self._on_student_saved, on_error=self._on_task_error)
         except ValueError:
             messagebox.showerror("Error", "Please enter valid numeric scores")
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
 
+    def _on_student_saved(self, saved: bool):
+        if saved:
+            self.status_label.config(text="Student Added Successfully!", foreground="green")
+            self.clear_entries()
+            self.request_retrain()
+            self.refresh_students()
+        else:
+            self.status_label.config(text="Error adding student", foreground="red")
+
+    def _on_task_error(self, error: Exception):
+        messagebox.showerror("Error", f"An error occurred: {str(error)}")
+
     def clear_entries(self):
         self.name_entry.delete(0, tk.END)
         self.roll_entry.delete(0, tk.END)
@@ -256,140 +352,205 @@ class StudentProfilerApp:
         self.final_entry.delete(0, tk.END)
 
     def import_csv(self):
-        try:
-            file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
-            if not file_path:
-                return
-
-            df = pd.read_csv(file_path)
-            required_cols = ['name', 'roll_number', 'math_score', 'logic_score', 'coding_score', 'communication_score']
-
-            if not all(col in df.columns for col in required_cols):
-                messagebox.showerror("Error", "CSV must contain: name, roll_number, math_score, logic_score, coding_score, communication_score")
-                return
+        if self.import_task is not None:
+            return
+        file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
+        if not file_path:
+            return
+
+        self.status_label.config(text="Importing...", foreground=self.muted)
+        self.import_progress['value'] = 0
+        self.import_progress.grid(row=10, column=0, columnspan=2, sticky='w')
+        self.cancel_import_button.config(state='normal')
+        self.import_task = self.worker.submit(self._run_import, file_path, pass_task=True,
+                                              on_done=self._on_import_done, on_error=self._on_import_error,
+                                              on_progress=self._on_import_progress)
+
+    def _run_import(self, task, file_path: str):
+        return self.db_manager.import_csv_file(file_path, progress=task.report_progress,
+                                               should_cancel=lambda: task.cancelled)
+
+    def cancel_import(self):
+        if self.import_task is not None:
+            self.import_task.cancel()
+            self.status_label.config(text="Cancelling import...", foreground=self.muted)
+
+    def _on_import_progress(self, done: int, total: int):
+        self.import_progress['maximum'] = max(total, 1)
+        self.import_progress['value'] = done
+        self.status_label.config(text=f"Importing... {done:,} / {total:,} rows", foreground=self.muted)
+
+    def _finish_import(self):
+        self.import_task = None
+        self.import_progress.grid_remove()
+        self.cancel_import_button.config(state='disabled')
+
+    def _on_import_done(self, result):
+        self._finish_import()
+        count, rejects = result
+
+        message = f"Imported {count} records successfully!"
+        if rejects:
+            logger.warning("Skipped %d invalid CSV rows: %s", len(rejects), rejects[:10])
+            message += f" ({len(rejects)} invalid rows skipped)"
+        self.status_label.config(text=message, foreground="green")
+        self.request_retrain()
+        self.refresh_students()
 
-            count = 0
-            for _, row in df.iterrows():
-                final_score = row.get('final_exam_score', None)
-                if pd.isna(final_score):
-                    final_score = None
-
-                if self.db_manager.add_student_score(
-                    str(row['name']), str(row['roll_number']),
-                    float(row['math_score']), float(row['logic_score']),
-                    float(row['coding_score']), float(row['communication_score']),
-                    float(final_score) if final_score is not None else None
-                ):
-                    count += 1
-
-            self.status_label.config(text=f"Imported {count} records successfully!", foreground="green")
-            self.ml_engine.train_models()
-            self.refresh_students()
-        except Exception as e:
-            messagebox.showerror("Error", f"Error importing CSV: {str(e)}")
+    def _on_import_error(self, error: Exception):
+        self._finish_import()
+        if isinstance(error, ImportCancelled):
+            self.status_label.config(text="Import cancelled; no records were added", foreground="red")
+        else:
+            messagebox.showerror("Error", f"Error importing CSV: {str(error)}")
 
     def clear_db(self):
         if messagebox.askyesno("Confirm", "Are you sure you want to clear all data?"):
-            if self.db_manager.clear_database():
-                self.status_label.config(text="Database cleared successfully", foreground="green")
-                self.ml_engine.train_models()
-                self.refresh_students()
-            else:
-                self.status_label.config(text="Error clearing database", foreground="red")
+            self.worker.submit(self.db_manager.clear_database, on_done=self._on_db_cleared,
+                               on_error=self._on_task_error)
+
+    def _on_db_cleared(self, cleared: bool):
+        if cleared:
+            self.status_label.config(text="Database cleared successfully", foreground="green")
+            self.request_retrain()
+            self.refresh_students()
+        else:
+            self.status_label.config(text="Error clearing database", foreground="red")
 
     def update_visualizations(self):
+        # The aggregates are one indexed row, so polling is cheap; the figure is only redrawn
+        # when they differ from what is already on screen.
+        if 1 not in self.built_tabs or self.chart_refresh_pending:
+            return
+        self.chart_refresh_pending = True
+        self.worker.submit(self.db_manager.get_score_moments, on_done=self._draw_visualizations,
+                           on_error=self._on_visualization_error)
+
+    def _auto_refresh_charts(self):
+        if self.auto_refresh_var.get() and self.notebook.index('current') == 1:
+            self.update_visualizations()
+        self.root.after(self.chart_refresh_interval, self._auto_refresh_charts)
+
+    def _on_visualization_error(self, error: Exception):
+        self.chart_refresh_pending = False
+        messagebox.showerror("Error", f"Error updating visualizations: {str(error)}")
+
+    def _draw_visualizations(self, moments):
+        self.chart_refresh_pending = False
         try:
-            df = self.db_manager.fetch_all_data()
-
-            if df.empty:
-                self.fig.clear()
-                ax = self.fig.add_subplot(111)
-                ax.text(0.5, 0.5, "No data available", ha='center', va='center', fontsize=14)
-                self.canvas.draw()
-                return
-
-            self.fig.clear()
-
-            ax1 = self.fig.add_subplot(2, 1, 1)
-            score_cols = ['math_score', 'logic_score', 'coding_score', 'communication_score']
-            corr_matrix = df[score_cols].corr()
-            sns.heatmap(corr_matrix, annot=True, fmt='.2f', cmap='coolwarm', ax=ax1,
-                        xticklabels=['Math', 'Logic', 'Coding', 'Communication'],
-                        yticklabels=['Math', 'Logic', 'Coding', 'Communication'])
-            ax1.set_title('Correlation Heatmap of Skills', fontsize=12, fontweight='bold')
-
-            ax2 = self.fig.add_subplot(2, 1, 2)
-            averages = df[score_cols].mean()
-            ax2.bar(['Math', 'Logic', 'Coding', 'Communication'], averages.values, color=['#3498db', '#2ecc71', '#e74c3c', '#f39c12'])
-            ax2.set_title('Class Average by Subject', fontsize=12, fontweight='bold')
-            ax2.set_ylabel('Average Score')
-            ax2.set_ylim(0, 100)
-
-            for i, v in enumerate(averages.values):
-                ax2.text(i, v + 2, f'{v:.1f}', ha='center', va='bottom')
-
-            self.fig.tight_layout()
-            self.canvas.draw()
+            if self.charts.update(moments):
+                self.canvas.draw_idle()
         except Exception as e:
-            messagebox.showerror("Error", f"Error updating visualizations: {str(e)}")
-
-    def refresh_students(self):
-        students = self.db_manager.get_students_list()
-        student_names = [f"{name} ({roll})" for _, name, roll in students]
-        self.student_combo['values'] = student_names
-        if students:
+            self._on_visualization_error(e)
+
+    def refresh_students(self, force: bool = False):
+        # The directory only reloads when the database has been written to since its last load
+        if 3 in self.built_tabs:
+            self.roster.reload()
+        if 2 not in self.built_tabs:
+            return
+        self.worker.submit(self.student_directory.refresh, force, on_done=self._on_students_loaded)
+
+    def _on_students_loaded(self, changed: bool):
+        self.student_combo['values'] = self.student_directory.search(self.student_var.get())
+        if not self.student_var.get() and len(self.student_directory):
             self.student_combo.current(0)
             self.load_student_scores()
 
+    def _on_student_search(self, event=None):
+        if event is not None and event.keysym in ('Return', 'Up', 'Down', 'Escape', 'Tab'):
+            return
+        if self._search_after_id is not None:
+            self.root.after_cancel(self._search_after_id)
+        self._search_after_id = self.root.after(120, self._update_student_matches)
+
+    def _update_student_matches(self):
+        self._search_after_id = None
+        self.student_combo['values'] = self.student_directory.search(self.student_var.get())
+
     def load_student_scores(self, event=None):
         try:
             selected = self.student_var.get()
             if not selected:
                 return
 
-            students = self.db_manager.get_students_list()
-            student_names = [f"{name} ({roll})" for _, name, roll in students]
-
-            if selected in student_names:
-                idx = student_names.index(selected)
-                student_id = students[idx][0]
-                scores = self.db_manager.get_student_scores(student_id)
-
-                if scores:
-                    self.math_label.config(text=f"Math: {scores['math_score']:.1f}")
-                    self.logic_label.config(text=f"Logic: {scores['logic_score']:.1f}")
-                    self.coding_label.config(text=f"Coding: {scores['coding_score']:.1f}")
-                    self.comm_label.config(text=f"Communication: {scores['communication_score']:.1f}")
-                    self.current_scores = scores
-                    self.current_student_id = student_id
+            student_id = self.student_directory.lookup(selected)
+            if student_id is None:
+                # Enter on partial text picks the best match
+                matches = self.student_directory.search(selected, limit=1)
+                if matches:
+                    self.student_var.set(matches[0])
+                    student_id = self.student_directory.lookup(matches[0])
+            if student_id is not None:
+                self.worker.submit(self._latest_scores, student_id,
+                                   on_done=lambda scores: self._show_student_scores(student_id, scores))
         except Exception as e:
-            print(f"Error loading student scores: {e}")
+            logger.error("Error loading student scores: %s", e)
 
-    def predict_performance(self):
-        try:
-            if not hasattr(self, 'current_scores'):
-                messagebox.showwarning("Warning", "Please select a student first")
-                return
+    def _latest_scores(self, student_id: int) -> Optional[dict]:
+        # Served from the shared score matrix rather than a query per selection
+        return self.db_manager.score_matrix.refresh().latest_scores(student_id)
 
-            scores = self.current_scores
-            predicted = self.ml_engine.predict_final_score(
-                scores['math_score'], scores['logic_score'],
-                scores['coding_score'], scores['communication_score']
-            )
-
-            _, cluster_name = self.ml_engine.get_student_cluster(
-                scores['math_score'], scores['logic_score'],
-                scores['coding_score'], scores['communication_score']
-            )
-
-            recommendation = self.ml_engine.get_recommendation(
-                scores['math_score'], scores['logic_score'],
-                scores['coding_score'], scores['communication_score'],
-                predicted
-            )
-
-            self.predicted_score_label.config(text=f"Predicted Final Score: {predicted:.2f}")
-            self.cluster_label.config(text=f"Category: {cluster_name}")
-            self.recommendation_label.config(text=f"Recommendation: {recommendation}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error predicting performance: {str(e)}")
+    def _show_student_scores(self, student_id: int, scores: dict):
+        if scores:
+            self.math_label.config(text=f"Math: {scores['math_score']:.1f}")
+            self.logic_label.config(text=f"Logic: {scores['logic_score']:.1f}")
+            self.coding_label.config(text=f"Coding: {scores['coding_score']:.1f}")
+            self.comm_label.config(text=f"Communication: {scores['communication_score']:.1f}")
+            self.current_scores = scores
+            self.current_student_id = student_id
+
+    def predict_performance(self):
+        if not hasattr(self, 'current_scores'):
+            messagebox.showwarning("Warning", "Please select a student first")
+            return
+
+        self.worker.submit(self._run_prediction, self.current_scores, on_done=self._show_prediction,
+                           on_error=lambda e: messagebox.showerror("Error", f"Error predicting performance: {str(e)}"))
+
+    def _run_prediction(self, scores: dict):
+        X = [[scores['math_score'], scores['logic_score'], scores['coding_score'], scores['communication_score']]]
+        predicted, _, cluster_name, recommendation = self.ml_engine.predict_student(*X[0])
+        whatif = self.ml_engine.simulate_improvements(X)
+        lines = []
+        for t, threshold in enumerate(whatif['thresholds']):
+            gain = whatif['best_gains'][0, t]
+            if whatif['best_skills'][0, t] < 0:
+                lines.append(f"{threshold:g}: not reachable by raising one skill")
+            elif gain == 0:
+                lines.append(f"{threshold:g}: already there")
+            else:
+                cluster = whatif['cluster_names'][whatif['clusters_after'][0, t]]
+                lines.append(f"{threshold:g}: +{gain:g} {whatif['best_skill_names'][0, t]} (category: {cluster})")
+        return predicted, cluster_name, recommendation, lines
+
+    def _show_prediction(self, result):
+        predicted, cluster_name, recommendation, whatif_lines = result
+        self.predicted_score_label.config(text=f"Predicted Final Score: {predicted:.2f}")
+        self.cluster_label.config(text=f"Category: {cluster_name}")
+        self.recommendation_label.config(text=f"Recommendation: {recommendation}")
+        self.whatif_label.config(text="What it takes:\n  " + "\n  ".join(whatif_lines))
+
+    def export_class_whatif(self):
+        file_path = filedialog.asksaveasfilename(defaultextension='.csv',
+                                                 filetypes=[("CSV files", "*.csv"), ("Parquet files", "*.parquet")])
+        if not file_path:
+            return
+        self.export_whatif_button.config(state='disabled')
+        self.worker.submit(self._run_whatif_export, file_path, on_done=self._on_whatif_exported,
+                           on_error=self._on_whatif_export_error)
+
+    def _run_whatif_export(self, file_path: str) -> int:
+        from whatif import class_improvements, write_improvements
+
+        df = class_improvements(self.ml_engine)
+        write_improvements(df, file_path)
+        return len(df)
+
+    def _on_whatif_exported(self, count: int):
+        self.export_whatif_button.config(state='normal')
+        messagebox.showinfo("Export", f"Wrote what-if results for {count:,} students")
+
+    def _on_whatif_export_error(self, error: Exception):
+        self.export_whatif_button.config(state='normal')
+        messagebox.showerror("Error", f"Error exporting what-if results: {str(error)}")
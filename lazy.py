@@ -0,0 +1,22 @@
+import importlib
+from types import ModuleType
+
+
+class LazyModule:
+    # Stand-in for a heavy module (pandas, ...) that is only imported on first attribute
+    # access, so importing our modules stays cheap until the functionality is used.
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
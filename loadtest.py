@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+
+async def _request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, path: str, payload: dict) -> int:
+    body = json.dumps(payload).encode()
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def _client(args, deadline: float, latencies: list, statuses: dict, rolls: list):
+    if args.unix:
+        reader, writer = await asyncio.open_unix_connection(args.unix)
+    else:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+    rng = random.Random()
+    try:
+        while time.perf_counter() < deadline and len(latencies) < args.requests:
+            if rolls and rng.random() < args.roll_fraction:
+                payload = {'roll_number': rng.choice(rolls)}
+            else:
+                payload = {'scores': [round(rng.uniform(40, 100), 1) for _ in range(4)]}
+            started = time.perf_counter()
+            status = await _request(reader, writer, args.path, payload)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def _get(args, path: str) -> dict:
+    if args.unix:
+        reader, writer = await asyncio.open_unix_connection(args.unix)
+    else:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b'\r\n\r\n', 1)[1])
+
+
+async def run(args) -> dict:
+    deadline = time.perf_counter() + args.duration
+    latencies, statuses = [], {}
+    started = time.perf_counter()
+    await asyncio.gather(*(_client(args, deadline, latencies, statuses, args.roll) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    result = {
+        'requests': len(latencies),
+        'seconds': round(elapsed, 3),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'latency_ms': {
+            'mean': round(float(ms.mean()), 3) if len(ms) else None,
+            'p50': round(float(np.percentile(ms, 50)), 3) if len(ms) else None,
+            'p95': round(float(np.percentile(ms, 95)), 3) if len(ms) else None,
+            'p99': round(float(np.percentile(ms, 99)), 3) if len(ms) else None,
+            'max': round(float(ms.max()), 3) if len(ms) else None
+        }
+    }
+    server = await _get(args, '/stats')
+    result['server'] = {key: server[key] for key in ('batches', 'mean_batch_size', 'max_batch_size', 'model_version')}
+    return result
+
+
+def main():
+    # Concurrent keep-alive clients against a running scoring service (python main.py serve)
+    parser = argparse.ArgumentParser(description="Load test the local scoring service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', metavar='PATH', help="Connect to a Unix socket instead of TCP")
+    parser.add_argument('--path', default='/predict', help="Endpoint to hit")
+    parser.add_argument('--concurrency', type=int, default=64, help="Simultaneous connections")
+    parser.add_argument('--requests', type=int, default=20000, help="Stop after this many requests")
+    parser.add_argument('--duration', type=float, default=30, help="Stop after this many seconds")
+    parser.add_argument('--roll', action='append', default=[],
+                        help="Roll number to look up (repeatable); otherwise only raw scores are sent")
+    parser.add_argument('--roll-fraction', type=float, default=0.5,
+                        help="Share of requests that look up a --roll instead of sending scores")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2))
+    return 0 if set(result['statuses']) <= {'200'} else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,46 @@
-from tkinter import Tk
-from gui import StudentProfilerApp
+import atexit
+import sys
+from startup_profiler import StartupProfiler
 
 
 def main():
-    root = Tk()
-    app = StudentProfilerApp(root)
+    profiler = StartupProfiler(enabled='--profile-startup' in sys.argv or '--startup-budget' in sys.argv)
+    profiler.start_import_tracking()
+
+    with profiler.phase('import cli'):
+        from cli import build_parser
+    args = build_parser().parse_args()
+    from metrics import default_registry
+    if args.slow_query_ms is not None:
+        default_registry.slow_threshold_ms = args.slow_query_ms
+    if args.metrics_out:
+        atexit.register(default_registry.write, args.metrics_out)
+    if args.command:
+        profiler.stop_import_tracking()
+        sys.exit(args.handler(args))
+
+    with profiler.phase('import gui'):
+        from tkinter import Tk
+        from gui import StudentProfilerApp
+
+    with profiler.phase('create root window'):
+        root = Tk()
+    with profiler.phase('build app'):
+        app = StudentProfilerApp(root, profiler)
+    with profiler.phase('first paint'):
+        root.update()
+    profiler.stop_import_tracking()
+
+    if profiler.enabled:
+        profiler.report()
+    if args.startup_budget is not None:
+        elapsed = profiler.elapsed()
+        within = elapsed <= args.startup_budget
+        print(f"Time to first window {elapsed:.2f}s {'within' if within else 'EXCEEDS'} budget of {args.startup_budget:.2f}s",
+              file=sys.stderr)
+        app.on_close()
+        sys.exit(0 if within else 1)
+
     root.mainloop()
 
 
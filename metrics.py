@@ -0,0 +1,223 @@
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+# Latency histogram bucket upper bounds, in milliseconds
+DEFAULT_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+MAX_STATEMENTS = 20
+MAX_SQL_LENGTH = 500
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        # Upper bound of the bucket holding the q-th observation (the max for the overflow bucket)
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class OperationStats:
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.latency = Histogram(buckets)
+
+    def snapshot(self) -> dict:
+        latency = self.latency
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'rows': self.rows,
+            'total_ms': latency.total,
+            'mean_ms': latency.total / latency.count if latency.count else 0.0,
+            'p50_ms': latency.quantile(0.5),
+            'p95_ms': latency.quantile(0.95),
+            'max_ms': latency.max,
+            'buckets_ms': dict(zip([str(b) for b in latency.buckets] + ['+Inf'], latency.counts))
+        }
+
+
+class Timing:
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = None
+        self.failed = False
+        self.statements = []
+
+
+class MetricsRegistry:
+    # Per-operation call/error/row counters and latency histograms, plus a bounded log of
+    # operations slower than slow_threshold_ms together with the SQL they ran. Statements
+    # are attributed to the innermost operation being timed on the calling thread.
+    def __init__(self, slow_threshold_ms: float = 250.0, slow_log_size: int = 200,
+                 buckets=DEFAULT_BUCKETS_MS, enabled: bool = True):
+        self.slow_threshold_ms = slow_threshold_ms
+        self.buckets = buckets
+        self.enabled = enabled
+        self.operations = {}
+        self.slow_log = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def timer(self, name: str, log_slow: bool = True):
+        if not self.enabled:
+            yield Timing(name)
+            return
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        timing = Timing(name)
+        stack.append(timing)
+        failed = False
+        start = time.perf_counter()
+        try:
+            yield timing
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stack.pop()
+            self._record(timing, elapsed_ms, failed or timing.failed, log_slow)
+
+    def _record(self, timing: Timing, elapsed_ms: float, failed: bool, log_slow: bool):
+        with self._lock:
+            stats = self.operations.get(timing.name)
+            if stats is None:
+                stats = self.operations[timing.name] = OperationStats(self.buckets)
+            stats.calls += 1
+            stats.errors += failed
+            stats.rows += timing.rows or 0
+            stats.latency.observe(elapsed_ms)
+            if log_slow and elapsed_ms >= self.slow_threshold_ms:
+                self.slow_log.append({
+                    'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'operation': timing.name,
+                    'ms': round(elapsed_ms, 3),
+                    'rows': timing.rows,
+                    'error': failed,
+                    'thread': threading.current_thread().name,
+                    'sql': timing.statements
+                })
+
+    def observe(self, name: str, elapsed_ms: float, rows: Optional[int] = None, failed: bool = False,
+                log_slow: bool = True):
+        # For callers that cannot use timer(), e.g. coroutines interleaving on one thread
+        if not self.enabled:
+            return
+        timing = Timing(name)
+        timing.rows = rows
+        self._record(timing, elapsed_ms, failed, log_slow)
+
+    def mark_failed(self):
+        # Counts the innermost operation timed on this thread as an error even though it
+        # returns normally, for methods that catch their own exceptions and return a fallback
+        stack = getattr(self._local, 'stack', None)
+        if stack:
+            stack[-1].failed = True
+
+    def record_statement(self, sql: str):
+        stack = getattr(self._local, 'stack', None)
+        if stack:
+            statements = stack[-1].statements
+            if len(statements) < MAX_STATEMENTS:
+                statements.append(' '.join(sql.split())[:MAX_SQL_LENGTH])
+
+    def reset(self):
+        with self._lock:
+            self.operations.clear()
+            self.slow_log.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'operations': {name: stats.snapshot() for name, stats in sorted(self.operations.items())},
+                'slow_threshold_ms': self.slow_threshold_ms,
+                'slow_log': list(self.slow_log)
+            }
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix: str = 'student_profiler') -> str:
+        lines = []
+        with self._lock:
+            operations = sorted(self.operations.items())
+            for metric, kind, help_text, value in (
+                    ('operation_calls_total', 'counter', 'Instrumented operation calls', lambda s: s.calls),
+                    ('operation_errors_total', 'counter', 'Calls that raised or reported a failure', lambda s: s.errors),
+                    ('operation_rows_total', 'counter', 'Rows read or written', lambda s: s.rows)):
+                lines.append(f"# HELP {prefix}_{metric} {help_text}")
+                lines.append(f"# TYPE {prefix}_{metric} {kind}")
+                for name, stats in operations:
+                    lines.append(f'{prefix}_{metric}{{operation="{name}"}} {value(stats)}')
+
+            metric = f'{prefix}_operation_duration_seconds'
+            lines.append(f"# HELP {metric} Operation latency")
+            lines.append(f"# TYPE {metric} histogram")
+            for name, stats in operations:
+                latency = stats.latency
+                cumulative = 0
+                for bound, count in zip(list(latency.buckets) + ['+Inf'], latency.counts):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else repr(bound / 1000)
+                    lines.append(f'{metric}_bucket{{operation="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{operation="{name}"}} {latency.total / 1000}')
+                lines.append(f'{metric}_count{{operation="{name}"}} {latency.count}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str):
+        # Prometheus text for *.prom / *.txt, JSON otherwise
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        with open(path, 'w') as f:
+            f.write(text)
+
+
+# Shared by every DatabaseManager/MLEngine that is not given its own registry
+default_registry = MetricsRegistry()
+
+
+def instrumented(name: str, rows: Optional[Callable] = None, log_slow: bool = True):
+    # Method decorator timing each call into self.metrics; rows maps the return value to a
+    # row count.
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.timer(name, log_slow) as timing:
+                result = method(self, *args, **kwargs)
+                if rows is not None:
+                    try:
+                        timing.rows = rows(result)
+                    except Exception:
+                        pass
+                return result
+        return wrapper
+    return decorator
@@ -1,131 +1,581 @@
-import pandas as pd
+from __future__ import annotations
+
+import copy
+import logging
+import os
+import pickle
+import threading
 import numpy as np
-from typing import Tuple
-from sklearn.linear_model import LinearRegression
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-from db_manager import DatabaseManager
+from typing import TYPE_CHECKING, Optional, Sequence, Tuple
+from cache import LRUCache
+from clustering import cluster_names, cluster_order, select_clusters
+from db_manager import DatabaseManager, SCORE_COLUMNS
+from lazy import LazyModule
+from metrics import MetricsRegistry, default_registry, instrumented
+from stats import RunningMoments
+from whatif import THRESHOLDS, best_improvements, minimal_improvements
+
+if TYPE_CHECKING:
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import StandardScaler
+
+# scikit-learn and pandas take seconds to import, so they are loaded on first use
+pd = LazyModule('pandas')
+
+logger = logging.getLogger(__name__)
+
+FEATURE_COLUMNS = SCORE_COLUMNS
+SKILL_NAMES = ['Math', 'Logic', 'Coding', 'Communication']
+# Names for the default three groups; models trained with another cluster count name their
+# clusters via clustering.cluster_names
+CLUSTER_NAMES = dict(enumerate(cluster_names(3)))
+
+MODEL_FORMAT_VERSION = 3
+MODEL_STATE_FIELDS = (
+    'scaler', 'regression_model', 'clustering_model', 'last_score_id', 'rows_seen',
+    'uses_synthetic', '_feature_moments', '_regression_moments', '_cluster_counts',
+    '_fit_mean', '_fit_scale', 'cluster_report', 'score_revision'
+)
 
 class MLEngine:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: Optional[DatabaseManager], drift_threshold: float = 0.25,
+                 model_path: Optional[str] = None, autosave: bool = True,
+                 streaming_threshold: int = 200000, chunksize: int = 50000,
+                 prediction_cache_size: int = 4096, metrics: Optional[MetricsRegistry] = None,
+                 cluster_candidates: Sequence[int] = (2, 3, 4, 5), cluster_restarts: int = 3,
+                 cluster_sample_rows: int = 50000, cluster_workers: Optional[int] = None):
         self.db_manager = db_manager
-        self.regression_model = LinearRegression()
-        self.clustering_model = KMeans(n_clusters=3, random_state=42, n_init=10)
-        self.scaler = StandardScaler()
+        self.metrics = metrics or (db_manager.metrics if db_manager is not None else default_registry)
+        self.regression_model = None
+        self.clustering_model = None
+        self.scaler = None
         self.is_trained = False
+        
+        # State for incremental updates: sufficient statistics of everything trained on so
+        # far, the highest scores.id incorporated and the scaler at the last full fit.
+        self.drift_threshold = drift_threshold
+        self.streaming_threshold = streaming_threshold
+        self.chunksize = chunksize
+        self.last_score_id = 0
+        self.rows_seen = 0
+        # score_stats revision of the data trained on; edits to trained rows need a full refit
+        self.score_revision = 0
+        self.uses_synthetic = False
+        self._feature_moments = None
+        self._regression_moments = None
+        self._cluster_counts = None
+        self._fit_mean = None
+        self._fit_scale = None
+        
+        # Cluster count selection: every candidate k and restart is fitted (in parallel on large
+        # inputs) and the best silhouette wins; cluster_report holds the per-candidate results
+        # of the last full fit. Larger tables are clustered on a random sample of that many rows.
+        self.cluster_candidates = tuple(cluster_candidates)
+        self.cluster_restarts = cluster_restarts
+        self.cluster_sample_rows = cluster_sample_rows
+        self.cluster_workers = cluster_workers
+        self.cluster_report = []
+        
+        if model_path is None and db_manager is not None and db_manager.db_name != ':memory:':
+            model_path = os.path.splitext(db_manager.db_name)[0] + '_models.pkl'
+        self.model_path = model_path
+        self.autosave = autosave
+        self.background_thread = None
+        
+        # Fitted models are swapped in as a whole under _state_lock so predictions never see
+        # a half-trained state; _train_lock serialises training runs.
+        self._state_lock = threading.RLock()
+        self._train_lock = threading.Lock()
+        
+        # Single-student predictions are memoised per model_version, which increments every
+        # time a new set of models is installed (training, incremental update or artifact load).
+        self.model_version = 0
+        self.prediction_cache = LRUCache(prediction_cache_size)
     
     def generate_synthetic_data(self, n_samples: int = 20) -> pd.DataFrame:
-        np.random.seed(42)
-        data = []
-        
-        for i in range(n_samples):
-            math = np.random.uniform(50, 100)
-            logic = np.random.uniform(50, 100)
-            coding = np.random.uniform(50, 100)
-            comm = np.random.uniform(50, 100)
-            
-            final_score = (math * 0.25 + logic * 0.25 + coding * 0.30 + comm * 0.20) + np.random.uniform(-10, 10)
-            final_score = np.clip(final_score, 0, 100)
-            
-            data.append({
-                'math_score': round(math, 2),
-                'logic_score': round(logic, 2),
-                'coding_score': round(coding, 2),
-                'communication_score': round(comm, 2),
-                'final_exam_score': round(final_score, 2)
-            })
-        
-        return pd.DataFrame(data)
-    
-    def prepare_training_data(self) -> pd.DataFrame:
-        df = self.db_manager.fetch_all_data()
-        
-        if df.empty or len(df) < 10:
+        from synthetic import SyntheticCohortGenerator
+        
+        df = SyntheticCohortGenerator(seed=42).generate(n_samples)
+        return df[FEATURE_COLUMNS + ['final_exam_score']]
+    
+    def prepare_training_data(self) -> Tuple[np.ndarray, np.ndarray, int, int, int]:
+        # (X, y, real rows, max score id, revision) as float32 views of the shared score
+        # matrix; only padding with synthetic rows makes a copy
+        view = self.db_manager.score_matrix.refresh()
+        X, y = view.features, view.final_scores
+        
+        # The regression needs labelled rows, so pad with synthetic data while fewer than 10 exist
+        if np.count_nonzero(~np.isnan(y)) < 10:
             synthetic_df = self.generate_synthetic_data(20)
-            if not df.empty:
-                synthetic_df = pd.concat([df[['math_score', 'logic_score', 'coding_score', 
-                                             'communication_score', 'final_exam_score']], 
-                                         synthetic_df], ignore_index=True)
-            return synthetic_df
+            X = np.vstack([X, synthetic_df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)])
+            y = np.concatenate([y, synthetic_df['final_exam_score'].to_numpy(dtype=np.float32)])
         
-        return df[['math_score', 'logic_score', 'coding_score', 
-                   'communication_score', 'final_exam_score']].copy()
+        return X, y, len(view), view.last_score_id, view.revision
     
-    def train_models(self):
-        try:
-            df = self.prepare_training_data()
-            
-            if df.empty:
+    @instrumented('ml.train_models', log_slow=False)
+    def train_models(self, streaming: Optional[bool] = None):
+        # Large tables are trained chunk by chunk from the snapshot so memory stays bounded
+        with self._train_lock:
+            try:
+                if streaming is None:
+                    streaming = self.db_manager.get_score_version()[0] > self.streaming_threshold
+                state = self._fit_streaming() if streaming else self._fit_in_memory()
+                
+                if state is None:
+                    return False
+                
+                self._install_state(state)
+                return True
+            except Exception as e:
+                logger.error("Error training models: %s", e)
+                self.metrics.mark_failed()
+                return False
+    
+    def _sample_rows(self, n: int) -> np.ndarray:
+        if n <= self.cluster_sample_rows:
+            return np.arange(n)
+        return np.sort(np.random.default_rng(42).choice(n, self.cluster_sample_rows, replace=False))
+    
+    def _fit_clusters(self, X_scaled: np.ndarray) -> tuple:
+        # Candidates are compared on at most cluster_sample_rows rows; the winner labels them all
+        rows = self._sample_rows(len(X_scaled))
+        sample = X_scaled if len(rows) == len(X_scaled) else X_scaled[rows]
+        clustering_model, cluster_report = select_clusters(sample, self.cluster_candidates,
+                                                           n_init=self.cluster_restarts,
+                                                           max_workers=self.cluster_workers)
+        if sample is not X_scaled:
+            clustering_model.labels_ = clustering_model.predict(X_scaled)
+        return clustering_model, cluster_report
+    
+    def _fit_in_memory(self) -> Optional[dict]:
+        from sklearn.linear_model import LinearRegression
+        from sklearn.preprocessing import StandardScaler
+        
+        X, y, rows, last_score_id, score_revision = self.prepare_training_data()
+        labelled = ~np.isnan(y)
+        
+        scaler = StandardScaler()
+        regression_model = LinearRegression()
+        
+        # The scaled matrix is the one float64 copy: it is computed straight from the float32
+        # views (no float32 intermediate), and float64 centroids let the models predict on
+        # float64 input
+        scaler.fit(X)
+        X_scaled = np.subtract(X, scaler.mean_)
+        X_scaled /= scaler.scale_
+        
+        regression_model.fit(X_scaled[labelled], y[labelled])
+        clustering_model, cluster_report = self._fit_clusters(X_scaled)
+        
+        # Moments are accumulated chunk by chunk rather than from a stacked float64 copy
+        feature_moments = RunningMoments(X.shape[1])
+        regression_moments = RunningMoments(X.shape[1] + 1)
+        for start in range(0, len(X), self.chunksize):
+            chunk = slice(start, start + self.chunksize)
+            feature_moments.update(X[chunk])
+            regression_moments.update(np.column_stack([X[chunk], y[chunk]])[labelled[chunk]])
+        
+        return {
+            'scaler': scaler,
+            'regression_model': regression_model,
+            'clustering_model': clustering_model,
+            'last_score_id': last_score_id,
+            'rows_seen': rows,
+            'uses_synthetic': rows < len(X),
+            '_feature_moments': feature_moments,
+            '_regression_moments': regression_moments,
+            '_cluster_counts': np.bincount(clustering_model.labels_,
+                                           minlength=clustering_model.n_clusters).astype(float),
+            '_fit_mean': scaler.mean_.copy(),
+            '_fit_scale': scaler.scale_.copy(),
+            'cluster_report': cluster_report,
+            'score_revision': score_revision
+        }
+    
+    def _fit_streaming(self) -> Optional[dict]:
+        # Pass 1 accumulates the moments that fully determine the scaler and the regression;
+        # the clusters are selected on a random sample of rows and pass 2 counts cluster sizes.
+        from sklearn.linear_model import LinearRegression
+        from sklearn.preprocessing import StandardScaler
+        
+        view = self.db_manager.score_matrix.refresh()
+        values = view.values
+        n_features = len(FEATURE_COLUMNS)
+        chunks = [slice(start, start + self.chunksize) for start in range(0, len(view), self.chunksize)]
+        
+        feature_moments = RunningMoments(n_features)
+        regression_moments = RunningMoments(n_features + 1)
+        for rows in chunks:
+            chunk = np.asarray(values[rows], dtype=float)
+            feature_moments.update(chunk[:, :n_features])
+            regression_moments.update(chunk[~np.isnan(chunk[:, n_features])])
+        last_score_id = view.last_score_id
+        
+        if regression_moments.count < 10:
+            return self._fit_in_memory()
+        
+        scaler = StandardScaler()
+        self._apply_scaler_moments(scaler, feature_moments)
+        regression_model = LinearRegression()
+        self._apply_regression_moments(regression_model, scaler, regression_moments)
+        
+        sample = self._sample_rows(len(view))
+        clustering_model, cluster_report = self._fit_clusters(scaler.transform(values[sample, :n_features]))
+        clustering_model.__dict__.pop('labels_', None)
+        counts = np.zeros(len(clustering_model.cluster_centers_))
+        for rows in chunks:
+            X_scaled = scaler.transform(np.asarray(values[rows, :n_features], dtype=float))
+            counts += np.bincount(clustering_model.predict(X_scaled), minlength=len(counts))
+        
+        return {
+            'scaler': scaler,
+            'regression_model': regression_model,
+            'clustering_model': clustering_model,
+            'last_score_id': last_score_id,
+            'rows_seen': feature_moments.count,
+            'uses_synthetic': False,
+            '_feature_moments': feature_moments,
+            '_regression_moments': regression_moments,
+            '_cluster_counts': counts,
+            '_fit_mean': scaler.mean_.copy(),
+            '_fit_scale': scaler.scale_.copy(),
+            'cluster_report': cluster_report,
+            'score_revision': view.revision
+        }
+    
+    @instrumented('ml.update_models', log_slow=False)
+    def update_models(self, force_full: bool = False) -> bool:
+        # Folds rows added since the last fit into the models; falls back to a full refit
+        # when forced, when rows were deleted or edited, while padding with synthetic data, or
+        # on drift.
+        if force_full or not self.is_trained or self.uses_synthetic:
+            return self.train_models()
+        
+        with self._train_lock:
+            try:
+                state = copy.deepcopy(self.export_state())
+                view = self.db_manager.score_matrix.refresh()
+                new_rows = view.rows_after(state['last_score_id'])
+                new_values = view.values[new_rows]
+                needs_full = (len(view) != state['rows_seen'] + len(new_values)
+                              or view.revision != state['score_revision'])
+                if not needs_full and not len(new_values):
+                    return True
+                if not needs_full:
+                    needs_full = not self._apply_new_rows(state, new_values, view.last_score_id)
+                if not needs_full:
+                    self._install_state(state)
+                    return True
+            except Exception as e:
+                logger.error("Error updating models: %s", e)
+                self.metrics.mark_failed()
                 return False
-            
-            X = df[['math_score', 'logic_score', 'coding_score', 'communication_score']].values
-            y = df['final_exam_score'].values
-            
-            X_scaled = self.scaler.fit_transform(X)
-            
-            self.regression_model.fit(X_scaled, y)
-            self.clustering_model.fit(X_scaled)
-            
+        return self.train_models()
+    
+    def _apply_new_rows(self, state: dict, new_values: np.ndarray, last_score_id: int) -> bool:
+        X = np.asarray(new_values[:, :len(FEATURE_COLUMNS)], dtype=float)
+        y = np.asarray(new_values[:, len(FEATURE_COLUMNS)], dtype=float)
+        labelled = ~np.isnan(y)
+        scaler = state['scaler']
+        
+        old_mean, old_scale = scaler.mean_.copy(), scaler.scale_.copy()
+        state['_feature_moments'].update(X)
+        state['_regression_moments'].update(np.column_stack([X, y])[labelled])
+        
+        self._apply_scaler_moments(scaler, state['_feature_moments'])
+        if np.max(np.abs(scaler.mean_ - state['_fit_mean']) / state['_fit_scale']) > self.drift_threshold:
+            return False
+        
+        # Centroids live in scaled space, so re-express them under the updated scaler
+        # before applying the mini-batch update with per-centre learning rates.
+        clustering_model = state['clustering_model']
+        counts = state['_cluster_counts']
+        centers = (clustering_model.cluster_centers_ * old_scale + old_mean - scaler.mean_) / scaler.scale_
+        X_scaled = scaler.transform(X)
+        labels = np.argmin(((X_scaled[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2), axis=1)
+        for k in np.unique(labels):
+            members = X_scaled[labels == k]
+            counts[k] += len(members)
+            centers[k] += (members.sum(axis=0) - len(members) * centers[k]) / counts[k]
+        # Moved centroids can change rank; re-rank them so id 0 stays the strongest group and
+        # carry their counts along. labels_ of the last full fit no longer match the new ids.
+        order = cluster_order(centers)
+        clustering_model.cluster_centers_ = centers[order]
+        clustering_model.__dict__.pop('labels_', None)
+        state['_cluster_counts'] = counts[order]
+        
+        self._apply_regression_moments(state['regression_model'], scaler, state['_regression_moments'])
+        
+        state['last_score_id'] = last_score_id
+        state['rows_seen'] += len(new_values)
+        return True
+    
+    @staticmethod
+    def _apply_scaler_moments(scaler: StandardScaler, moments: RunningMoments):
+        variance = moments.variance()
+        scale = np.sqrt(variance)
+        scale[scale == 0] = 1.0
+        scaler.mean_ = moments.mean.copy()
+        scaler.var_ = variance
+        scaler.scale_ = scale
+        scaler.n_samples_seen_ = moments.count
+        scaler.n_features_in_ = len(moments.mean)
+    
+    @staticmethod
+    def _apply_regression_moments(regression_model: LinearRegression, scaler: StandardScaler,
+                                  moments: RunningMoments):
+        # OLS in raw feature space from the centred co-moments, mapped onto the scaled inputs
+        if moments.count < 2:
+            return
+        cov = moments.comoment
+        weights = np.linalg.lstsq(cov[:4, :4], cov[:4, 4], rcond=None)[0]
+        intercept = moments.mean[4] - weights @ moments.mean[:4]
+        regression_model.coef_ = weights * scaler.scale_
+        regression_model.intercept_ = intercept + weights @ scaler.mean_
+        regression_model.n_features_in_ = len(weights)
+    
+    @classmethod
+    def from_state(cls, state: dict) -> "MLEngine":
+        # Detached engine for prediction only, e.g. inside a scoring worker process
+        engine = cls(None, autosave=False)
+        engine._install_state(state)
+        return engine
+    
+    def export_state(self) -> dict:
+        with self._state_lock:
+            return {field: getattr(self, field) for field in MODEL_STATE_FIELDS}
+    
+    def portable_state(self) -> dict:
+        # Same as export_state but without labels_, which holds one entry per training row
+        # and is not needed for prediction; used for the artifact and worker processes.
+        state = self.export_state()
+        clustering_model = copy.copy(state['clustering_model'])
+        clustering_model.__dict__.pop('labels_', None)
+        state['clustering_model'] = clustering_model
+        return state
+    
+    def _install_state(self, state: dict):
+        with self._state_lock:
+            for field in MODEL_STATE_FIELDS:
+                setattr(self, field, state[field])
             self.is_trained = True
+            self._bump_model_version()
+        if self.autosave:
+            self.save_models()
+    
+    def _bump_model_version(self):
+        # Called with _state_lock held. Old entries could never be hit again, so drop them now.
+        self.model_version += 1
+        self.prediction_cache.clear()
+    
+    def model_fingerprint(self) -> dict:
+        return {
+            'rows': self.rows_seen,
+            'max_score_id': self.last_score_id,
+            'revision': self.score_revision,
+            'schema_version': self.db_manager.get_schema_version(),
+            'format': MODEL_FORMAT_VERSION
+        }
+    
+    def data_fingerprint(self) -> dict:
+        rows, max_score_id, revision = self.db_manager.get_score_state()
+        return {
+            'rows': rows,
+            'max_score_id': max_score_id,
+            'revision': revision,
+            'schema_version': self.db_manager.get_schema_version(),
+            'format': MODEL_FORMAT_VERSION
+        }
+    
+    @instrumented('ml.save_models', log_slow=False)
+    def save_models(self) -> bool:
+        if not self.model_path or not self.is_trained:
+            return False
+        try:
+            state = self.portable_state()
+            tmp_path = self.model_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'fingerprint': self.model_fingerprint(), 'state': state}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.model_path)
             return True
         except Exception as e:
-            print(f"Error training models: {e}")
+            logger.error("Error saving models: %s", e)
+            self.metrics.mark_failed()
             return False
     
-    def predict_final_score(self, math_score: float, logic_score: float, 
-                           coding_score: float, communication_score: float) -> float:
+    @instrumented('ml.load_models', log_slow=False)
+    def load_models(self) -> Optional[bool]:
+        # True: artifact matches the data, False: artifact loaded but stale, None: unusable
+        if not self.model_path or not os.path.exists(self.model_path):
+            return None
+        try:
+            with open(self.model_path, 'rb') as f:
+                artifact = pickle.load(f)
+            fingerprint = artifact['fingerprint']
+            if fingerprint['format'] != MODEL_FORMAT_VERSION:
+                return None
+            with self._state_lock:
+                for field in MODEL_STATE_FIELDS:
+                    setattr(self, field, artifact['state'][field])
+                self.is_trained = True
+                self._bump_model_version()
+            return fingerprint == self.data_fingerprint()
+        except Exception as e:
+            logger.error("Error loading models from %s: %s", self.model_path, e)
+            self.metrics.mark_failed()
+            return None
+    
+    def ensure_models(self, background: bool = True) -> bool:
+        # Loads the saved models; a stale artifact is brought up to date and a missing or
+        # corrupt one retrained, in a background thread unless background is False.
+        loaded = self.load_models()
+        if loaded:
+            return True
+        
+        task = self.update_models if loaded is False else self.train_models
+        if not background:
+            return task()
+        self.background_thread = threading.Thread(target=task, name='MLEngine-train', daemon=True)
+        self.background_thread.start()
+        return False
+    
+    @instrumented('ml.predict_batch', rows=len, log_slow=False)
+    def predict_batch(self, df: pd.DataFrame) -> pd.DataFrame:
+        X = df[FEATURE_COLUMNS].to_numpy(dtype=float)
+        predicted, clusters, cluster_names, recommendations = self._predict_array(X)
+        return pd.DataFrame({
+            'predicted_score': predicted,
+            'cluster_id': clusters,
+            'cluster_name': cluster_names,
+            'recommendation': recommendations
+        }, index=df.index)
+    
+    @property
+    def cluster_names(self) -> Tuple[str, ...]:
+        # Names of the current model's clusters, by cluster id; the default three when untrained
+        clustering_model = self.clustering_model
+        return cluster_names(len(clustering_model.cluster_centers_) if clustering_model is not None else 3)
+    
+    def _model_snapshot(self) -> tuple:
         if not self.is_trained:
-            self.train_models()
+            if self.background_thread is not None and self.background_thread.is_alive():
+                self.background_thread.join()
+            else:
+                self.train_models()
+        
+        with self._state_lock:
+            return self.model_version, self.scaler, self.regression_model, self.clustering_model
+    
+    def _predict_array(self, X: np.ndarray, snapshot: Optional[tuple] = None
+                       ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        _, scaler, regression_model, clustering_model = snapshot or self._model_snapshot()
+        
+        X_scaled = scaler.transform(X)
+        predicted = np.clip(np.round(regression_model.predict(X_scaled), 2), 0, 100)
+        clusters = clustering_model.predict(X_scaled)
+        
+        names = np.array(cluster_names(len(clustering_model.cluster_centers_)))
+        return predicted, clusters, names[clusters], self._recommendations(X, predicted)
+    
+    @staticmethod
+    def _recommendations(X: np.ndarray, predicted: np.ndarray) -> np.ndarray:
+        min_index = np.argmin(X, axis=1)
+        min_skill = np.array(SKILL_NAMES)[min_index]
+        min_score = np.char.mod('%.1f', X[np.arange(len(X)), min_index])
+        
+        focus = np.char.add(np.char.add(min_skill, ' (current: '), np.char.add(min_score, ')'))
+        messages = np.select(
+            [predicted < 60, predicted < 75, predicted < 85],
+            [np.char.add('Needs significant improvement. Focus on ', focus),
+             np.char.add('Needs help in ', focus),
+             np.char.add(np.char.add('Good performance. Consider strengthening ', min_skill),
+                         ' for better results')],
+            default='Excellent performance! Maintain current study habits'
+        )
+        return messages.astype(object)
+    
+    @instrumented('ml.predict_matrix', rows=lambda result: len(result[1]), log_slow=False)
+    def predict_matrix(self, X: np.ndarray) -> Tuple[int, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        # (model version, predicted scores, cluster ids, cluster names, recommendations) for an
+        # [n, 4] array of skill scores; the whole batch is answered by one set of models.
+        snapshot = self._model_snapshot()
+        return (snapshot[0],) + self._predict_array(np.asarray(X, dtype=float), snapshot)
+    
+    @instrumented('ml.simulate_improvements', rows=lambda result: len(result['predicted']), log_slow=False)
+    def simulate_improvements(self, X: np.ndarray, thresholds: Sequence[float] = THRESHOLDS,
+                              step: float = 0.5) -> dict:
+        # What-if analysis for an [n, 4] array of skill scores: the smallest single-skill raise
+        # that lifts each student's prediction to every threshold, the cheapest skill to raise
+        # and the cluster the student would land in after that raise. The regression is undone
+        # into raw-score weights (coef / scale) so the whole batch is one broadcast.
+        version, scaler, regression_model, clustering_model = self._model_snapshot()
+        X = np.asarray(X, dtype=float)
+        thresholds = tuple(thresholds)
+        
+        X_scaled = scaler.transform(X)
+        raw = regression_model.predict(X_scaled)
+        weights = regression_model.coef_ / scaler.scale_
+        gains = minimal_improvements(X, raw, weights, thresholds, step)
+        best_skills, best_gains = best_improvements(gains)
+        
+        # Each student's scores after the cheapest raise, one point per threshold
+        reachable = best_skills >= 0
+        improved = np.repeat(X[:, None, :], len(thresholds), axis=1)
+        rows, columns = np.nonzero(reachable)
+        improved[rows, columns, best_skills[reachable]] += best_gains[reachable]
+        clusters_after = clustering_model.predict(scaler.transform(improved.reshape(-1, X.shape[1])))
+        clusters_after = np.where(reachable, clusters_after.reshape(len(X), len(thresholds)), -1)
         
+        return {
+            'model_version': version,
+            'thresholds': thresholds,
+            'predicted': np.clip(np.round(raw, 2), 0, 100),
+            'clusters': clustering_model.predict(X_scaled),
+            'cluster_names': np.array(cluster_names(len(clustering_model.cluster_centers_)), dtype=object),
+            'gains': gains,
+            'best_skills': best_skills,
+            # Blank where no raise is needed or no single skill is enough
+            'best_skill_names': np.where(best_gains > 0, np.array(SKILL_NAMES + [''], dtype=object)[best_skills], ''),
+            'best_gains': best_gains,
+            'clusters_after': clusters_after
+        }
+    
+    @instrumented('ml.predict_student', log_slow=False)
+    def predict_student(self, math_score: float, logic_score: float,
+                        coding_score: float, communication_score: float) -> Tuple[float, int, str, str]:
+        # (predicted score, cluster id, cluster name, recommendation), served from the LRU cache
+        # when the same scores were predicted with the current models.
+        snapshot = self._model_snapshot()
+        key = (snapshot[0], float(math_score), float(logic_score), float(coding_score), float(communication_score))
+        result = self.prediction_cache.get(key)
+        if result is None:
+            X = np.array([key[1:]], dtype=float)
+            predicted, clusters, cluster_names, recommendations = self._predict_array(X, snapshot)
+            result = (float(predicted[0]), int(clusters[0]), str(cluster_names[0]), str(recommendations[0]))
+            self.prediction_cache.put(key, result)
+        return result
+    
+    def predict_final_score(self, math_score: float, logic_score: float, 
+                           coding_score: float, communication_score: float) -> float:
         try:
-            X = np.array([[math_score, logic_score, coding_score, communication_score]])
-            X_scaled = self.scaler.transform(X)
-            prediction = self.regression_model.predict(X_scaled)[0]
-            return max(0, min(100, round(prediction, 2)))
+            return self.predict_student(math_score, logic_score, coding_score, communication_score)[0]
         except Exception as e:
-            print(f"Error predicting score: {e}")
+            logger.error("Error predicting score: %s", e)
             return 0.0
     
     def get_student_cluster(self, math_score: float, logic_score: float,
                            coding_score: float, communication_score: float) -> Tuple[int, str]:
-        if not self.is_trained:
-            self.train_models()
-        
         try:
-            X = np.array([[math_score, logic_score, coding_score, communication_score]])
-            X_scaled = self.scaler.transform(X)
-            cluster = self.clustering_model.predict(X_scaled)[0]
-            
-            cluster_names = {
-                0: "High Performers",
-                1: "Average",
-                2: "At Risk"
-            }
-            
-            return cluster, cluster_names.get(cluster, "Unknown")
+            _, cluster_id, cluster_name, _ = self.predict_student(math_score, logic_score,
+                                                                  coding_score, communication_score)
+            return cluster_id, cluster_name
         except Exception as e:
-            print(f"Error getting cluster: {e}")
+            logger.error("Error getting cluster: %s", e)
             return -1, "Unknown"
     
     def get_recommendation(self, math_score: float, logic_score: float,
                           coding_score: float, communication_score: float,
                           predicted_score: float) -> str:
-        scores = {
-            'Math': math_score,
-            'Logic': logic_score,
-            'Coding': coding_score,
-            'Communication': communication_score
-        }
-        
-        min_skill = min(scores, key=scores.get)
-        min_score = scores[min_skill]
-        
-        if predicted_score < 60:
-            return f"Needs significant improvement. Focus on {min_skill} (current: {min_score:.1f})"
-        elif predicted_score < 75:
-            return f"Needs help in {min_skill} (current: {min_score:.1f})"
-        elif predicted_score < 85:
-            return f"Good performance. Consider strengthening {min_skill} for better results"
-        else:
-            return "Excellent performance! Maintain current study habits"
-
+        X = np.array([[math_score, logic_score, coding_score, communication_score]], dtype=float)
+        return str(self._recommendations(X, np.array([predicted_score], dtype=float))[0])
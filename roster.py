@@ -0,0 +1,229 @@
+import tkinter as tk
+from tkinter import ttk
+from typing import Optional
+
+from db_manager import DatabaseManager, ROSTER_SORT_COLUMNS
+from ml_engine import MLEngine
+from worker import BackgroundWorker
+
+COLUMNS = [
+    ('student_id', 'ID', 70), ('name', 'Name', 180), ('roll_number', 'Roll Number', 120),
+    ('math_score', 'Math', 70), ('logic_score', 'Logic', 70), ('coding_score', 'Coding', 70),
+    ('communication_score', 'Comm.', 70), ('final_exam_score', 'Final', 70),
+    ('predicted_score', 'Predicted', 80), ('cluster_name', 'Category', 130)
+]
+
+
+class RosterView:
+    # Student table that never holds more than max_pages pages of rows. Scrolling near either
+    # end of the buffer fetches the neighbouring page by keyset (sort value, id) on the worker
+    # and trims the far end, so memory and Treeview size stay flat at any roster size.
+    # Sorting and filtering happen in SQL; rows without a stored prediction are scored on the fly.
+    def __init__(self, parent, db_manager: DatabaseManager, ml_engine: MLEngine,
+                 worker: BackgroundWorker, page_size: int = 100, max_pages: int = 3):
+        self.db_manager = db_manager
+        self.ml_engine = ml_engine
+        self.worker = worker
+        self.page_size = page_size
+        self.max_pages = max_pages
+
+        self.sort = 'student_id'
+        self.descending = False
+        self.search = ''
+        self.cluster_name = None
+        self.keys = []
+        self.offset = 0
+        self.total = 0
+        self.more_after = False
+        self.loading = False
+        self.generation = 0
+        self._search_after_id = None
+
+        controls = ttk.Frame(parent, style='Card.TFrame')
+        controls.pack(fill=tk.X, pady=(0, 8))
+        ttk.Label(controls, text="Search (name or roll prefix):").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(controls, textvariable=self.search_var, width=28)
+        search_entry.pack(side=tk.LEFT, padx=6)
+        search_entry.bind('<KeyRelease>', self._on_search_changed)
+
+        ttk.Label(controls, text="Category:").pack(side=tk.LEFT, padx=(12, 0))
+        self.cluster_var = tk.StringVar(value='All')
+        # Offers the current model's cluster names, which depend on the cluster count it chose
+        cluster_combo = ttk.Combobox(controls, textvariable=self.cluster_var, state='readonly', width=18,
+                                     values=['All'] + list(ml_engine.cluster_names),
+                                     postcommand=lambda: cluster_combo.configure(
+                                         values=['All'] + list(self.ml_engine.cluster_names)))
+        cluster_combo.pack(side=tk.LEFT, padx=6)
+        cluster_combo.bind('<<ComboboxSelected>>', self._on_cluster_changed)
+
+        ttk.Button(controls, text="Refresh", command=self.reload).pack(side=tk.LEFT, padx=6)
+        self.status_label = ttk.Label(controls, text="")
+        self.status_label.pack(side=tk.RIGHT)
+
+        table = ttk.Frame(parent)
+        table.pack(fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(table, columns=[name for name, _, _ in COLUMNS], show='headings')
+        for name, label, width in COLUMNS:
+            self.tree.heading(name, text=label, command=lambda column=name: self.sort_by(column))
+            self.tree.column(name, width=width, anchor='w' if name in ('name', 'roll_number', 'cluster_name') else 'e')
+        self.scrollbar = ttk.Scrollbar(table, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.reload()
+
+    def reload(self):
+        # Starts over from the first page; results of fetches already in flight are discarded
+        self.generation += 1
+        self.loading = True
+        self.worker.submit(self._fetch_first, self.generation, self.sort, self.descending, self.search,
+                           self.cluster_name, on_done=self._on_first_page, on_error=self._on_error)
+
+    def sort_by(self, column: str):
+        if column not in ROSTER_SORT_COLUMNS:
+            self.status_label.config(text=f"Sorting by {column} is not indexed")
+            return
+        self.descending = not self.descending if column == self.sort else False
+        self.sort = column
+        for name, label, _ in COLUMNS:
+            arrow = (' ▼' if self.descending else ' ▲') if name == column else ''
+            self.tree.heading(name, text=label + arrow)
+        self.reload()
+
+    def _on_search_changed(self, event=None):
+        if self._search_after_id is not None:
+            self.tree.after_cancel(self._search_after_id)
+        self._search_after_id = self.tree.after(250, self._apply_search)
+
+    def _apply_search(self):
+        self._search_after_id = None
+        search = self.search_var.get().strip()
+        if search != self.search:
+            self.search = search
+            self.reload()
+
+    def _on_cluster_changed(self, event=None):
+        # By stored name: predictions scored by an earlier model may number its clusters differently
+        name = self.cluster_var.get()
+        self.cluster_name = None if name == 'All' else name
+        self.reload()
+
+    def _fetch_page(self, sort: str, descending: bool, search: str, cluster_name: Optional[str],
+                    after=None, before=None):
+        page = self.db_manager.roster_page(sort, descending, self.page_size, after=after, before=before,
+                                           search=search or None, cluster_name=cluster_name)
+        missing = page['predicted_score'].isna() & page['math_score'].notna()
+        if missing.any() and self.ml_engine.is_trained:
+            predictions = self.ml_engine.predict_batch(page.loc[missing])
+            page.loc[missing, 'predicted_score'] = predictions['predicted_score']
+            page.loc[missing, 'cluster_name'] = predictions['cluster_name']
+        return page
+
+    def _fetch_first(self, generation: int, sort: str, descending: bool, search: str, cluster_name: Optional[str]):
+        total = self.db_manager.roster_count(search or None, cluster_name,
+                                             require_prediction=sort == 'predicted_score')
+        return generation, self._fetch_page(sort, descending, search, cluster_name), total
+
+    def _on_first_page(self, result):
+        generation, page, total = result
+        if generation != self.generation:
+            return
+        self.loading = False
+        self.tree.delete(*self.tree.get_children())
+        self.keys = []
+        self.offset = 0
+        self.total = total
+        self._insert(page.to_dict('records'), tk.END)
+        self.more_after = len(page) == self.page_size
+        self.tree.yview_moveto(0)
+        self._update_status()
+
+    def _key(self, row) -> tuple:
+        return (None if self.sort == 'student_id' else row[self.sort], int(row['student_id']))
+
+    def _insert(self, records: list, index):
+        # index is tk.END to append or 0 to prepend; keys mirror the Treeview rows one to one
+        for position, row in enumerate(records):
+            self.tree.insert('', index if index == tk.END else position,
+                             values=[self._format(name, row[name]) for name, _, _ in COLUMNS])
+        keys = [self._key(row) for row in records]
+        if index == tk.END:
+            self.keys.extend(keys)
+        else:
+            self.keys[:0] = keys
+
+    @staticmethod
+    def _format(name: str, value):
+        if value is None or value != value:
+            return '-'
+        if name in ('name', 'roll_number', 'cluster_name', 'student_id'):
+            return value
+        return f"{value:.1f}"
+
+    def _on_scroll(self, first: str, last: str):
+        self.scrollbar.set(first, last)
+        if self.loading or not self.keys:
+            return
+        first, last = float(first), float(last)
+        if last > 0.9 and self.more_after:
+            self._request_page(after=self.keys[-1])
+        elif first < 0.1 and self.offset > 0:
+            self._request_page(before=self.keys[0])
+
+    def _request_page(self, after=None, before=None):
+        self.loading = True
+        generation = self.generation
+        self.worker.submit(self._fetch_page, self.sort, self.descending, self.search, self.cluster_name,
+                           after, before,
+                           on_done=lambda page: self._on_page(generation, page, before is not None),
+                           on_error=self._on_error)
+
+    def _on_page(self, generation: int, page, backwards: bool):
+        if generation != self.generation:
+            return
+        self.loading = False
+        if page.empty:
+            if backwards:
+                self.offset = 0
+            else:
+                self.more_after = False
+            return
+
+        # Keep the row that was at the top of the view in place while rows come and go
+        children = self.tree.get_children()
+        top = round(self.tree.yview()[0] * len(children))
+        if backwards:
+            top += len(page)
+            self._insert(page.to_dict('records'), 0)
+            self.offset = max(self.offset - len(page), 0)
+            if len(page) < self.page_size:
+                self.offset = 0
+            overflow = len(self.keys) - self.max_pages * self.page_size
+            if overflow > 0:
+                self.tree.delete(*self.tree.get_children()[-overflow:])
+                del self.keys[-overflow:]
+                self.more_after = True
+        else:
+            self._insert(page.to_dict('records'), tk.END)
+            self.more_after = len(page) == self.page_size
+            overflow = len(self.keys) - self.max_pages * self.page_size
+            if overflow > 0:
+                self.tree.delete(*children[:overflow])
+                del self.keys[:overflow]
+                self.offset += overflow
+                top -= overflow
+
+        self.tree.yview_moveto(max(top, 0) / max(len(self.keys), 1))
+        self._update_status()
+
+    def _update_status(self):
+        if not self.keys:
+            self.status_label.config(text="No students")
+            return
+        self.status_label.config(text=f"Rows {self.offset + 1:,}–{self.offset + len(self.keys):,} of {self.total:,}")
+
+    def _on_error(self, error: Exception):
+        self.loading = False
+        self.status_label.config(text=f"Error loading roster: {error}")
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import sys
+import threading
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from db_manager import DatabaseManager
+
+N_FEATURES = 4
+
+
+class ScoreMatrixView:
+    # One consistent generation of the score matrix. Every array is a view onto the snapshot's
+    # float32/int64 columns (memory-mapped on disk-backed databases), so handing a view to
+    # training, the prediction tab or a report costs no copy. Views are never mutated; refresh()
+    # builds a new one.
+    def __init__(self, ids: np.ndarray, values: np.ndarray, student_ids: np.ndarray,
+                 names: List[str], rolls: List[str], revision: int = 0):
+        self.score_ids = ids[:, 0]
+        self.score_student_ids = ids[:, 1]
+        self.values = values
+        self.student_ids = student_ids
+        self.names = names
+        self.rolls = rolls
+        # score_stats revision the values reflect; it moves when existing rows are edited
+        self.revision = revision
+        self._latest = None
+        self._by_roll = None
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def features(self) -> np.ndarray:
+        return self.values[:, :N_FEATURES]
+
+    @property
+    def final_scores(self) -> np.ndarray:
+        return self.values[:, N_FEATURES]
+
+    @property
+    def last_score_id(self) -> int:
+        return int(self.score_ids[-1]) if len(self.score_ids) else 0
+
+    @property
+    def nbytes(self) -> int:
+        # Score columns plus the student id column; the interned strings are shared with the
+        # rest of the process and not counted
+        return self.values.nbytes + self.score_ids.nbytes * 2 + self.student_ids.nbytes
+
+    def row_of(self, score_id: int) -> Optional[int]:
+        # Rows are in score id order, so the id-to-row mapping is a binary search
+        i = int(np.searchsorted(self.score_ids, score_id))
+        return i if i < len(self.score_ids) and self.score_ids[i] == score_id else None
+
+    def rows_after(self, score_id: int) -> slice:
+        return slice(int(np.searchsorted(self.score_ids, score_id, side='right')), len(self.score_ids))
+
+    def student(self, student_id: int) -> Optional[Tuple[int, str, str]]:
+        i = int(np.searchsorted(self.student_ids, student_id))
+        if i < len(self.student_ids) and self.student_ids[i] == student_id:
+            return student_id, self.names[i], self.rolls[i]
+        return None
+
+    def find_roll(self, roll_number: str) -> Optional[int]:
+        # Student id for a roll number; the lookup dict is built on first use, once per view
+        by_roll = self._by_roll
+        if by_roll is None:
+            by_roll = self._by_roll = dict(zip(self.rolls, self.student_ids.tolist()))
+        return by_roll.get(roll_number)
+
+    def students(self) -> List[Tuple[int, str, str]]:
+        return list(zip(self.student_ids.tolist(), self.names, self.rolls))
+
+    def latest_rows(self) -> Tuple[np.ndarray, np.ndarray]:
+        # (sorted student ids, row of each one's most recent score). Built on first use, once
+        # per view.
+        latest = self._latest
+        if latest is None:
+            n = len(self.score_student_ids)
+            students, first = np.unique(self.score_student_ids[::-1], return_index=True)
+            latest = self._latest = (students, n - 1 - first)
+        return latest
+
+    def latest_row(self, student_id: int) -> Optional[int]:
+        # Row of the student's most recent score
+        students, rows = self.latest_rows()
+        i = int(np.searchsorted(students, student_id))
+        return int(rows[i]) if i < len(students) and students[i] == student_id else None
+
+    def latest_scores(self, student_id: int) -> Optional[dict]:
+        # Same shape as DatabaseManager.get_student_scores
+        row = self.latest_row(student_id)
+        if row is None:
+            return None
+        values = [None if np.isnan(v) else float(v) for v in self.values[row]]
+        return dict(zip(['math_score', 'logic_score', 'coding_score', 'communication_score',
+                         'final_exam_score'], values))
+
+
+class ScoreMatrix:
+    # Process-wide owner of the current ScoreMatrixView (one per DatabaseManager). refresh()
+    # syncs the columnar snapshot (appending only new score rows) and pulls students added since
+    # the last refresh, interning their names and roll numbers so every consumer shares one
+    # copy of each string. Safe to call from worker threads; readers keep their old view.
+    def __init__(self, db_manager: DatabaseManager):
+        self.db_manager = db_manager
+        self._lock = threading.Lock()
+        self._version = None
+        self._students = (0, 0, np.empty(0, np.int64), [], [])   # (count, max id, ids, names, rolls)
+        self._view = ScoreMatrixView(np.empty((0, 2), np.int64), np.empty((0, N_FEATURES + 1), np.float32),
+                                     self._students[2], [], [])
+
+    def view(self) -> ScoreMatrixView:
+        # The last refreshed view, without touching the database
+        return self._view
+
+    def refresh(self) -> ScoreMatrixView:
+        with self._lock:
+            # Students are only ever inserted along with a score and only deleted together with
+            # all scores, so the O(1) score state tells whether anything needs reloading
+            version = self.db_manager.get_score_state()
+            if version == self._version:
+                return self._view
+            self._refresh_students()
+            ids, values = self.db_manager.load_score_snapshot()
+            _, _, student_ids, names, rolls = self._students
+            self._view = ScoreMatrixView(ids, values, student_ids, names, rolls, version[2])
+            self._version = version
+            return self._view
+
+    def _refresh_students(self):
+        count, max_id = self.db_manager.get_student_version()
+        known_count, known_max, student_ids, names, rolls = self._students
+        if (count, max_id) == (known_count, known_max):
+            return
+
+        if max_id >= known_max:
+            new = self.db_manager.fetch_students_since(known_max)
+        if max_id < known_max or known_count + len(new) != count:
+            # Students were deleted: start over
+            student_ids, names, rolls = np.empty(0, np.int64), [], []
+            new = self.db_manager.fetch_students_since(0)
+        if new:
+            new_ids, new_names, new_rolls = zip(*new)
+            student_ids = np.concatenate([student_ids, np.array(new_ids, dtype=np.int64)])
+            names = names + [sys.intern(name) for name in new_names]
+            rolls = rolls + [sys.intern(roll) for roll in new_rolls]
+        self._students = (len(student_ids), int(student_ids[-1]) if len(student_ids) else 0,
+                          student_ids, names, rolls)
+
+    def stats(self) -> dict:
+        view = self._view
+        return {'rows': len(view), 'students': len(view.student_ids), 'bytes': view.nbytes}
@@ -0,0 +1,298 @@
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from db_manager import DatabaseManager, SCORE_COLUMNS
+from metrics import MetricsRegistry
+from ml_engine import MLEngine
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1 << 20
+REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+# Endpoint -> response fields; /predict returns all of them
+PREDICTION_ENDPOINTS = {
+    '/predict': ('predicted_score', 'cluster_id', 'cluster_name', 'recommendation'),
+    '/score': ('predicted_score',),
+    '/cluster': ('cluster_id', 'cluster_name'),
+    '/recommendation': ('recommendation',)
+}
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ScoringService:
+    # Minimal HTTP/1.1 JSON server (TCP or Unix socket) in front of MLEngine. Prediction
+    # requests are queued and a single batcher coalesces whatever arrives within max_wait_ms
+    # (up to max_batch_size rows) into one vectorized predict_matrix call on a worker thread.
+    # Every batch reads one consistent model snapshot, so retraining - on POST /reload or every
+    # retrain_interval seconds - swaps models in without failing or dropping requests.
+    def __init__(self, ml_engine: MLEngine, db_manager: Optional[DatabaseManager] = None,
+                 max_batch_size: int = 256, max_wait_ms: float = 2.0, retrain_interval: float = 0,
+                 metrics: Optional[MetricsRegistry] = None):
+        self.ml_engine = ml_engine
+        self.db_manager = db_manager or ml_engine.db_manager
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.retrain_interval = retrain_interval
+        self.metrics = metrics or MetricsRegistry()
+
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_rows = 0
+        self.max_batch_seen = 0
+        self.retrains = 0
+        self.started_at = None
+        self._queue = None
+        self._server = None
+        self._tasks = []
+        self._retraining = None
+        # Predictions run one batch at a time so the next batch fills while one is computed;
+        # roll number lookups and retraining get their own threads.
+        self._predict_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='service-predict')
+        self._io_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='service-io')
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8765, unix_path: Optional[str] = None):
+        self._queue = asyncio.Queue()
+        self.started_at = time.monotonic()
+        if unix_path:
+            self._server = await asyncio.start_unix_server(self._handle_connection, unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self._tasks.append(asyncio.create_task(self._batch_loop()))
+        if self.retrain_interval > 0:
+            self._tasks.append(asyncio.create_task(self._retrain_loop()))
+        return self._server
+
+    @property
+    def address(self):
+        return self._server.sockets[0].getsockname() if self._server else None
+
+    async def serve_forever(self, *args, **kwargs):
+        await self.start(*args, **kwargs)
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._predict_executor.shutdown(wait=True)
+        self._io_executor.shutdown(wait=True)
+
+    # Micro-batching
+
+    async def predict(self, scores) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((scores, future))
+        return await future
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            started = time.perf_counter()
+            try:
+                X = np.array([scores for scores, _ in batch], dtype=float)
+                version, predicted, clusters, names, recommendations = await loop.run_in_executor(
+                    self._predict_executor, self.ml_engine.predict_matrix, X)
+            except Exception as e:
+                logger.error("Error scoring batch of %d: %s", len(batch), e)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.metrics.observe('service.batch', (time.perf_counter() - started) * 1000, rows=len(batch))
+            self.batches += 1
+            self.batched_rows += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            for i, (_, future) in enumerate(batch):
+                if not future.done():   # the client may have gone away
+                    future.set_result({
+                        'predicted_score': float(predicted[i]),
+                        'cluster_id': int(clusters[i]),
+                        'cluster_name': str(names[i]),
+                        'recommendation': str(recommendations[i]),
+                        'model_version': version
+                    })
+
+    # Hot model swaps
+
+    def reload_models(self) -> bool:
+        # Starts an incremental update (full retrain when needed) unless one is running; the
+        # engine installs the new models atomically when it finishes.
+        if self._retraining is not None and not self._retraining.done():
+            return False
+        self._retraining = asyncio.get_running_loop().run_in_executor(self._io_executor, self._retrain)
+        return True
+
+    def _retrain(self):
+        version = self.ml_engine.model_version
+        self.ml_engine.update_models()
+        if self.ml_engine.model_version != version:
+            self.retrains += 1
+            logger.info("Models swapped in (version %d)", self.ml_engine.model_version)
+
+    async def _retrain_loop(self):
+        while True:
+            await asyncio.sleep(self.retrain_interval)
+            self.reload_models()
+
+    # HTTP
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_BYTES:
+                    status, payload = 413, {'error': 'Request body too large'}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = await self._respond(method, target, body)
+                    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+                data = json.dumps(payload).encode()
+                connection = '' if keep_alive else 'Connection: close\r\n'
+                head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                        f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n{connection}\r\n")
+                writer.write(head.encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method: str, target: str, body: bytes) -> Tuple[int, dict]:
+        started = time.perf_counter()
+        url = urlsplit(target)
+        self.requests += 1
+        try:
+            status, payload = await self._dispatch(method, url.path, dict(parse_qsl(url.query)), body)
+        except RequestError as e:
+            status, payload = e.status, {'error': str(e)}
+        except Exception as e:
+            logger.error("Error handling %s %s: %s", method, target, e)
+            status, payload = 500, {'error': str(e)}
+        if status >= 400:
+            self.errors += 1
+        name = f"service{url.path.replace('/', '.')}" if url.path in PREDICTION_ENDPOINTS else 'service.other'
+        self.metrics.observe(name, (time.perf_counter() - started) * 1000, failed=status >= 500)
+        return status, payload
+
+    async def _dispatch(self, method: str, path: str, query: dict, body: bytes) -> Tuple[int, dict]:
+        if path == '/health':
+            return 200, {'status': 'ok' if self.ml_engine.is_trained else 'training',
+                         'model_version': self.ml_engine.model_version}
+        if path == '/stats':
+            return 200, self.stats()
+        if path == '/reload':
+            if method != 'POST':
+                raise RequestError(405, "Use POST /reload")
+            return 202, {'started': self.reload_models(), 'model_version': self.ml_engine.model_version}
+        if path not in PREDICTION_ENDPOINTS:
+            raise RequestError(404, f"Unknown endpoint {path}")
+        if method not in ('GET', 'POST'):
+            raise RequestError(405, f"Use GET or POST {path}")
+
+        params = dict(query)
+        if body:
+            try:
+                params.update(json.loads(body))
+            except (ValueError, TypeError):
+                raise RequestError(400, "Body must be a JSON object")
+        scores = await self._scores_from_params(params)
+        result = await self.predict(scores)
+        fields = PREDICTION_ENDPOINTS[path] + ('model_version',)
+        response = {field: result[field] for field in fields}
+        if 'roll_number' in params:
+            response['roll_number'] = params['roll_number']
+        return 200, response
+
+    async def _scores_from_params(self, params: dict) -> list:
+        if 'roll_number' in params:
+            scores = await asyncio.get_running_loop().run_in_executor(
+                self._io_executor, self._latest_scores, str(params['roll_number']))
+            if scores is None:
+                raise RequestError(404, f"No scores for roll number {params['roll_number']}")
+            return scores
+        try:
+            if 'scores' in params:
+                scores = [float(value) for value in params['scores']]
+            else:
+                scores = [float(params[column]) for column in SCORE_COLUMNS]
+        except (KeyError, TypeError, ValueError):
+            raise RequestError(400, f"Pass roll_number, scores=[4 values] or {', '.join(SCORE_COLUMNS)}")
+        if len(scores) != len(SCORE_COLUMNS) or not all(np.isfinite(scores)):
+            raise RequestError(400, f"Expected {len(SCORE_COLUMNS)} finite scores")
+        return scores
+
+    def _latest_scores(self, roll_number: str) -> Optional[list]:
+        # The shared score matrix answers from memory; refresh() is one O(1) query when nothing
+        # changed and picks up rows written by other processes otherwise.
+        view = self.db_manager.score_matrix.refresh()
+        student_id = view.find_roll(roll_number)
+        row = view.latest_row(student_id) if student_id is not None else None
+        if row is None:
+            return None
+        return [float(value) for value in view.values[row, :len(SCORE_COLUMNS)]]
+
+    def stats(self) -> dict:
+        uptime = time.monotonic() - self.started_at if self.started_at else 0.0
+        operations = self.metrics.snapshot()['operations']
+        return {
+            'uptime_s': round(uptime, 3),
+            'requests': self.requests,
+            'errors': self.errors,
+            'requests_per_sec': round(self.requests / uptime, 2) if uptime else 0.0,
+            'batches': self.batches,
+            'mean_batch_size': round(self.batched_rows / self.batches, 2) if self.batches else 0.0,
+            'max_batch_size': self.max_batch_seen,
+            'queue_depth': self._queue.qsize() if self._queue else 0,
+            'model_version': self.ml_engine.model_version,
+            'retrains': self.retrains,
+            'latency_ms': {name: {key: stats[key] for key in ('calls', 'mean_ms', 'p50_ms', 'p95_ms', 'max_ms')}
+                           for name, stats in operations.items()}
+        }
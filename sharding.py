@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from db_manager import DatabaseManager, SCHEMA_VERSION, SCORE_COLUMNS
+from lazy import LazyModule
+from metrics import MetricsRegistry, default_registry, instrumented
+from score_matrix import ScoreMatrixView
+from stats import RunningMoments
+
+pd = LazyModule('pandas')
+
+# Global ids put the shard id above the shard-local row id, so they stay unique across shards
+# and sort shard by shard
+SHARD_ID_BITS = 40
+LOCAL_ID_MASK = (1 << SHARD_ID_BITS) - 1
+
+CATALOG_FILE = 'catalog.db'
+
+
+def encode_id(shard_id: int, local_id):
+    # Works on ints and int64 arrays alike
+    return (shard_id << SHARD_ID_BITS) | local_id
+
+
+def decode_id(global_id: int) -> Tuple[int, int]:
+    # Plain ints: ids taken from the merged arrays are numpy int64, which sqlite3 would bind
+    # as a BLOB and match nothing
+    global_id = int(global_id)
+    return global_id >> SHARD_ID_BITS, global_id & LOCAL_ID_MASK
+
+
+class ShardedDatabase:
+    # One SQLite file per cohort (a term, a campus, ...) under a directory, with a small catalog
+    # database mapping cohort keys to shard files. Writes are routed to the cohort's shard;
+    # cross-cohort reads fan out over a thread pool (sqlite3 releases the GIL while a query
+    # runs) and merge, with student and score ids encoded as global ids. For a single cohort,
+    # shard(cohort) is a plain DatabaseManager that touches only its own file. Provides the
+    # read surface MLEngine needs, so a model can be trained on all cohorts or on one.
+    def __init__(self, directory: str, max_workers: Optional[int] = None,
+                 metrics: Optional[MetricsRegistry] = None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.db_name = os.path.join(directory, CATALOG_FILE)
+        self.metrics = metrics or default_registry
+        self._lock = threading.Lock()
+        self._catalog = sqlite3.connect(self.db_name, check_same_thread=False, isolation_level=None)
+        self._catalog.execute('''
+            CREATE TABLE IF NOT EXISTS cohorts (
+                id INTEGER PRIMARY KEY,
+                cohort TEXT UNIQUE NOT NULL,
+                db_file TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self._cohorts = {}   # cohort -> (shard id, file name)
+        self._shards = {}    # shard id -> DatabaseManager, opened on first use
+        self._load_catalog()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or min(8, os.cpu_count() or 1),
+                                        thread_name_prefix='shard')
+        self.score_matrix = ShardedScoreMatrix(self)
+
+    def _load_catalog(self):
+        rows = self._catalog.execute('SELECT cohort, id, db_file FROM cohorts ORDER BY id').fetchall()
+        self._cohorts = {cohort: (shard_id, db_file) for cohort, shard_id, db_file in rows}
+
+    def cohorts(self) -> List[str]:
+        with self._lock:
+            return sorted(self._cohorts, key=lambda cohort: self._cohorts[cohort][0])
+
+    def shard_id(self, cohort: str) -> int:
+        with self._lock:
+            if cohort not in self._cohorts:
+                self._load_catalog()   # another process may have added it
+            if cohort not in self._cohorts:
+                raise KeyError(f"Unknown cohort: {cohort}")
+            return self._cohorts[cohort][0]
+
+    def add_cohort(self, cohort: str) -> int:
+        cohort = cohort.strip()
+        if not cohort:
+            raise ValueError("Cohort key must not be empty")
+        with self._lock:
+            self._load_catalog()
+            if cohort in self._cohorts:
+                return self._cohorts[cohort][0]
+            slug = re.sub(r'[^A-Za-z0-9]+', '_', cohort).strip('_').lower() or 'cohort'
+            cursor = self._catalog.execute('INSERT INTO cohorts (cohort, db_file) VALUES (?, ?)', (cohort, ''))
+            shard_id = cursor.lastrowid
+            db_file = f'{shard_id:04d}_{slug}.db'
+            self._catalog.execute('UPDATE cohorts SET db_file = ? WHERE id = ?', (db_file, shard_id))
+            self._cohorts[cohort] = (shard_id, db_file)
+            return shard_id
+
+    def shard(self, cohort: str, create: bool = False) -> DatabaseManager:
+        shard_id = self.add_cohort(cohort) if create else self.shard_id(cohort)
+        return self._open(shard_id)
+
+    def _open(self, shard_id: int) -> DatabaseManager:
+        with self._lock:
+            db_manager = self._shards.get(shard_id)
+            if db_manager is None:
+                db_file = next(f for i, f in self._cohorts.values() if i == shard_id)
+                db_manager = DatabaseManager(os.path.join(self.directory, db_file), metrics=self.metrics)
+                self._shards[shard_id] = db_manager
+            return db_manager
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        with self._lock:
+            for db_manager in self._shards.values():
+                db_manager.close()
+            self._shards.clear()
+        self._catalog.close()
+
+    def fan_out(self, operation: Callable[[DatabaseManager], object],
+                cohorts: Optional[Sequence[str]] = None) -> List[Tuple[int, str, object]]:
+        # Runs operation(shard) on every selected shard concurrently; returns
+        # (shard id, cohort, result) in shard id order. The first failure is re-raised.
+        cohorts = self.cohorts() if cohorts is None else list(cohorts)
+        targets = sorted((self.shard_id(cohort), cohort) for cohort in cohorts)
+        with self.metrics.timer('shard.fan_out') as timing:
+            timing.rows = len(targets)
+            futures = [(shard_id, cohort, self._pool.submit(operation, self._open(shard_id)))
+                       for shard_id, cohort in targets]
+            return [(shard_id, cohort, future.result()) for shard_id, cohort, future in futures]
+
+    # Writes, routed by cohort key
+
+    def add_student_score(self, cohort: str, *args, **kwargs) -> bool:
+        return self.shard(cohort, create=True).add_student_score(*args, **kwargs)
+
+    def bulk_add_scores(self, cohort: str, data, **kwargs) -> Tuple[int, List[Tuple[int, str]]]:
+        return self.shard(cohort, create=True).bulk_add_scores(data, **kwargs)
+
+    def import_csv_file(self, cohort: str, file_path: str, **kwargs) -> Tuple[int, List[Tuple[int, str]]]:
+        return self.shard(cohort, create=True).import_csv_file(file_path, **kwargs)
+
+    def clear_cohort(self, cohort: str):
+        self.shard(cohort).clear_database()
+
+    # Cross-cohort reads
+
+    @instrumented('shard.fetch_all_data', rows=len)
+    def fetch_all_data(self, cohorts: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        frames = []
+        for shard_id, cohort, df in self.fan_out(lambda db: db.fetch_all_data(), cohorts):
+            if df.empty:
+                continue
+            df['id'] = encode_id(shard_id, df['id'].to_numpy(dtype=np.int64))
+            df['score_id'] = encode_id(shard_id, df['score_id'].to_numpy(dtype=np.int64))
+            df.insert(1, 'cohort', cohort)
+            frames.append(df)
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    @instrumented('shard.get_score_moments', rows=lambda moments: moments.count)
+    def get_score_moments(self, cohorts: Optional[Sequence[str]] = None) -> RunningMoments:
+        moments = RunningMoments(len(SCORE_COLUMNS))
+        for _, _, shard_moments in self.fan_out(lambda db: db.get_score_moments(), cohorts):
+            moments.merge(shard_moments)
+        return moments
+
+    def get_cohort_summary(self) -> Dict[str, Tuple[int, int]]:
+        # cohort -> (score rows, students)
+        return {cohort: summary for _, cohort, summary in self.fan_out(
+            lambda db: (db.get_score_version()[0], db.get_student_version()[0]))}
+
+    def get_score_version(self) -> Tuple[int, int]:
+        # (total rows, highest global score id); changes whenever any shard does
+        return self.get_score_state()[:2]
+
+    def get_score_state(self) -> Tuple[int, int, int]:
+        # As DatabaseManager.get_score_state; revisions only grow, so their sum does too
+        states = self.fan_out(lambda db: db.get_score_state())
+        count = sum(state[0] for _, _, state in states)
+        max_ids = [encode_id(shard_id, state[1]) for shard_id, _, state in states if state[1]]
+        return count, max(max_ids, default=0), sum(state[2] for _, _, state in states)
+
+    def get_schema_version(self) -> int:
+        return SCHEMA_VERSION
+
+    @instrumented('shard.get_students_list', rows=len)
+    def get_students_list(self, cohorts: Optional[Sequence[str]] = None) -> List[Tuple[int, str, str]]:
+        students = []
+        for shard_id, _, rows in self.fan_out(lambda db: db.get_students_list(), cohorts):
+            students.extend((encode_id(shard_id, student_id), name, roll) for student_id, name, roll in rows)
+        return students
+
+    def get_student_scores(self, student_id: int) -> Optional[dict]:
+        # Single-student reads go straight to the shard encoded in the global id
+        shard_id, local_id = decode_id(student_id)
+        return self._open(shard_id).get_student_scores(local_id)
+
+
+class ShardedScoreMatrix:
+    # ScoreMatrix counterpart for ShardedDatabase: refreshes every shard's matrix in parallel and
+    # concatenates their views in shard order with global ids, so the merged view stays sorted by
+    # score id and MLEngine's incremental update works across cohorts unchanged. The merged
+    # arrays are rebuilt only when some shard's view changed.
+    def __init__(self, sharded: ShardedDatabase):
+        self.sharded = sharded
+        self._lock = threading.Lock()
+        self._parts = None
+        self._view = ScoreMatrixView(np.empty((0, 2), np.int64), np.empty((0, len(SCORE_COLUMNS) + 1), np.float32),
+                                     np.empty(0, np.int64), [], [])
+
+    def view(self) -> ScoreMatrixView:
+        return self._view
+
+    def refresh(self) -> ScoreMatrixView:
+        with self._lock:
+            parts = self.sharded.fan_out(lambda db: db.score_matrix.refresh())
+            key = [(shard_id, view) for shard_id, _, view in parts]
+            if self._parts is not None and len(key) == len(self._parts) and all(
+                    shard_id == old_id and view is old_view
+                    for (shard_id, view), (old_id, old_view) in zip(key, self._parts)):
+                return self._view
+            views = [(shard_id, view) for shard_id, _, view in parts if len(view) or len(view.student_ids)]
+            ids = np.empty((sum(len(view) for _, view in views), 2), np.int64)
+            start = 0
+            for shard_id, view in views:
+                ids[start:start + len(view), 0] = encode_id(shard_id, view.score_ids)
+                ids[start:start + len(view), 1] = encode_id(shard_id, view.score_student_ids)
+                start += len(view)
+            values = np.concatenate([view.values for _, view in views]) if views else self._view.values[:0]
+            student_ids = np.concatenate([encode_id(shard_id, view.student_ids) for shard_id, view in views]
+                                         ) if views else np.empty(0, np.int64)
+            names = [name for _, view in views for name in view.names]
+            rolls = [roll for _, view in views for roll in view.rolls]
+            self._view = ScoreMatrixView(ids, values, student_ids, names, rolls,
+                                         sum(view.revision for _, view in views))
+            self._parts = key
+            return self._view
+
+    def stats(self) -> dict:
+        view = self._view
+        return {'rows': len(view), 'students': len(view.student_ids), 'bytes': view.nbytes}
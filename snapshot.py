@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import glob
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from db_manager import DatabaseManager
+
+SNAPSHOT_FORMAT_VERSION = 2
+VALUE_COLUMNS = 5   # four skills + final exam score (NaN when missing)
+ID_COLUMNS = 2      # score id, student id
+
+
+@contextmanager
+def file_lock(path: str):
+    # Exclusive advisory lock on path (created if missing), held across processes
+    with open(path, 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK itself gives up after ten one-second retries
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class ScoreSnapshot:
+    # Columnar copy of the scores table in score id order: <prefix>.<generation>.f32 holds
+    # float32 rows of (skills..., final), <prefix>.<generation>.ids int64 (score_id,
+    # student_id) pairs and <prefix>.json the generation, row count, max score id and
+    # score_stats revision it covers. load() memory-maps the files, so readers get the matrix
+    # without SQL decoding or DataFrame construction. sync() appends rows added since the last
+    # sync and rebuilds from scratch when rows were deleted or edited or the schema changed.
+    # Processes sharing the files serialise syncs on <prefix>.lock. Without a path (e.g. an
+    # in-memory database) the arrays are kept in memory instead.
+    def __init__(self, db_manager: DatabaseManager, path_prefix: Optional[str], chunksize: int = 100000):
+        self.db_manager = db_manager
+        self.path_prefix = path_prefix
+        self.chunksize = chunksize
+        self._lock = threading.Lock()
+        self._meta = None
+        self._memory = (np.empty((0, ID_COLUMNS), np.int64), np.empty((0, VALUE_COLUMNS), np.float32))
+
+    @property
+    def exists(self) -> bool:
+        return self.path_prefix is None or os.path.exists(self.path_prefix + '.json')
+
+    def _read_meta(self) -> Optional[dict]:
+        if self.path_prefix is None:
+            return self._meta
+        try:
+            with open(self.path_prefix + '.json') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('format') != SNAPSHOT_FORMAT_VERSION or meta.get('schema_version') != self.db_manager.get_schema_version():
+            return None
+        for suffix, row_size in (('.ids', ID_COLUMNS * 8), ('.f32', VALUE_COLUMNS * 4)):
+            path = self._data_path(meta['generation'], suffix)
+            if not os.path.exists(path) or os.path.getsize(path) < meta['rows'] * row_size:
+                return None
+        return meta
+
+    def _data_path(self, generation: int, suffix: str) -> str:
+        return f'{self.path_prefix}.{generation}{suffix}'
+
+    def _write_meta(self, generation: int, rows: int, max_score_id: int, revision: int):
+        meta = {
+            'format': SNAPSHOT_FORMAT_VERSION,
+            'schema_version': self.db_manager.get_schema_version(),
+            'generation': generation,
+            'rows': rows,
+            'max_score_id': max_score_id,
+            'revision': revision
+        }
+        self._meta = meta
+        if self.path_prefix is None:
+            return
+        tmp_path = self.path_prefix + '.json.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.path_prefix + '.json')
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if self.path_prefix is None:
+                yield
+            else:
+                with file_lock(self.path_prefix + '.lock'):
+                    yield
+
+    def sync(self) -> dict:
+        # Returns the meta of the now up-to-date snapshot
+        with self._locked():
+            return self._sync()
+
+    def _sync(self) -> dict:
+        # The state is read before any rows, so an edit racing with the sync is caught next time
+        count, max_score_id, revision = self.db_manager.get_score_state()
+        meta = self._read_meta()
+        if meta and (meta['rows'], meta['max_score_id'], meta['revision']) == (count, max_score_id, revision):
+            return meta
+
+        generation = meta['generation'] if meta else 0
+        rows = added = 0
+        if meta and meta['max_score_id'] <= max_score_id and meta['revision'] == revision:
+            rows = meta['rows']
+            added = self._append(generation, rows, meta['max_score_id'], max_score_id)
+        if not meta or meta['revision'] != revision or rows + added != count:
+            # Missing, outdated, or rows at or below the old max id were deleted or edited:
+            # start over in a new generation of files
+            generation = self._next_generation(generation)
+            rows = 0
+            added = self._append(generation, 0, 0, max_score_id)
+        self._write_meta(generation, rows + added, max_score_id if rows + added else 0, revision)
+        self._remove_old_generations(generation)
+        return self._meta
+
+    def _append(self, generation: int, rows: int, after_id: int, until_id: int) -> int:
+        # Appends cut the data files back to the rows the meta vouches for first, so an append
+        # interrupted before its meta update is simply redone. Rows other processes have mapped
+        # are never rewritten: appends only add past them, and rebuilds go to new files.
+        added = 0
+        if self.path_prefix is None:
+            ids, values = self._memory
+            id_parts, value_parts = [ids[:rows]], [values[:rows]]
+            for chunk_ids, chunk_values in self.db_manager.iter_score_arrays(after_id, until_id, self.chunksize):
+                id_parts.append(chunk_ids)
+                value_parts.append(chunk_values)
+                added += len(chunk_ids)
+            self._memory = (np.concatenate(id_parts), np.concatenate(value_parts))
+            return added
+
+        ids_path, values_path = self._data_path(generation, '.ids'), self._data_path(generation, '.f32')
+        with open(ids_path, 'ab') as ids_file, open(values_path, 'ab') as values_file:
+            ids_file.truncate(rows * ID_COLUMNS * 8)
+            values_file.truncate(rows * VALUE_COLUMNS * 4)
+            for chunk_ids, chunk_values in self.db_manager.iter_score_arrays(after_id, until_id, self.chunksize):
+                ids_file.write(chunk_ids.tobytes())
+                values_file.write(chunk_values.tobytes())
+                added += len(chunk_ids)
+        return added
+
+    def _next_generation(self, generation: int) -> int:
+        # Past every generation still on disk, so a rebuild never truncates files that may be
+        # mapped, even when the meta file was lost
+        generations = [generation]
+        if self.path_prefix is not None:
+            for path in glob.glob(glob.escape(self.path_prefix) + '.*.ids'):
+                try:
+                    generations.append(int(path[len(self.path_prefix) + 1:-len('.ids')]))
+                except ValueError:
+                    pass
+        return max(generations) + 1
+
+    def _remove_old_generations(self, generation: int):
+        # Superseded files may still be memory-mapped by a view here or in another process,
+        # which Windows refuses to delete; those are retried after the next rebuild.
+        if self.path_prefix is None:
+            return
+        current = {self._data_path(generation, suffix) for suffix in ('.ids', '.f32')}
+        prefix = glob.escape(self.path_prefix)
+        # <prefix>.ids/.f32 are the unversioned names of format 1
+        for pattern in ('.*.ids', '.*.f32', '.ids', '.f32'):
+            for path in glob.glob(prefix + pattern):
+                if path not in current:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def load(self) -> Tuple[np.ndarray, np.ndarray]:
+        # (ids int64 [n, 2], values float32 [n, 5]) as read-only memory maps of a synced snapshot
+        with self._locked():
+            meta = self._sync()
+            rows = meta['rows']
+            if self.path_prefix is None:
+                ids, values = self._memory
+                return ids[:rows], values[:rows]
+            if rows == 0:
+                return np.empty((0, ID_COLUMNS), np.int64), np.empty((0, VALUE_COLUMNS), np.float32)
+            ids = np.memmap(self._data_path(meta['generation'], '.ids'), dtype=np.int64, mode='r',
+                            shape=(rows, ID_COLUMNS))
+            values = np.memmap(self._data_path(meta['generation'], '.f32'), dtype=np.float32, mode='r',
+                               shape=(rows, VALUE_COLUMNS))
+            return ids, values
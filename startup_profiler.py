@@ -0,0 +1,71 @@
+import builtins
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    # Records named phase timings and, while import tracking is on, the time spent importing
+    # each top-level package on the main thread (exclusive of the packages it imports).
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.phases = []
+        self.imports = defaultdict(float)
+        self._original_import = None
+        self._main_thread = threading.get_ident()
+        self._stack = []
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def start_import_tracking(self):
+        if self.enabled and self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._timed_import
+
+    def stop_import_tracking(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        if level or name in sys.modules or threading.get_ident() != self._main_thread:
+            return original(name, globals, locals, fromlist, level)
+        frame = [name.partition('.')[0], 0.0]
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            total = time.perf_counter() - start
+            self._stack.pop()
+            self.imports[frame[0]] += total - frame[1]
+            if self._stack:
+                self._stack[-1][1] += total
+
+    def report(self, file=None):
+        file = file or sys.stderr
+        print(f"Startup profile ({self.elapsed() * 1000:.0f} ms to first window)", file=file)
+        print("  Phases:", file=file)
+        for name, seconds in self.phases:
+            print(f"    {name:<28} {seconds * 1000:8.1f} ms", file=file)
+        if self.imports:
+            print("  Imports (slowest 15):", file=file)
+            for name, seconds in sorted(self.imports.items(), key=lambda item: -item[1])[:15]:
+                if seconds >= 0.001:
+                    print(f"    {name:<28} {seconds * 1000:8.1f} ms", file=file)
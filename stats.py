@@ -0,0 +1,72 @@
+import numpy as np
+
+
+class RunningMoments:
+    # Mergeable count / mean / co-moment accumulator (Chan et al. parallel update), so
+    # means, covariances and correlations can be maintained without keeping the rows.
+    def __init__(self, n_features: int):
+        self.n_features = n_features
+        self.count = 0
+        self.mean = np.zeros(n_features)
+        self.comoment = np.zeros((n_features, n_features))
+
+    @classmethod
+    def from_array(cls, X: np.ndarray) -> "RunningMoments":
+        moments = cls(X.shape[1])
+        moments.update(X)
+        return moments
+
+    @classmethod
+    def from_sums(cls, count: int, sums: np.ndarray, cross: np.ndarray) -> "RunningMoments":
+        moments = cls(len(sums))
+        if count:
+            moments.count = int(count)
+            moments.mean = np.asarray(sums, dtype=float) / count
+            moments.comoment = np.asarray(cross, dtype=float) - count * np.outer(moments.mean, moments.mean)
+        return moments
+
+    def copy(self) -> "RunningMoments":
+        other = RunningMoments(self.n_features)
+        other.count = self.count
+        other.mean = self.mean.copy()
+        other.comoment = self.comoment.copy()
+        return other
+
+    def update(self, X: np.ndarray):
+        X = np.asarray(X, dtype=float)
+        if X.size == 0:
+            return
+        batch = RunningMoments(self.n_features)
+        batch.count = len(X)
+        batch.mean = X.mean(axis=0)
+        centered = X - batch.mean
+        batch.comoment = centered.T @ centered
+        self.merge(batch)
+
+    def merge(self, other: "RunningMoments"):
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count = other.count
+            self.mean = other.mean.copy()
+            self.comoment = other.comoment.copy()
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * (self.count * other.count / total)
+        self.mean = self.mean + delta * (other.count / total)
+        self.count = total
+
+    def variance(self, ddof: int = 0) -> np.ndarray:
+        return np.diag(self.covariance(ddof))
+
+    def covariance(self, ddof: int = 0) -> np.ndarray:
+        if self.count - ddof <= 0:
+            return np.full((self.n_features, self.n_features), np.nan)
+        return self.comoment / (self.count - ddof)
+
+    def correlation(self) -> np.ndarray:
+        cov = self.covariance()
+        std = np.sqrt(np.diag(cov))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return cov / np.outer(std, std)
@@ -0,0 +1,123 @@
+import threading
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Tuple
+
+from db_manager import DatabaseManager
+
+
+class StudentDirectory:
+    # Cached copy of the students table for the prediction tab. Lookups by id, roll number or
+    # "name (roll)" label are dict hits; search() serves type-ahead from sorted prefix keys and
+    # falls back to a substring scan over one joined string. The cache reloads only when the
+    # database's write_version has moved since the last load.
+    def __init__(self, db_manager: DatabaseManager, max_results: int = 20):
+        self.db_manager = db_manager
+        self.max_results = max_results
+        self._lock = threading.Lock()
+        self._version = None
+        self._load([])
+
+    def __len__(self) -> int:
+        return len(self._index[0])
+
+    @staticmethod
+    def format_label(name: str, roll_number: str) -> str:
+        return f"{name} ({roll_number})"
+
+    @property
+    def stale(self) -> bool:
+        return self._version != self.db_manager.write_version
+
+    def refresh(self, force: bool = False) -> bool:
+        # Safe to call from a worker thread; readers keep using the previous snapshot until the
+        # new one is swapped in.
+        with self._lock:
+            if not force and not self.stale:
+                return False
+            version = self.db_manager.write_version
+            # Names and rolls are the score matrix's interned strings, not a second copy
+            self._load(self.db_manager.score_matrix.refresh().students())
+            self._version = version
+            return True
+
+    def _load(self, students: List[Tuple[int, str, str]]):
+        labels = [self.format_label(name, roll) for _, name, roll in students]
+        by_id = {row[0]: i for i, row in enumerate(students)}
+        by_roll = {row[2]: i for i, row in enumerate(students)}
+        by_label = {label: i for i, label in enumerate(labels)}
+
+        keys = [(name.casefold(), i) for i, (_, name, _) in enumerate(students)]
+        keys += [(roll.casefold(), i) for i, (_, _, roll) in enumerate(students)]
+        keys.sort()
+        prefix_keys = [key for key, _ in keys]
+        prefix_rows = [i for _, i in keys]
+
+        # One newline-joined haystack so substring search is a few str.find calls; offsets map
+        # a hit position back to its row.
+        folded = [label.casefold() for label in labels]
+        offsets = []
+        position = 0
+        for text in folded:
+            offsets.append(position)
+            position += len(text) + 1
+        haystack = '\n'.join(folded)
+
+        # Swapped in with a single assignment so concurrent readers never see a half-built index
+        self._index = (students, labels, by_id, by_roll, by_label,
+                       prefix_keys, prefix_rows, offsets, haystack)
+
+    def get(self, student_id: int) -> Optional[Tuple[int, str, str]]:
+        students, _, by_id = self._index[:3]
+        i = by_id.get(student_id)
+        return None if i is None else students[i]
+
+    def get_by_roll(self, roll_number: str) -> Optional[Tuple[int, str, str]]:
+        students, _, _, by_roll = self._index[:4]
+        i = by_roll.get(roll_number)
+        return None if i is None else students[i]
+
+    def label(self, student_id: int) -> Optional[str]:
+        _, labels, by_id = self._index[:3]
+        i = by_id.get(student_id)
+        return None if i is None else labels[i]
+
+    def lookup(self, text: str) -> Optional[int]:
+        # Resolves what the combobox holds: an exact label or a bare roll number
+        students, _, _, by_roll, by_label = self._index[:5]
+        text = text.strip()
+        i = by_label.get(text)
+        if i is None:
+            i = by_roll.get(text)
+        return None if i is None else students[i][0]
+
+    def search(self, text: str, limit: Optional[int] = None) -> List[str]:
+        limit = limit or self.max_results
+        query = text.strip().casefold()
+        _, labels, _, _, _, keys, rows, offsets, haystack = self._index
+        if not query:
+            return labels[:limit]
+
+        seen = set()
+        results = []
+        start = bisect_left(keys, query)
+        end = bisect_right(keys, query + '\uffff', start)
+        for j in range(start, min(end, start + limit * 2)):
+            i = rows[j]
+            if i not in seen:
+                seen.add(i)
+                results.append(labels[i])
+                if len(results) == limit:
+                    return results
+
+        position = haystack.find(query)
+        while position != -1:
+            i = bisect_right(offsets, position) - 1
+            if i not in seen:
+                seen.add(i)
+                results.append(labels[i])
+                if len(results) == limit:
+                    break
+            # Skip to the next label so one row is not matched repeatedly
+            next_start = offsets[i + 1] if i + 1 < len(offsets) else len(haystack)
+            position = haystack.find(query, next_start)
+        return results
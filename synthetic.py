@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from typing import Iterator, Optional, Sequence, Union
+
+import numpy as np
+
+from db_manager import DatabaseManager, SCORE_COLUMNS
+from lazy import LazyModule
+
+pd = LazyModule('pandas')
+
+
+class SyntheticCohortGenerator:
+    # Vectorized synthetic cohorts on a private numpy Generator (global RNG state is never
+    # touched). Skills are drawn through a Gaussian copula so they can be correlated while
+    # keeping a uniform or normal marginal; the final score is a weighted sum plus noise.
+    def __init__(self, seed: Optional[int] = None, distribution: str = 'uniform',
+                 low: float = 50, high: float = 100, mean: float = 75, std: float = 12,
+                 correlation: Union[float, Sequence[Sequence[float]]] = 0.0,
+                 weights: Sequence[float] = (0.25, 0.25, 0.30, 0.20), noise: float = 10,
+                 missing_final_rate: float = 0.0, scores_per_student: int = 1):
+        if distribution not in ('uniform', 'normal'):
+            raise ValueError("distribution must be 'uniform' or 'normal'")
+        self.rng = np.random.default_rng(seed)
+        self.distribution = distribution
+        self.low, self.high = low, high
+        self.mean, self.std = mean, std
+        self.weights = np.asarray(weights, dtype=float)
+        self.noise = noise
+        self.missing_final_rate = missing_final_rate
+        self.scores_per_student = max(int(scores_per_student), 1)
+
+        n = len(SCORE_COLUMNS)
+        if np.isscalar(correlation):
+            matrix = np.full((n, n), float(correlation))
+            np.fill_diagonal(matrix, 1.0)
+        else:
+            matrix = np.asarray(correlation, dtype=float)
+        self._cholesky = np.linalg.cholesky(matrix)
+        self._correlated = not np.allclose(matrix, np.eye(n))
+
+    def generate(self, n_rows: int, start_index: int = 0) -> pd.DataFrame:
+        n_skills = len(SCORE_COLUMNS)
+        if self.distribution == 'uniform' and not self._correlated:
+            skills = self.rng.uniform(self.low, self.high, (n_rows, n_skills))
+        else:
+            z = self.rng.standard_normal((n_rows, n_skills)) @ self._cholesky.T
+            if self.distribution == 'normal':
+                skills = np.clip(self.mean + self.std * z, 0, 100)
+            else:
+                from scipy.special import ndtr
+                skills = self.low + (self.high - self.low) * ndtr(z)
+
+        final = skills @ self.weights + self.rng.uniform(-self.noise, self.noise, n_rows)
+        final = np.clip(final, 0, 100).round(2)
+        if self.missing_final_rate > 0:
+            final[self.rng.random(n_rows) < self.missing_final_rate] = np.nan
+
+        ids = ((start_index + np.arange(n_rows)) // self.scores_per_student).astype(str)
+        df = pd.DataFrame(skills.round(2), columns=SCORE_COLUMNS)
+        df.insert(0, 'roll_number', np.char.add('S', np.char.zfill(ids, 8)))
+        df.insert(0, 'name', np.char.add('Student ', ids))
+        df['final_exam_score'] = final
+        return df
+
+    def iter_chunks(self, n_rows: int, chunksize: int = 100000, start_index: int = 0) -> Iterator[pd.DataFrame]:
+        for offset in range(0, n_rows, chunksize):
+            yield self.generate(min(chunksize, n_rows - offset), start_index + offset)
+
+    def seed_database(self, db_manager: DatabaseManager, n_rows: int, chunksize: int = 100000,
+                      start_index: int = 0, progress=None) -> int:
+        # Each chunk is committed on its own so memory and WAL size stay bounded at any n_rows
+        inserted = 0
+        for chunk in self.iter_chunks(n_rows, chunksize, start_index):
+            inserted += db_manager.bulk_add_scores(chunk, chunksize=chunksize)[0]
+            if progress is not None:
+                progress(inserted, n_rows)
+        return inserted
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DatabaseManager  # noqa: E402
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    db_manager = DatabaseManager(str(tmp_path / 'students.db'))
+    yield db_manager
+    db_manager.close()
@@ -0,0 +1,59 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from cli import build_parser
+from db_manager import PREDICTION_COLUMNS
+
+
+def run(*argv) -> int:
+    args = build_parser().parse_args(list(argv))
+    return args.handler(args)
+
+
+@pytest.fixture
+def students_db(db_manager):
+    for i in range(6):
+        db_manager.add_student_score(f'Student {i}', f'R{i}', 60 + i, 70, 80, 65, 72)
+    db_manager.close()
+    return db_manager.db_name
+
+
+def prediction_count(db_name) -> int:
+    with sqlite3.connect(db_name) as conn:
+        return conn.execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+
+
+def test_table_runs_rescore_everyone_unless_resuming(students_db, capsys):
+    assert run('score', '--db', students_db, '--workers', '1', '--chunksize', '2') == 0
+    assert prediction_count(students_db) == 6
+    # The table still holds the first run's rows, which must not look like progress
+    assert run('score', '--db', students_db, '--workers', '1', '--chunksize', '2', '--resume') == 0
+    assert 'Done: 6 students' in capsys.readouterr().out
+
+
+def test_interrupted_table_run_resumes_after_its_last_saved_student(students_db, db_manager, capsys):
+    run_id, start_after = db_manager.start_score_run()
+    assert start_after == 0
+    latest = db_manager.fetch_latest_scores().head(2)
+    db_manager.save_predictions(latest.assign(predicted_score=70.0, cluster_id=0, cluster_name='Average',
+                                              recommendation='')[PREDICTION_COLUMNS], run_id)
+    db_manager.close()
+
+    assert run('score', '--db', students_db, '--workers', '1', '--chunksize', '2', '--resume') == 0
+    out = capsys.readouterr().out
+    assert 'Resuming after student id 2' in out
+    assert 'Done: 4 students' in out
+    # Finished, so another --resume starts over
+    assert run('score', '--db', students_db, '--workers', '1', '--resume') == 0
+    assert 'Done: 6 students' in capsys.readouterr().out
+
+
+def test_csv_resume_continues_after_the_highest_written_id(students_db, tmp_path, capsys):
+    out = str(tmp_path / 'predictions.csv')
+    assert run('score', '--db', students_db, '--out', out, '--workers', '1') == 0
+    pd.read_csv(out).head(3).to_csv(out, index=False)
+    assert run('score', '--db', students_db, '--out', out, '--workers', '1', '--resume') == 0
+    assert 'Resuming after student id 3' in capsys.readouterr().out
+    assert pd.read_csv(out)['student_id'].tolist() == [1, 2, 3, 4, 5, 6]
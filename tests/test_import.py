@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from db_manager import IMPORT_COLUMNS, ImportCancelled
+
+ROWS = [
+    ('Ada', 'R1', 70, 80, 90, 60, 75),
+    ('', 'R2', 70, 80, 90, 60, 75),
+    ('Bob', '  ', 70, 80, 90, 60, 75),
+    ('Cy', 'R3', 'n/a', 80, 90, 60, 75),
+    ('Di', 'R4', 70, 80, 90, None, 75),
+    ('Ed', 'R5', 70, 80, 90, 60, 'absent'),
+    ('Fay', 'R6', 70, 80, 90, 60, None),
+    ('Ada', ' R1 ', 71, 81, 91, 61, 76),
+]
+EXPECTED_REJECTS = [(1, 'missing name'), (2, 'missing roll_number'), (3, 'invalid math_score'),
+                    (4, 'invalid communication_score'), (5, 'invalid final_exam_score')]
+
+
+def test_rejects_are_reported_by_input_row(db_manager):
+    # A small chunk size so row numbers have to carry across chunks
+    inserted, rejects = db_manager.bulk_add_scores(pd.DataFrame(ROWS, columns=IMPORT_COLUMNS), chunksize=3)
+    assert inserted == 3
+    assert rejects == EXPECTED_REJECTS
+
+    # The repeated roll number (after stripping) reuses its student
+    assert db_manager.get_students_list() == [(1, 'Ada', 'R1'), (2, 'Fay', 'R6')]
+    assert db_manager.get_student_scores(1)['math_score'] == 71
+    assert db_manager.get_student_scores(2)['final_exam_score'] is None
+
+
+def test_rows_and_csv_files_give_the_same_result(db_manager, tmp_path):
+    inserted, rejects = db_manager.bulk_add_scores(iter(ROWS), chunksize=3)
+    assert (inserted, rejects) == (3, EXPECTED_REJECTS)
+
+    path = tmp_path / 'scores.csv'
+    pd.DataFrame(ROWS, columns=IMPORT_COLUMNS).to_csv(path, index=False)
+    progress = []
+    inserted, rejects = db_manager.import_csv_file(str(path), chunksize=3,
+                                                   progress=lambda done, total: progress.append((done, total)))
+    assert (inserted, rejects) == (3, EXPECTED_REJECTS)
+    assert progress == [(3, 8), (6, 8), (8, 8)]
+    assert len(db_manager.get_students_list()) == 2
+
+
+def test_missing_csv_column_is_an_error(db_manager, tmp_path):
+    path = tmp_path / 'scores.csv'
+    pd.DataFrame(ROWS, columns=IMPORT_COLUMNS).drop(columns='logic_score').to_csv(path, index=False)
+    with pytest.raises(ValueError, match='logic_score'):
+        db_manager.import_csv_file(str(path))
+
+
+def test_cancelled_import_is_rolled_back(db_manager):
+    chunks = []
+    with pytest.raises(ImportCancelled):
+        db_manager.bulk_add_scores(pd.DataFrame(ROWS, columns=IMPORT_COLUMNS), chunksize=3,
+                                   progress=chunks.append, should_cancel=lambda: len(chunks) == 2)
+    assert db_manager.get_students_list() == []
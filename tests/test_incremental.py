@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from db_manager import IMPORT_COLUMNS
+from ml_engine import MLEngine
+
+
+def add_rows(db_manager, n, offset=0, shift=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    skills = np.clip(rng.normal(65 + shift, 12, size=(n, 4)), 0, 100).round(1)
+    final = (skills @ [0.3, 0.2, 0.3, 0.2] + rng.normal(0, 3, n)).round(1)
+    rows = [(f'Student {offset + i}', f'R{offset + i:05d}', *skills[i], final[i]) for i in range(n)]
+    db_manager.bulk_add_scores(pd.DataFrame(rows, columns=IMPORT_COLUMNS))
+
+
+@pytest.fixture
+def engine(db_manager):
+    add_rows(db_manager, 300)
+    engine = MLEngine(db_manager, autosave=False, cluster_candidates=(3,), cluster_restarts=1)
+    assert engine.train_models()
+    return engine
+
+
+@pytest.fixture
+def full_fits(engine, monkeypatch):
+    # One entry per full refit from here on
+    calls = []
+    train_models = engine.train_models
+
+    def counting_train_models(*args, **kwargs):
+        calls.append(1)
+        return train_models(*args, **kwargs)
+
+    monkeypatch.setattr(engine, 'train_models', counting_train_models)
+    return calls
+
+
+def test_new_rows_are_folded_in_without_a_refit(engine, full_fits):
+    add_rows(engine.db_manager, 50, offset=300, seed=1)
+    assert engine.update_models()
+    assert full_fits == []
+    assert engine.rows_seen == 350
+    assert engine.last_score_id == engine.db_manager.get_score_version()[1]
+
+    # Scaler and regression come from exact running moments, so they match a full refit
+    incremental = (engine.scaler.mean_.copy(), engine.scaler.var_.copy(),
+                   engine.regression_model.coef_.copy(), engine.regression_model.intercept_)
+    assert engine.update_models(force_full=True)
+    assert full_fits == [1]
+    np.testing.assert_allclose(incremental[0], engine.scaler.mean_, rtol=1e-6)
+    np.testing.assert_allclose(incremental[1], engine.scaler.var_, rtol=1e-5)
+    np.testing.assert_allclose(incremental[2], engine.regression_model.coef_, rtol=1e-4)
+    assert incremental[3] == pytest.approx(engine.regression_model.intercept_, rel=1e-5)
+
+
+def test_no_new_rows_is_a_no_op(engine, full_fits):
+    version = engine.model_version
+    assert engine.update_models()
+    assert full_fits == [] and engine.model_version == version
+
+
+def test_drift_triggers_a_full_refit(engine, full_fits):
+    add_rows(engine.db_manager, 300, offset=300, shift=25.0, seed=2)
+    assert engine.update_models()
+    assert full_fits == [1]
+    assert engine.rows_seen == 600
+
+
+@pytest.mark.parametrize('statement', ['DELETE FROM scores WHERE id = 5',
+                                       'UPDATE scores SET math_score = 99 WHERE id = 5'])
+def test_deleted_or_edited_rows_trigger_a_full_refit(engine, full_fits, statement):
+    add_rows(engine.db_manager, 10, offset=300, seed=3)
+    with engine.db_manager.transaction() as conn:
+        conn.execute(statement)
+    assert engine.update_models()
+    assert full_fits == [1]
+    assert engine.last_score_id == engine.db_manager.get_score_version()[1]
+
+
+def test_updated_centroids_stay_ranked(engine, full_fits):
+    engine.drift_threshold = float('inf')
+    # Level the two weakest groups, then feed the last one rows that lift it above the other
+    centers = engine.clustering_model.cluster_centers_.copy()
+    direction = np.array([1.0, -1.01, 0.0, 0.0])
+    centers[-1] = centers[-2] + 0.05 * direction
+    engine.clustering_model.cluster_centers_ = centers
+    engine._cluster_counts[-1] = 1
+    target = engine.scaler.inverse_transform([centers[-2] + 0.2 * np.array([2.0, -1.0, 0.0, 0.0])])[0]
+    rows = [(f'Late {i}', f'L{i}', *target.round(2), 70) for i in range(5)]
+    engine.db_manager.bulk_add_scores(pd.DataFrame(rows, columns=IMPORT_COLUMNS))
+
+    assert engine.update_models()
+    assert full_fits == []
+    means = engine.clustering_model.cluster_centers_.mean(axis=1)
+    assert np.all(np.diff(means) <= 0)
+    # The grown group moved up one place and took its count with it
+    assert engine._cluster_counts[-2] == 6
@@ -0,0 +1,33 @@
+import pytest
+
+from db_manager import DatabaseManager
+from metrics import MetricsRegistry
+
+
+@pytest.fixture
+def metrics_db(tmp_path):
+    db_manager = DatabaseManager(str(tmp_path / 'students.db'), metrics=MetricsRegistry())
+    yield db_manager
+    db_manager.close()
+
+
+def test_raised_exceptions_count_as_errors():
+    metrics = MetricsRegistry()
+    with pytest.raises(ValueError):
+        with metrics.timer('op'):
+            raise ValueError()
+    with metrics.timer('op'):
+        pass
+    assert metrics.snapshot()['operations']['op']['errors'] == 1
+
+
+def test_handled_database_failures_count_as_errors(metrics_db):
+    metrics_db.add_student_score('Ada', 'R1', 70, 80, 90, 60, 75)
+    with metrics_db.transaction() as conn:
+        conn.execute('DROP VIEW latest_scores')
+    # Both return their empty fallback instead of raising
+    assert metrics_db.fetch_latest_scores().empty
+    assert metrics_db.get_students_list() == [(1, 'Ada', 'R1')]
+    operations = metrics_db.metrics.snapshot()['operations']
+    assert operations['db.fetch_latest_scores']['errors'] == 1
+    assert operations['db.get_students_list']['errors'] == 0
@@ -0,0 +1,69 @@
+import sqlite3
+
+import pytest
+
+from db_manager import DatabaseManager
+
+
+@pytest.fixture
+def cached_db(db_manager):
+    db_manager.add_student_score('Ada', 'R1', 70, 80, 90, 60, 75)
+    db_manager.add_student_score('Bob', 'R2', 50, 55, 60, 65, 58)
+    return db_manager
+
+
+def test_repeated_reads_hit_the_cache(cached_db):
+    first = cached_db.get_students_list()
+    hits = cached_db.query_cache.hits
+    assert cached_db.get_students_list() == first
+    assert cached_db.get_student_scores(1) == cached_db.get_student_scores(1)
+    assert cached_db.query_cache.hits == hits + 1 + 1
+
+
+def test_hits_return_copies(cached_db):
+    cached_db.get_students_list().clear()
+    cached_db.fetch_all_data().drop(index=0, inplace=True)
+    assert len(cached_db.get_students_list()) == 2
+    assert len(cached_db.fetch_all_data()) == 2
+
+
+def test_own_writes_invalidate(cached_db):
+    assert cached_db.get_student_scores(1)['math_score'] == 70
+    assert len(cached_db.fetch_all_data()) == 2
+    cached_db.add_student_score('Ada', 'R1', 95, 80, 90, 60, 75)
+    assert cached_db.get_student_scores(1)['math_score'] == 95
+    assert len(cached_db.fetch_all_data()) == 3
+
+
+def test_other_connections_invalidate(cached_db):
+    assert len(cached_db.get_students_list()) == 2
+    # A separate connection stands in for another process editing the file
+    other = sqlite3.connect(cached_db.db_name)
+    with other:
+        other.execute("INSERT INTO students (name, roll_number) VALUES ('Cy', 'R3')")
+        other.execute('UPDATE scores SET math_score = 10 WHERE student_id = 1')
+    other.close()
+    assert len(cached_db.get_students_list()) == 3
+    assert cached_db.get_student_scores(1)['math_score'] == 10
+
+
+def test_reads_inside_a_transaction_bypass_the_cache(cached_db):
+    assert len(cached_db.get_students_list()) == 2
+    with cached_db.transaction() as conn:
+        conn.execute("INSERT INTO students (name, roll_number) VALUES ('Cy', 'R3')")
+        assert len(cached_db.get_students_list()) == 3
+        assert len(cached_db.query_cache) == 1
+
+
+def test_large_results_are_not_cached(tmp_path):
+    db_manager = DatabaseManager(str(tmp_path / 'students.db'), query_cache_max_rows=2)
+    try:
+        for i in range(3):
+            db_manager.add_student_score(f'Student {i}', f'R{i}', 70, 80, 90, 60, 75)
+        db_manager.fetch_all_data()
+        db_manager.get_students_list()
+        assert len(db_manager.query_cache) == 0
+        db_manager.get_student_scores(1)
+        assert len(db_manager.query_cache) == 1
+    finally:
+        db_manager.close()
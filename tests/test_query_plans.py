@@ -0,0 +1,63 @@
+import re
+
+import pandas as pd
+import pytest
+
+from db_manager import IMPORT_COLUMNS, ROSTER_SORT_COLUMNS
+
+# A pass over every score row: a SCAN, a SEARCH with no index to search (SQLite walks the
+# rowids for MAX(id)), or an automatic index built from a scan for this one query
+FULL_SCORE_SCAN = re.compile(r'^(SCAN (scores|sc)\b|SEARCH (scores|sc)( USING AUTOMATIC|$))')
+
+
+@pytest.fixture
+def scored_db(db_manager):
+    rows = [(f'Student {i}', f'R{i:04d}', 60, 70, 80, 90, 75) for i in range(200)]
+    # Two score rows per student so "latest" has something to pick between
+    db_manager.bulk_add_scores(pd.DataFrame(rows + rows, columns=IMPORT_COLUMNS))
+    return db_manager
+
+
+def plans(db_manager, operation):
+    # Every statement operation runs, with its EXPLAIN QUERY PLAN details
+    statements = []
+    connection = db_manager.connection()
+    connection.set_trace_callback(statements.append)
+    try:
+        operation()
+    finally:
+        connection.set_trace_callback(None)
+    return {sql: [row[3] for row in connection.execute('EXPLAIN QUERY PLAN ' + sql)]
+            for sql in statements if sql.lstrip().upper().startswith('SELECT')}
+
+
+def assert_no_score_scan(db_manager, operation):
+    found = plans(db_manager, operation)
+    assert found
+    for sql, details in found.items():
+        assert not any(FULL_SCORE_SCAN.match(detail) for detail in details), (sql, details)
+
+
+def test_student_scores_lookup(scored_db):
+    scored_db.query_cache.clear()
+    assert_no_score_scan(scored_db, lambda: scored_db.get_student_scores(42))
+
+
+def test_latest_scores(scored_db):
+    assert_no_score_scan(scored_db, scored_db.fetch_latest_scores)
+    assert_no_score_scan(scored_db, lambda: list(scored_db.iter_latest_score_chunks(chunksize=50, after_student_id=10)))
+
+
+def test_score_arrays(scored_db):
+    assert_no_score_scan(scored_db, lambda: list(scored_db.iter_score_arrays(after_id=100, until_id=300)))
+
+
+@pytest.mark.parametrize('sort', list(ROSTER_SORT_COLUMNS))
+@pytest.mark.parametrize('filters', [{}, {'search': 'Student 1'}, {'cluster_name': 'Average'}])
+def test_roster_page(scored_db, sort, filters):
+    latest = scored_db.fetch_latest_scores()
+    scored_db.save_predictions(latest.assign(predicted_score=70.0, cluster_id=latest['student_id'] % 2,
+                                             cluster_name='Average', recommendation=''))
+    first = scored_db.roster_page(sort, limit=20, **filters)
+    after = (first[sort].iloc[-1], int(first['student_id'].iloc[-1]))
+    assert_no_score_scan(scored_db, lambda: scored_db.roster_page(sort, limit=20, after=after, **filters))
@@ -0,0 +1,80 @@
+import random
+
+import pandas as pd
+import pytest
+
+import db_manager as db_module
+
+CLUSTERS = ['High', 'Average', 'Low']
+
+
+@pytest.fixture
+def roster_db(db_manager):
+    rng = random.Random(7)
+    prefixes = ['alice', 'Alice', 'bob', 'Bo', 'SAM', 'sam', 'Zoe']
+    rows = [(f'{rng.choice(prefixes)} {rng.randint(0, 40)}', f"{rng.choice(['S', 's', 'R'])}{i:04d}",
+             *(rng.randint(0, 100) for _ in range(4)), rng.randint(0, 100)) for i in range(300)]
+    db_manager.bulk_add_scores(pd.DataFrame(rows, columns=db_module.IMPORT_COLUMNS))
+    latest = db_manager.fetch_latest_scores().iloc[::3]
+    # Coarse scores and clusters so ties need the id tie-break
+    clusters = [rng.randint(0, 2) for _ in range(len(latest))]
+    db_manager.save_predictions(pd.DataFrame({
+        'student_id': latest['student_id'], 'score_id': latest['score_id'],
+        'predicted_score': [rng.randint(0, 10) * 10.0 for _ in range(len(latest))],
+        'cluster_id': clusters, 'cluster_name': [CLUSTERS[c] for c in clusters], 'recommendation': '',
+    }))
+    return db_manager
+
+
+def expected_ids(db_manager, sort, descending, search, cluster_name):
+    df = db_manager.roster_page(limit=1000)
+    if search:
+        needle = search.lower()
+        df = df[df['name'].str.lower().str.startswith(needle) | df['roll_number'].str.lower().str.startswith(needle)]
+    if cluster_name is not None:
+        df = df[df['cluster_name'] == cluster_name]
+    if sort == 'predicted_score':
+        df = df[df['predicted_score'].notna()]
+    key = df[sort].str.lower() if sort in ('name', 'roll_number') else df[sort]
+    df = df.assign(key=key).sort_values(['key', 'student_id'], ascending=not descending, kind='stable')
+    return df['student_id'].tolist()
+
+
+@pytest.mark.parametrize('probe_rows', [10, 5000])
+@pytest.mark.parametrize('sort', list(db_module.ROSTER_SORT_COLUMNS))
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('search,cluster_name', [(None, None), ('s', None), ('SAM', None), ('s00', None),
+                                                 (None, 'Average'), ('a', 'Low'), ('zz', None)])
+def test_pages_match_a_full_sort(roster_db, monkeypatch, probe_rows, sort, descending, search, cluster_name):
+    monkeypatch.setattr(db_module, 'ROSTER_PROBE_ROWS', probe_rows)
+    expected = expected_ids(roster_db, sort, descending, search, cluster_name)
+    assert roster_db.roster_count(search, cluster_name, require_prediction=sort == 'predicted_score') == len(expected)
+
+    pages, after = [], None
+    while True:
+        page = roster_db.roster_page(sort, descending, 7, after=after, search=search, cluster_name=cluster_name)
+        assert list(page.columns) == db_module.ROSTER_COLUMNS
+        if page.empty:
+            break
+        pages.append(page)
+        after = (page[sort].iloc[-1], int(page['student_id'].iloc[-1]))
+    assert [i for page in pages for i in page['student_id']] == expected
+
+    # Paging back from each page's first row returns the page before it
+    for previous, page in zip(pages, pages[1:]):
+        before = (page[sort].iloc[0], int(page['student_id'].iloc[0]))
+        back = roster_db.roster_page(sort, descending, 7, before=before, search=search, cluster_name=cluster_name)
+        assert back['student_id'].tolist() == previous['student_id'].tolist()
+
+
+def test_cluster_filter_uses_the_stored_name(db_manager):
+    # Rows scored by models with different cluster counts share ids but not names
+    db_manager.add_student_score('Ada', 'R1', 70, 80, 90, 60, 75)
+    db_manager.add_student_score('Bob', 'R2', 50, 55, 60, 65, 58)
+    db_manager.save_predictions(pd.DataFrame({
+        'student_id': [1, 2], 'score_id': [1, 2], 'predicted_score': [80.0, 55.0], 'cluster_id': [1, 1],
+        'cluster_name': ['Average', 'Above Average'], 'recommendation': '',
+    }))
+    page = db_manager.roster_page(cluster_name='Average')
+    assert page['student_id'].tolist() == [1]
+    assert db_manager.roster_count(cluster_name='Above Average') == 1
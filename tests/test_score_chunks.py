@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from db_manager import IMPORT_COLUMNS, SCORE_COLUMNS
+
+
+@pytest.fixture
+def scored_db(db_manager):
+    rows = [(f'Student {i}', f'R{i:03d}', 50 + i % 40, 60 + i % 30, 40 + i % 50, 70 + i % 20, 55 + i % 35)
+            for i in range(23)]
+    db_manager.bulk_add_scores(pd.DataFrame(rows, columns=IMPORT_COLUMNS))
+    return db_manager
+
+
+def test_chunks_page_across_boundaries(scored_db):
+    chunks = list(scored_db.iter_score_chunks(chunksize=5))
+    assert [len(chunk) for chunk in chunks] == [5, 5, 5, 5, 3]
+    combined = pd.concat(chunks, ignore_index=True)
+    assert combined['score_id'].tolist() == list(range(1, 24))
+    assert list(combined.columns) == ['score_id', *SCORE_COLUMNS, 'final_exam_score']
+    expected = scored_db.fetch_all_data().sort_values('score_id', ignore_index=True)
+    pd.testing.assert_frame_equal(combined[SCORE_COLUMNS], expected[SCORE_COLUMNS], check_dtype=False)
+
+
+def test_chunks_resume_after_an_id(scored_db):
+    chunks = list(scored_db.iter_score_chunks(chunksize=4, after_id=15))
+    assert [chunk['score_id'].tolist() for chunk in chunks] == [[16, 17, 18, 19], [20, 21, 22, 23]]
+    assert list(scored_db.iter_score_chunks(chunksize=4, after_id=23)) == []
+
+
+def test_chunks_project_the_requested_columns(scored_db):
+    chunk = next(scored_db.iter_score_chunks(chunksize=3, columns=['roll_number', 'math_score']))
+    assert list(chunk.columns) == ['score_id', 'roll_number', 'math_score']
+    assert chunk['roll_number'].tolist() == ['R000', 'R001', 'R002']
+    assert chunk['math_score'].tolist() == [50, 51, 52]
+
+
+def test_unknown_columns_are_rejected(scored_db):
+    with pytest.raises(ValueError, match='bogus'):
+        next(scored_db.iter_score_chunks(columns=['math_score', 'bogus']))
+
+
+def test_streamed_moments_match_the_stored_aggregates(scored_db):
+    streamed = scored_db.score_moments(chunksize=4)
+    stored = scored_db.get_score_moments()
+    assert streamed.count == stored.count == 23
+    np.testing.assert_allclose(streamed.mean, stored.mean)
+    np.testing.assert_allclose(streamed.covariance(), stored.covariance())
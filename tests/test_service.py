@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from db_manager import IMPORT_COLUMNS, SCORE_COLUMNS
+from ml_engine import MLEngine
+from service import ScoringService
+
+
+def add_rows(db_manager, n, offset=0, seed=0):
+    rng = np.random.default_rng(seed)
+    skills = np.clip(rng.normal(65, 12, size=(n, 4)), 0, 100).round(1)
+    final = (skills @ [0.3, 0.2, 0.3, 0.2] + rng.normal(0, 3, n)).round(1)
+    rows = [(f'Student {offset + i}', f'R{offset + i:05d}', *skills[i], final[i]) for i in range(n)]
+    db_manager.bulk_add_scores(pd.DataFrame(rows, columns=IMPORT_COLUMNS))
+
+
+@pytest.fixture
+def engine(db_manager):
+    add_rows(db_manager, 300)
+    engine = MLEngine(db_manager, autosave=False, cluster_candidates=(3,), cluster_restarts=1)
+    assert engine.train_models()
+    return engine
+
+
+async def call(port, method, path, payload=None, body=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        body = body if body is not None else json.dumps(payload).encode() if payload is not None else b''
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+                     f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        while (await reader.readline()) not in (b'\r\n', b''):
+            pass
+        return status, json.loads(await reader.read())
+    finally:
+        writer.close()
+
+
+def serve(engine, scenario, **options):
+    async def main():
+        service = ScoringService(engine, **options)
+        await service.start(port=0)
+        try:
+            return await scenario(service, service.address[1])
+        finally:
+            await service.stop()
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_share_bounded_batches(engine):
+    async def scenario(service, port):
+        payloads = [{'scores': [50 + i % 40, 60, 70, 80]} for i in range(64)]
+        responses = await asyncio.gather(*(call(port, 'POST', '/predict', payload) for payload in payloads))
+        return service.stats(), responses
+
+    stats, responses = serve(engine, scenario, max_batch_size=8, max_wait_ms=50)
+    assert [status for status, _ in responses] == [200] * 64
+    assert stats['max_batch_size'] == 8
+    assert 8 <= stats['batches'] < 64
+    # Each caller gets its own row back, not a neighbour's from the same batch
+    expected = engine.predict_matrix(np.array([[50 + i % 40, 60, 70, 80] for i in range(64)], dtype=float))[1]
+    np.testing.assert_allclose([payload['predicted_score'] for _, payload in responses], expected)
+
+
+def test_reload_under_load_keeps_serving(engine, db_manager):
+    async def scenario(service, port):
+        done = asyncio.Event()
+        responses = []
+
+        async def client(i):
+            while not done.is_set():
+                responses.append(await call(port, 'POST', '/predict', {'scores': [60 + i, 70, 80, 65]}))
+
+        clients = [asyncio.create_task(client(i)) for i in range(4)]
+        await asyncio.sleep(0.1)
+        add_rows(db_manager, 50, offset=300, seed=1)
+        reload_status, reload_payload = await call(port, 'POST', '/reload')
+        await service._retraining
+        await asyncio.sleep(0.1)
+        done.set()
+        await asyncio.gather(*clients)
+        return reload_status, reload_payload, responses
+
+    version = engine.model_version
+    reload_status, reload_payload, responses = serve(engine, scenario)
+    assert reload_status == 202 and reload_payload['started']
+    assert responses and all(status == 200 for status, _ in responses)
+    versions = [payload['model_version'] for _, payload in responses]
+    assert versions == sorted(versions) and versions[0] == version
+    assert versions[-1] == engine.model_version > version
+
+
+@pytest.mark.parametrize('body', [b'not json', b'[1, 2]', b'{"scores": [1, 2]}', b'{"scores": [1, 2, 3, "x"]}',
+                                  b'{"math_score": 50}', b'{"scores": [1, 2, 3, NaN]}'])
+def test_bad_bodies_are_rejected(engine, body):
+    async def scenario(service, port):
+        return await call(port, 'POST', '/predict', body=body)
+
+    status, payload = serve(engine, scenario)
+    assert status == 400
+    assert 'error' in payload
+
+
+def test_roll_number_lookup(engine, db_manager):
+    async def scenario(service, port):
+        return (await call(port, 'POST', '/predict', {'roll_number': 'R00007'}),
+                await call(port, 'POST', '/predict', {'roll_number': 'NOPE'}))
+
+    (status, payload), (missing_status, missing) = serve(engine, scenario)
+    assert status == 200 and payload['roll_number'] == 'R00007'
+    scores = db_manager.fetch_latest_scores().set_index('roll_number').loc['R00007']
+    assert payload['predicted_score'] == pytest.approx(engine.predict_student(*scores[SCORE_COLUMNS])[0])
+    assert missing_status == 404 and 'NOPE' in missing['error']
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from sharding import ShardedDatabase, decode_id, encode_id
+
+
+@pytest.fixture
+def sharded(tmp_path):
+    sharded = ShardedDatabase(str(tmp_path / 'cohorts'), max_workers=2)
+    sharded.add_student_score('2025 Spring', 'Ada', 'R1', 70, 80, 90, 60, 75)
+    sharded.add_student_score('2025 Fall', 'Bob', 'R1', 50, 55, 60, 65, 58)
+    yield sharded
+    sharded.close()
+
+
+def test_decode_id_returns_plain_ints():
+    shard_id, local_id = decode_id(np.int64(encode_id(3, 17)))
+    assert (shard_id, local_id) == (3, 17)
+    assert type(shard_id) is int and type(local_id) is int
+
+
+def test_student_scores_by_id_from_merged_frame(sharded):
+    df = sharded.fetch_all_data()
+    assert df['id'].is_unique
+    for i in range(len(df)):
+        # .iloc hands back numpy int64 ids
+        scores = sharded.get_student_scores(df['id'].iloc[i])
+        assert scores is not None
+        assert scores['math_score'] == df['math_score'].iloc[i]
+
+
+def test_student_scores_by_id_from_score_matrix(sharded):
+    view = sharded.score_matrix.refresh()
+    assert len(view) == 2
+    for student_id in view.student_ids:
+        assert sharded.get_student_scores(student_id) == view.latest_scores(student_id)
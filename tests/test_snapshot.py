@@ -0,0 +1,103 @@
+import glob
+import multiprocessing
+import sqlite3
+
+import numpy as np
+
+from db_manager import DatabaseManager
+
+
+def add_rows(db_manager, start, count):
+    for i in range(start, start + count):
+        db_manager.add_student_score(f'Student {i}', f'R{i}', 50 + i % 50, 60, 70, 80, 75 if i % 3 else None)
+
+
+def expected_arrays(db_manager):
+    rows = db_manager.connection().execute('''
+        SELECT id, student_id, math_score, logic_score, coding_score, communication_score, final_exam_score
+        FROM scores ORDER BY id
+    ''').fetchall()
+    ids = np.array([row[:2] for row in rows], dtype=np.int64).reshape(-1, 2)
+    values = np.array([[np.nan if v is None else v for v in row[2:]] for row in rows], dtype=np.float32).reshape(-1, 5)
+    return ids, values
+
+
+def assert_snapshot_matches(db_manager):
+    ids, values = db_manager.load_score_snapshot()
+    expected_ids, expected_values = expected_arrays(db_manager)
+    np.testing.assert_array_equal(ids, expected_ids)
+    np.testing.assert_array_equal(values, expected_values)
+
+
+def test_sync_appends_new_rows_in_place(db_manager):
+    add_rows(db_manager, 0, 20)
+    first = db_manager.score_snapshot.sync()
+    add_rows(db_manager, 20, 5)
+    second = db_manager.score_snapshot.sync()
+    assert second['generation'] == first['generation']
+    assert second['rows'] == 25
+    assert_snapshot_matches(db_manager)
+
+
+def test_sync_rebuilds_after_delete(db_manager):
+    add_rows(db_manager, 0, 20)
+    first = db_manager.score_snapshot.sync()
+    with db_manager.transaction() as conn:
+        conn.execute('DELETE FROM scores WHERE id = 5')
+    second = db_manager.score_snapshot.sync()
+    assert second['generation'] > first['generation']
+    assert second['rows'] == 19
+    assert_snapshot_matches(db_manager)
+
+
+def test_external_update_rebuilds_snapshot_and_matrix(db_manager):
+    add_rows(db_manager, 0, 10)
+    view = db_manager.score_matrix.refresh()
+    first = db_manager.score_snapshot.sync()
+
+    # Another process edits a row in place: row count and max id stay the same
+    external = sqlite3.connect(db_manager.db_name)
+    external.execute('UPDATE scores SET math_score = 99, final_exam_score = 42 WHERE id = 3')
+    external.commit()
+    external.close()
+
+    second = db_manager.score_snapshot.sync()
+    assert second['generation'] > first['generation']
+    assert_snapshot_matches(db_manager)
+    new_view = db_manager.score_matrix.refresh()
+    assert new_view is not view
+    assert new_view.values[new_view.row_of(3), 0] == 99
+    assert new_view.latest_scores(3) == db_manager.get_student_scores(3)
+
+
+def test_rebuild_removes_superseded_files(db_manager):
+    add_rows(db_manager, 0, 10)
+    db_manager.score_matrix.refresh()
+    db_manager.clear_database()
+    add_rows(db_manager, 100, 3)
+    db_manager.score_matrix.refresh()
+    prefix = db_manager.score_snapshot.path_prefix
+    generation = db_manager.score_snapshot.sync()['generation']
+    assert sorted(glob.glob(glob.escape(prefix) + '.*.ids')) == [f'{prefix}.{generation}.ids']
+    assert_snapshot_matches(db_manager)
+
+
+def _sync_worker(db_name, start):
+    db_manager = DatabaseManager(db_name)
+    for i in range(start, start + 30):
+        add_rows(db_manager, i, 1)
+        db_manager.score_snapshot.sync()
+    db_manager.close()
+
+
+def test_concurrent_processes_keep_snapshot_consistent(db_manager):
+    db_manager.score_snapshot.sync()
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=_sync_worker, args=(db_manager.db_name, start)) for start in (0, 1000, 2000)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+    assert db_manager.score_snapshot.sync()['rows'] == 90
+    assert_snapshot_matches(db_manager)
@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+# Seconds to the first painted window; raise it on slow CI runners
+BUDGET = os.environ.get('STARTUP_BUDGET_SECONDS', '3')
+
+
+@pytest.fixture(scope='session')
+def display():
+    # Probe in a child process so collection never opens a Tk root in the test runner
+    probe = subprocess.run([sys.executable, '-c', 'import tkinter; tkinter.Tk().destroy()'],
+                           capture_output=True, timeout=60)
+    if probe.returncode != 0:
+        pytest.skip("needs a display for the Tk window")
+
+
+def start(tmp_path, budget: str) -> subprocess.CompletedProcess:
+    # Run from a scratch directory so the app creates its default database there
+    return subprocess.run([sys.executable, MAIN, '--startup-budget', budget], cwd=str(tmp_path),
+                          capture_output=True, text=True, timeout=120)
+
+
+def test_first_window_within_budget(display, tmp_path):
+    result = start(tmp_path, BUDGET)
+    assert result.returncode == 0, result.stderr
+    assert 'within budget' in result.stderr
+
+
+def test_exceeding_the_budget_fails(display, tmp_path):
+    result = start(tmp_path, '0')
+    assert result.returncode == 1
+    assert 'EXCEEDS budget' in result.stderr
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Sequence, Tuple
+
+import numpy as np
+
+from db_manager import SCORE_COLUMNS
+from lazy import LazyModule
+
+if TYPE_CHECKING:
+    from ml_engine import MLEngine
+
+pd = LazyModule('pandas')
+
+# Predicted final score bands the recommendations are built around
+THRESHOLDS = (60, 75, 85)
+MAX_SCORE = 100.0
+
+
+def minimal_improvements(X: np.ndarray, predicted: np.ndarray, weights: np.ndarray,
+                         thresholds: Sequence[float] = THRESHOLDS, step: float = 0.5,
+                         max_score: float = MAX_SCORE) -> np.ndarray:
+    # [students, skills, thresholds] array of the smallest raise of a single skill, on a grid of
+    # step points, that lifts the (unrounded) linear prediction to each threshold: 0 when the
+    # student is already there, NaN when that skill alone cannot get there without passing
+    # max_score. The prediction is linear in every skill, so the first grid point past each
+    # threshold is solved for directly instead of scanning the grid.
+    gap = np.asarray(thresholds, dtype=float)[None, None, :] - np.asarray(predicted, dtype=float)[:, None, None]
+    weights = np.asarray(weights, dtype=float)[None, :, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        needed = np.where(weights > 0, gap / weights, np.inf)
+    # The tolerance keeps a raise that lands exactly on a grid point from rounding a step up
+    gains = np.where(gap <= 0, 0.0, np.ceil(needed / step - 1e-9) * step)
+    gains[gains > (max_score - X)[:, :, None] + 1e-9] = np.nan
+    return gains
+
+
+def best_improvements(gains: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # (skill index, raise) of the cheapest single-skill improvement per student and threshold;
+    # -1 and NaN where no single skill reaches it
+    filled = np.where(np.isnan(gains), np.inf, gains)
+    skills = filled.argmin(axis=1)
+    best = np.take_along_axis(filled, skills[:, None, :], axis=1)[:, 0, :]
+    unreachable = np.isinf(best)
+    return np.where(unreachable, -1, skills), np.where(unreachable, np.nan, best)
+
+
+def class_improvements(ml_engine: MLEngine, thresholds: Sequence[float] = THRESHOLDS,
+                       step: float = 0.5) -> pd.DataFrame:
+    # One row per student, simulated from their most recent scores in the shared score matrix
+    view = ml_engine.db_manager.score_matrix.refresh()
+    student_ids, rows = view.latest_rows()
+    X = np.round(np.asarray(view.features[rows], dtype=float), 2)
+    result = ml_engine.simulate_improvements(X, thresholds, step)
+
+    # Students in the view are sorted by id, so names and rolls line up by binary search
+    positions = np.searchsorted(view.student_ids, student_ids)
+    names, rolls = np.array(view.names, dtype=object), np.array(view.rolls, dtype=object)
+    columns = {'student_id': student_ids, 'name': names[positions], 'roll_number': rolls[positions]}
+    columns.update({column: X[:, j] for j, column in enumerate(SCORE_COLUMNS)})
+    columns['predicted_score'] = result['predicted']
+    columns['cluster_name'] = result['cluster_names'][result['clusters']]
+    cluster_names = np.append(result['cluster_names'], '').astype(object)
+    for t, threshold in enumerate(result['thresholds']):
+        label = f'{threshold:g}'
+        columns[f'skill_to_{label}'] = result['best_skill_names'][:, t]
+        columns[f'gain_to_{label}'] = result['best_gains'][:, t]
+        columns[f'cluster_at_{label}'] = cluster_names[result['clusters_after'][:, t]]
+        for j, column in enumerate(SCORE_COLUMNS):
+            columns[f"{column[:-len('_score')]}_gain_to_{label}"] = result['gains'][:, j, t]
+    return pd.DataFrame(columns)
+
+
+def write_improvements(df: pd.DataFrame, path: str):
+    if path.endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False, float_format='%.2f')
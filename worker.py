@@ -0,0 +1,128 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class Task:
+    def __init__(self, worker: "BackgroundWorker", on_progress: Optional[Callable] = None):
+        self._worker = worker
+        self._on_progress = on_progress
+        self._cancel_event = threading.Event()
+        self.future = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        self._cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise TaskCancelled()
+
+    def report_progress(self, *args):
+        if self._on_progress is not None:
+            self._worker._post(self._on_progress, *args)
+
+
+class BackgroundWorker:
+    # Runs blocking DB/ML work off the Tk thread. Callbacks (done/error/progress) are queued
+    # and executed on the Tk thread by polling with root.after, since Tk is not thread-safe.
+    def __init__(self, root, max_workers: int = 2, poll_interval: int = 50):
+        self.root = root
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='profiler-worker')
+        self._events = queue.Queue()
+        self._coalesced = {}
+        self._coalesced_lock = threading.Lock()
+        self._closed = False
+        self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def submit(self, fn: Callable, *args, on_done: Optional[Callable] = None,
+               on_error: Optional[Callable] = None, on_progress: Optional[Callable] = None,
+               pass_task: bool = False) -> Task:
+        # With pass_task=True, fn receives the Task as its first argument so it can report
+        # progress and poll for cancellation.
+        task = Task(self, on_progress)
+        task.future = self._executor.submit(self._run, task, fn, args, on_done, on_error, pass_task)
+        return task
+
+    def submit_coalesced(self, key: str, fn: Callable, *args, delay: int = 300,
+                         on_done: Optional[Callable] = None, on_error: Optional[Callable] = None):
+        # Requests for the same key arriving within `delay` ms, or while a previous run is still
+        # in progress, collapse into a single (follow-up) run using the latest arguments.
+        with self._coalesced_lock:
+            entry = self._coalesced.setdefault(key, {'timer': None, 'running': False, 'pending': None})
+            entry['pending'] = (fn, args, on_done, on_error)
+            if entry['running']:
+                return
+            if entry['timer'] is not None:
+                self.root.after_cancel(entry['timer'])
+            entry['timer'] = self.root.after(delay, lambda: self._start_coalesced(key))
+
+    def shutdown(self):
+        self._closed = True
+        try:
+            self.root.after_cancel(self._poll_id)
+        except Exception:
+            pass
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _start_coalesced(self, key: str):
+        with self._coalesced_lock:
+            entry = self._coalesced[key]
+            entry['timer'] = None
+            if entry['running'] or entry['pending'] is None or self._closed:
+                return
+            fn, args, on_done, on_error = entry['pending']
+            entry['pending'] = None
+            entry['running'] = True
+        self._executor.submit(self._run_coalesced, key, fn, args, on_done, on_error)
+
+    def _run_coalesced(self, key: str, fn: Callable, args: tuple, on_done, on_error):
+        self._run(None, fn, args, on_done, on_error, False)
+        with self._coalesced_lock:
+            entry = self._coalesced[key]
+            entry['running'] = False
+            rerun = entry['pending'] is not None
+        if rerun:
+            self._post(self._start_coalesced, key)
+
+    def _run(self, task: Optional[Task], fn: Callable, args: tuple, on_done, on_error, pass_task: bool):
+        try:
+            result = fn(task, *args) if pass_task else fn(*args)
+        except Exception as e:
+            if on_error is not None:
+                self._post(on_error, e)
+            else:
+                logger.exception("Background task %s failed: %s", getattr(fn, '__name__', fn), e)
+            return
+        if on_done is not None:
+            self._post(on_done, result)
+
+    def _post(self, callback: Callable, *args):
+        self._events.put((callback, args))
+
+    def _poll(self):
+        while True:
+            try:
+                callback, args = self._events.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.exception("Error in background task callback: %s", e)
+        if not self._closed:
+            self._poll_id = self.root.after(self.poll_interval, self._poll)